@@ -0,0 +1,64 @@
+""" Benchmark of page size and render time with plotly.js inlined and served as an asset
+
+Renders the Flask paralympics page with the chart HTML from fig.to_html() with its defaults, which
+inlines plotly.js, and from figure_html(), which embeds only the figure JSON and leaves the page to
+load plotly.js from the plotly_js blueprint. Reports the time to serialize the figure and render the
+template and the size of the response. The asset is downloaded once and then cached by the browser
+for a year, its size and a revalidation response are shown for comparison.
+
+Run from the repository root:
+    PYTHONPATH=src:. python benchmarks/bench_flask_plotly_js.py
+"""
+import time
+
+from flask import render_template
+
+from src.flask_app.flask_para_app import app
+from src.data.data_class import get_event_dataframe
+from src.flask_app.page_cache import Page, TableQuery
+from src.flask_app.plotly_js import PLOTLY_JS_VERSION, figure_html
+from src.utils.line_chart import line_chart
+
+REPEATS = 10
+
+
+def best_time(func):
+    result, best = None, float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    df = get_event_dataframe()
+    page_data = Page("1", df)
+    fig = line_chart("participants", df)
+    variants = (
+        ("inline plotly.js (fig.to_html())", fig.to_html),
+        ("figure JSON only (figure_html(fig))", lambda: figure_html(fig)),
+    )
+    print(f"{'page':<38} {'render ms':>10} {'page KB':>9}")
+    with app.test_request_context("/"):
+        for name, chart_html in variants:
+            page, seconds = best_time(
+                lambda: render_template("paralympics.html", table=page_data.table(TableQuery()),
+                                        plot_html=chart_html()))
+            print(f"{name:<38} {seconds * 1000:>10.1f} {len(page.encode()) / 1024:>9.0f}")
+
+    client = app.test_client()
+    # The page is streamed, so read the whole response within the timing
+    page, seconds = best_time(lambda: client.get("/").get_data())
+    print(f"{'GET / from the page cache':<38} {seconds * 1000:>10.1f} {len(page) / 1024:>9.0f}")
+
+    url = f"/plotly/{PLOTLY_JS_VERSION}/plotly.min.js"
+    asset = client.get(url)
+    revalidated = client.get(url, headers={"If-None-Match": asset.headers["ETag"]})
+    print(f"\nplotly.js asset: {len(asset.data) / 1024:.0f} KB, "
+          f"Cache-Control: {asset.headers['Cache-Control']}")
+    print(f"revalidation: status {revalidated.status_code}, {len(revalidated.data)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+""" Benchmark of figure build and serialize time for SVG and WebGL charts
+
+Builds the paralympics line chart and host map with synthetic data of growing size in each render
+mode and reports the time to build the figure, the time to serialize it to JSON (what is sent to
+the browser) and the JSON size. Browser drawing time is not measured; that is where WebGL helps
+most, SVG charts become unusable in the browser past a few thousand points.
+
+Run from the repository root:
+    PYTHONPATH=src python benchmarks/bench_render_mode.py
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.figures import line_figure, map_figure
+
+SIZES = [1_000, 10_000, 100_000, 300_000]
+REPEATS = 3
+
+
+def make_data(n_points: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "event_type": np.where(np.arange(n_points) % 2, "summer", "winter"),
+        "year": np.arange(n_points) // 2,
+        "sports": rng.integers(1, 30, n_points),
+        "place_name": "Place",
+        "latitude": rng.uniform(-60, 70, n_points),
+        "longitude": rng.uniform(-180, 180, n_points),
+    })
+
+
+def best_time(func):
+    result, best = None, float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    print(f"{'chart':<6} {'mode':<6} {'points':>8} {'build ms':>10} {'to_json ms':>11} {'json KB':>9}")
+    for n_points in SIZES:
+        df = make_data(n_points)
+        for chart, build in (("line", line_figure), ("map", map_figure)):
+            for mode in ("svg", "webgl"):
+                if chart == "line":
+                    fig, build_s = best_time(lambda: build(df, "sports", render_mode=mode))
+                else:
+                    fig, build_s = best_time(lambda: build(df, render_mode=mode))
+                fig_json, json_s = best_time(fig.to_json)
+                print(f"{chart:<6} {mode:<6} {n_points:>8} {build_s * 1000:>10.1f} "
+                      f"{json_s * 1000:>11.1f} {len(fig_json) / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
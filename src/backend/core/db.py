@@ -1,10 +1,14 @@
+from contextlib import contextmanager
 from importlib import resources
+from typing import Iterator
 
 import pandas as pd
+from sqlalchemy import event
 from sqlmodel import Session, create_engine, select, text
 
 import data
 from backend.models.models import *  # noqa
+from data.snapshot import DatabaseSnapshot, file_change_counter, restore_file, snapshot_file
 
 # Consider moving the URL to a .env file and using Pydantic Settings
 sqlite_file = resources.files(data).joinpath("paralympics.db")
@@ -13,6 +17,73 @@ connect_args = {"check_same_thread": False}
 engine = create_engine(sqlite_url, connect_args=connect_args, echo=True)
 
 
+# The pysqlite driver delays BEGIN until the first write, which breaks SAVEPOINTs. Let SQLAlchemy
+# emit BEGIN itself so that isolated_session() can roll back. See the SQLAlchemy SQLite dialect docs.
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_begin(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+def data_version() -> str:
+    """Return a version string for the data, it changes whenever the database is written.
+
+    Based on the SQLite file change counter, so it is cheap to read and is the same as
+    ParalympicsData.data_version() for the same database file.
+    """
+    return str(file_change_counter(sqlite_file))
+
+
+def snapshot_db() -> DatabaseSnapshot:
+    """Copy the database into memory using the SQLite backup API.
+
+    Returns:
+        snapshot: DatabaseSnapshot to pass to restore_db(), close it when no longer needed
+    """
+    return snapshot_file(sqlite_file)
+
+
+def restore_db(snapshot: DatabaseSnapshot) -> bool:
+    """Put the database back to the state it was in when the snapshot was taken.
+
+    Nothing is copied if the database has not been written to since the snapshot was taken
+    or last restored.
+
+    Args:
+        snapshot: DatabaseSnapshot returned by snapshot_db()
+
+    Returns:
+        True if the database was restored, False if it was unchanged
+    """
+    return restore_file(snapshot, sqlite_file)
+
+
+@contextmanager
+def isolated_session() -> Iterator[Session]:
+    """Session whose changes are all rolled back when the context exits.
+
+    The session runs inside an outer transaction and its commits only release SAVEPOINTs, so code
+    under test can commit as normal. Useful for per-test isolation, e.g. override the get_db
+    dependency with a function that yields this session.
+
+    Yields:
+        session: SQLModel session
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
 def init_db(session: Session) -> None:
     """Initialize the database by creating tables and adding data if needed.
 
@@ -5,7 +5,8 @@ from contextlib import asynccontextmanager
 from sqlmodel import Session
 
 from backend.core.db import engine, init_db
-from backend.routes import games_router
+from backend.routes import charts_router, games_router
+from utils.admission import AdmissionControlMiddleware, AdmissionController, RouteClass
 
 
 @asynccontextmanager
@@ -34,6 +35,20 @@ origins = [
     "http://localhost:8501",  # streamlit default
 ]
 
+# Limit the number of requests processed at once. The routes that return every row have their own
+# smaller limit. Excess requests wait in a bounded queue and are rejected with 503 + Retry-After
+# when the queue is full or they have waited too long.
+admission = AdmissionController(
+    [
+        RouteClass("bulk", max_concurrency=4, max_queue=16, queue_timeout=2.0,
+                   paths=("/", "/chartdata")),
+        RouteClass("default", max_concurrency=32, max_queue=128, queue_timeout=1.0),
+    ],
+    exempt_paths=("/docs", "/redoc", "/openapi.json", "/metrics/admission"),
+)
+# Added before CORSMiddleware so that the 503 responses also get the CORS headers
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -44,8 +59,15 @@ app.add_middleware(
 
 # Register the router after you app = FastAPI() the CORSMiddleware is registered.
 app.include_router(games_router.router)
+app.include_router(charts_router.router)
 
 
 @app.get("/")
 def read_root():
-    return {"Hello": "World"}
\ No newline at end of file
+    return {"Hello": "World"}
+
+
+@app.get("/metrics/admission")
+def admission_metrics():
+    """Concurrency and queue depth metrics for each route class."""
+    return admission.metrics()
@@ -171,3 +171,13 @@ class Paralympics(SQLModel):
     participants: int | None = None
     latitude: float | None = None
     longitude: float | None = None
+
+
+# Request and response models for getting several games by id
+class GamesIds(SQLModel):
+    ids: list[int]
+
+
+class GamesMulti(SQLModel):
+    items: list[Games | None]
+    missing: list[int]
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Query, Request, Response
+
+from backend.dependencies import SessionDep
+from backend.services.chart_service import ChartService
+
+router = APIRouter(prefix="/charts")
+
+service = ChartService()
+
+
+def _figure_response(request: Request, fig_json: str, version: str) -> Response:
+    """ Return the figure JSON, or 304 Not Modified if the client has this version already."""
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=fig_json, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/trend")
+def read_trend_chart(feature: str, request: Request, session: SessionDep,
+                     max_points: int | None = Query(default=None, ge=6)):
+    """ Plotly figure JSON for the line chart of a feature over time, e.g. ?feature=sports
+
+    Add max_points to downsample the winter and summer series to at most that many points.
+    """
+    return _figure_response(request, *service.get_trend_chart(session, feature, max_points))
+
+
+@router.get("/gender-ratio")
+def read_gender_ratio_chart(event_type: str, request: Request, session: SessionDep):
+    """ Plotly figure JSON for the male:female participants bar chart, e.g. ?event_type=summer """
+    return _figure_response(request, *service.get_gender_ratio_chart(session, event_type))
+
+
+@router.get("/hosts")
+def read_hosts_chart(request: Request, session: SessionDep):
+    """ Plotly figure JSON for the map of host locations """
+    return _figure_response(request, *service.get_hosts_chart(session))
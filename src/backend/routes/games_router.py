@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from typing import Any
 
+from fastapi import APIRouter, Body, HTTPException
+from pydantic import ValidationError
 
 from backend.services.games_service import GamesService, Games
+from backend.models.models import GamesIds, GamesMulti, Paralympics
 from backend.dependencies import SessionDep
 
 router = APIRouter()
@@ -17,11 +20,38 @@ def read_game_all(session: SessionDep):
     return service.get_games(session)
 
 
-@router.get("/chartdata", response_model=Games)
+@router.get("/chartdata", response_model=list[Paralympics])
 def read_chart_data(session: SessionDep):
     return service.get_chart_data(session)
 
 
+# The multi routes must be registered before /{game_id} so 'multi' isn't read as a game_id
+@router.get("/multi", response_model=GamesMulti)
+def read_games_multi(ids: str, session: SessionDep):
+    """ Get several games in one request, e.g. /multi?ids=1,2,3 """
+    try:
+        game_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError as exc:
+        raise HTTPException(status_code=400,
+                            detail="ids must be a comma separated list of integers") from exc
+    if not game_ids:
+        raise HTTPException(status_code=400, detail="Provide ids, e.g. ?ids=1,2,3")
+    return service.get_games_by_ids(session, game_ids)
+
+
+@router.post("/multi", response_model=GamesMulti)
+def read_games_multi_post(session: SessionDep, body: Any = Body()):
+    """ Get several games in one request with the ids in the body, e.g. {"ids": [1, 2, 3]} """
+    # Validated here rather than by FastAPI, so malformed ids get 400 as they do for GET /multi
+    try:
+        game_ids = GamesIds.model_validate(body).ids
+    except ValidationError as exc:
+        raise HTTPException(status_code=400, detail="ids must be a list of integers") from exc
+    if not game_ids:
+        raise HTTPException(status_code=400, detail="Provide ids, e.g. {\"ids\": [1, 2, 3]}")
+    return service.get_games_by_ids(session, game_ids)
+
+
 @router.get("/{game_id}", response_model=Games)
 def read_game(game_id: int, session: SessionDep):
     return service.get_games_by_id(session, game_id)
@@ -0,0 +1,81 @@
+from typing import Any, Callable
+
+import pandas as pd
+from fastapi import HTTPException
+
+from backend.core.db import data_version
+from backend.dependencies import SessionDep
+from backend.services.games_service import GamesService
+from utils.figures import (LINE_CHART_FEATURES, FigureJSONCache, bar_figure, line_figure,
+                           map_figure)
+
+
+class ChartService:
+    """ Builds the chart figures as Plotly JSON, once per data version.
+
+    The figure JSON is cached with the data version it was built from. When the database changes
+    the cache is emptied, so each figure is built at most once per version of the data however many
+    front end apps or workers request it.
+    """
+
+    def __init__(self):
+        self._figures = FigureJSONCache()
+
+    def get_trend_chart(self, session: SessionDep, feature: str,
+                        max_points: int | None = None) -> tuple[str, str]:
+        """ Line chart of a feature over time for the winter and summer events.
+
+        Args:
+            session: SQLModel session
+            feature: events, sports, countries, or participants
+            max_points: optional point budget, the series are downsampled with LTTB
+
+        Returns:
+            (figure JSON, data version)
+
+        Raises:
+            HTTPException 422 if the feature is not valid
+        """
+        feature = feature.lower()
+        if feature not in LINE_CHART_FEATURES:
+            raise HTTPException(status_code=422,
+                                detail=f"feature must be one of {LINE_CHART_FEATURES}")
+        return self._get_figure(session, ("trend", feature, max_points),
+                                lambda df: line_figure(df, feature, max_points))
+
+    def get_gender_ratio_chart(self, session: SessionDep, event_type: str) -> tuple[str, str]:
+        """ Stacked bar chart of the ratio of male to female participants.
+
+        Args:
+            session: SQLModel session
+            event_type: winter or summer
+
+        Returns:
+            (figure JSON, data version)
+
+        Raises:
+            HTTPException 422 if the event type is not valid
+        """
+        event_type = event_type.lower()
+        if event_type not in ("winter", "summer"):
+            raise HTTPException(status_code=422, detail="event_type must be winter or summer")
+        return self._get_figure(session, ("gender-ratio", event_type),
+                                lambda df: bar_figure(df, event_type))
+
+    def get_hosts_chart(self, session: SessionDep) -> tuple[str, str]:
+        """ Scatter geo chart of the host locations.
+
+        Args:
+            session: SQLModel session
+
+        Returns:
+            (figure JSON, data version)
+        """
+        return self._get_figure(session, ("hosts",), map_figure)
+
+    def _get_figure(self, session: SessionDep, key: tuple,
+                    build: Callable[[pd.DataFrame], Any]) -> tuple[str, str]:
+        version = data_version()
+        fig_json = self._figures.get(
+            version, key, lambda: build(pd.DataFrame(GamesService.get_chart_data(session))))
+        return fig_json, version
@@ -27,6 +27,33 @@ class GamesService:
         return result
     
 
+    @staticmethod
+    def get_games_by_ids(session: SessionDep, game_ids: list[int], chunk_size: int = 500) -> dict[
+            str, list]:
+        """ Method to retrieve several games by ID using WHERE id IN (...) queries.
+
+        The ids are queried in chunks of chunk_size to stay below SQLite's limit on the number of
+        query parameters.
+
+        Args:
+            session: SQLModel session
+            game_ids: list of Games.id, duplicates are allowed
+            chunk_size: maximum number of ids in each query
+
+        Returns:
+            dict: "items" has one entry per id in the order requested, None where the id was not
+                found. "missing" lists the ids that were not found.
+        """
+        unique_ids = list(dict.fromkeys(game_ids))
+        found: dict[int, Games] = {}
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            for game in session.exec(select(Games).where(Games.id.in_(chunk))).all():
+                found[game.id] = game
+        items = [found.get(game_id) for game_id in game_ids]
+        missing = [game_id for game_id, game in zip(game_ids, items) if game is None]
+        return {"items": items, "missing": missing}
+
     @staticmethod
     def get_games(session: SessionDep) -> Games:
         """ Method to retrieve a game by its ID.
@@ -67,7 +94,7 @@ class GamesService:
         ).select_from(Games).join(Games.hosts).join(Country, Host.country_id == Country.id)
 
         result = session.exec(statement).all()
-        data = [dict(row) for row in result]
+        data = [dict(row._mapping) for row in result]
         if not data:
             return []
         return data
\ No newline at end of file
@@ -0,0 +1,71 @@
+""" Precomputed figures switched by a clientside callback
+
+When a control only chooses between a few views of the same data, the figure for every option can
+be built once at startup and stored in the browser with dcc.Store. A clientside callback then
+shows the figure for the chosen option: changing the option makes no request to the server and
+does no aggregation.
+
+Aggregate the data before building the figures, e.g. with one groupby for all the options, so each
+stored figure only has the aggregated values rather than every row.
+
+Usage:
+    averages = df.groupby("continent")[options].mean().reset_index()
+    figures = precompute_figures(options, lambda col: px.bar(averages, x="continent", y=col))
+
+    app.layout = [dcc.RadioItems(options, id="radio"), dcc.Graph(id="graph"),
+                  figure_store("figures", figures)]
+    register_figure_switch(control_id="radio", graph_id="graph", store_id="figures")
+"""
+import json
+from typing import Callable, Dict, Iterable, Optional
+
+import dash
+from dash import Input, Output, State, dcc
+
+# Returns the stored figure for the chosen option, or leaves the graph as it is
+_SWITCH_FIGURE = """
+function(option, figures) {
+    if (!figures || !(option in figures)) {
+        return window.dash_clientside.no_update;
+    }
+    return figures[option];
+}
+"""
+
+
+def precompute_figures(options: Iterable, build_figure: Callable) -> Dict[str, Dict]:
+    """ Build the figure for each option once.
+
+    Args:
+        options: the values the control can take
+        build_figure: function that takes an option and returns a Plotly figure
+
+    Returns:
+        figures: dict of option (as a string, like the dcc.Store JSON keys) to the figure as JSON
+    """
+    return {str(option): json.loads(build_figure(option).to_json()) for option in options}
+
+
+def figure_store(store_id: str, figures: Dict[str, Dict]) -> dcc.Store:
+    """ Return the dcc.Store that holds the precomputed figures in the browser."""
+    return dcc.Store(id=store_id, data=figures)
+
+
+def register_figure_switch(control_id: str, graph_id: str, store_id: str,
+                           control_property: str = "value", app: Optional[dash.Dash] = None):
+    """ Add the clientside callback that shows the stored figure for the chosen option.
+
+    Args:
+        control_id: id of the control, e.g. a dcc.RadioItems
+        graph_id: id of the dcc.Graph
+        store_id: id of the figure_store
+        control_property: the control property with the chosen option
+        app: the Dash app, or None to register the callback for any app like @callback
+    """
+    register = dash.clientside_callback if app is None else app.clientside_callback
+    register(
+        _SWITCH_FIGURE,
+        Output(graph_id, "figure"),
+        Input(control_id, control_property),
+        State(store_id, "data"),
+    )
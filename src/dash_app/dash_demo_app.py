@@ -6,49 +6,99 @@ import pandas as pd
 import plotly.express as px
 import dash_bootstrap_components as dbc
 
-# Incorporate data
-df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder2007.csv')
+from src.dash_app.clientside import figure_store, precompute_figures, register_figure_switch
+from src.dash_app.loaders import VersionedLoader, serving_page
+from src.dash_app.memoize import memoize, register_stats_route
+from src.dash_app.server_side import ag_grid_rows, column_defs, dataframe_fetch
+from src.utils.disk_cache import disk_cached
+
+DATA_URL = 'https://raw.githubusercontent.com/plotly/datasets/master/gapminder2007.csv'
+DATA_MAX_AGE = 3600  # seconds before the CSV is downloaded again
+OPTIONS = ['pop', 'lifeExp', 'gdpPercap']
+
+
+@disk_cached(ttl=DATA_MAX_AGE)
+def load_data():
+    """ Download the CSV, shared by the app's processes through the disk cache, which is in this
+    user's private cache directory as the DataFrame is stored as a pickle."""
+    return pd.read_csv(DATA_URL)
+
+
+def build_figures(df):
+    """ The average of each option by continent, computed with one groupby, and the figure for each
+    option. The radio buttons switch between the figures in the browser."""
+    averages = df.groupby('continent')[OPTIONS].mean().reset_index()
+    return precompute_figures(
+        OPTIONS, lambda col: px.bar(averages, x='continent', y=col, labels={col: f'avg of {col}'}))
+
+
+# Incorporate data: it is downloaded on the first page load rather than at startup, and again
+# once it is older than DATA_MAX_AGE. The grid rows and the figures are computed once for each
+# download.
+gapminder = VersionedLoader(load_data, max_age=DATA_MAX_AGE)
+# The grid gets its rows a block at a time from a callback, rather than all of them in the layout
+fetch_rows = gapminder.derived(dataframe_fetch)
+figures = gapminder.derived(build_figures)
+# A hash of the rows, the version of the data for the memoized grid callback. The workers load the
+# same CSV from the disk cache, so they have the same version and share the grid rows.
+data_version = gapminder.derived(lambda df: str(pd.util.hash_pandas_object(df).sum()))
 
 # Initialize the app - incorporate a Dash Bootstrap theme
 external_stylesheets = [dbc.themes.CERULEAN]
 app = Dash(__name__, external_stylesheets=external_stylesheets)
+# The grid's rows are memoized for all the app's workers, with the stats at /_dash-cache/stats
+register_stats_route(app)
+
+
+# App layout, Dash calls this for each page load
+def layout():
+    loaded = serving_page()
+    columns = gapminder.get().columns if loaded else []
+    page_figures = figures() if loaded else {}
+    return dbc.Container([
+        dbc.Row([
+            html.Div('My First App with Data, Graph, and Controls', className="text-primary text-center fs-3")
+        ]),
+
+        dbc.Row([
+            dbc.RadioItems(options=[{"label": x, "value": x} for x in OPTIONS],
+                           value='lifeExp',
+                           inline=True,
+                           id='radio-buttons-final')
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                dag.AgGrid(
+                    id='grid-final',
+                    rowModelType='infinite',
+                    columnDefs=column_defs(columns)
+                )
+            ], width=6),
+
+            dbc.Col([
+                dcc.Graph(figure=page_figures.get('lifeExp', {}), id='my-first-graph-final')
+            ], width=6),
+        ]),
+
+        figure_store('figures-store', page_figures),
+
+    ], fluid=True)
+
+
+app.layout = layout
+
+# Add controls to build the interaction, the figure is switched in the browser
+register_figure_switch(control_id='radio-buttons-final', graph_id='my-first-graph-final',
+                       store_id='figures-store')
 
-# App layout
-app.layout = dbc.Container([
-    dbc.Row([
-        html.Div('My First App with Data, Graph, and Controls', className="text-primary text-center fs-3")
-    ]),
-
-    dbc.Row([
-        dbc.RadioItems(options=[{"label": x, "value": x} for x in ['pop', 'lifeExp', 'gdpPercap']],
-                       value='lifeExp',
-                       inline=True,
-                       id='radio-buttons-final')
-    ]),
-
-    dbc.Row([
-        dbc.Col([
-            dag.AgGrid(
-                rowData=df.to_dict('records'),
-                columnDefs=[{"field": i} for i in df.columns]
-            )
-        ], width=6),
-
-        dbc.Col([
-            dcc.Graph(figure={}, id='my-first-graph-final')
-        ], width=6),
-    ]),
-
-], fluid=True)
-
-# Add controls to build the interaction
 @callback(
-    Output(component_id='my-first-graph-final', component_property='figure'),
-    Input(component_id='radio-buttons-final', component_property='value')
+    Output(component_id='grid-final', component_property='getRowsResponse'),
+    Input(component_id='grid-final', component_property='getRowsRequest')
 )
-def update_graph(col_chosen):
-    fig = px.histogram(df, x='continent', y=col_chosen, histfunc='avg')
-    return fig
+@memoize(ttl=DATA_MAX_AGE, version=data_version)
+def update_grid(request):
+    return ag_grid_rows(request, fetch_rows())
 
 # Run the app
 if __name__ == '__main__':
@@ -1,21 +1,32 @@
-import pandas as pd
 # import dash_ag_grid as dag
 from dash import Dash, html, dash_table, dcc
-from src.data.mock_api import get_event_data
+
+from src.dash_app.loaders import VersionedLoader, serving_page
+from src.data.sources import EventFileSource
 from src.utils.line_chart import line_chart
 
+# Chart rendering: "svg", "webgl" or "auto" to use WebGL for large data
+RENDER_MODE = "auto"
+
+# The data is loaded on the first page load, and again when the file changes
+event_source = EventFileSource()
+event_data = VersionedLoader(event_source.get_dataframe, version=event_source.version)
+chart = event_data.derived(lambda df: line_chart("participants", df, render_mode=RENDER_MODE))
+
 app = Dash()
 
-para_data = get_event_data()
-df = pd.read_csv('src/data/paralympic_events.csv')
-df['start'] = pd.to_datetime(df['start'], dayfirst=True)
-df['end'] = pd.to_datetime(df['end'], dayfirst=True)
 
-app.layout = [
-    html.H1(children='Title of Dash App'),
-    dash_table.DataTable(df.to_dict('records')),
-    dcc.Graph(figure=line_chart("participants", df))
-]
+def layout():
+    """ Returns the layout for the current data, Dash calls this for each page load."""
+    loaded = serving_page()
+    return [
+        html.H1(children='Title of Dash App'),
+        dash_table.DataTable(event_data.get().to_dict('records') if loaded else []),
+        dcc.Graph(figure=chart() if loaded else {})
+    ]
+
+
+app.layout = layout
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,34 +1,113 @@
-from io import StringIO
-
 import dash_ag_grid as dag
 import dash_bootstrap_components as dbc
-import pandas as pd
-from dash import Dash, dash_table, dcc, html
+from dash import Dash, Input, Output, callback, dash_table, dcc, html
 
-from src.data.mock_api import get_event_data
+from src.dash_app.loaders import BACKGROUND, BACKGROUND_MANAGER, VersionedLoader
+from src.dash_app.memoize import memoize, register_stats_route
+from src.dash_app.server_side import (DEFAULT_PAGE_SIZE, INFINITE_BLOCK_SIZE, ag_grid_rows,
+                                      all_data_column_defs, datatable_page, sql_fetch)
+from src.data.data_class import ALL_DATA_COLUMNS, ParalympicsData
+from src.data.sources import EventFileSource
 from src.utils.line_chart import line_chart
 
-# Create the app
-app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
-
-# Load the data
-para_data = get_event_data()
-df = pd.read_json(StringIO(para_data))
-df['start'] = pd.to_datetime(df['start'], dayfirst=True)
-df['end'] = pd.to_datetime(df['end'], dayfirst=True)
-
-# Add the layout
-app.layout = dbc.Container([
-    html.H1(children='Paralympics Dash app'),
-    html.H2("Data table"),
-    dash_table.DataTable(df.to_dict('records')),
-    html.H2("AG Grid table"),
-    dag.AgGrid(
-        rowData=df.to_dict("records"),
-        columnDefs=[{"field": col} for col in df.columns]),
-    html.H2("Line charts"),
-    dcc.Graph(figure=line_chart("participants", df))
-])
+# Chart rendering: "svg", "webgl" or "auto" to use WebGL for large data
+RENDER_MODE = "auto"
+CHART_FEATURES = ["participants", "events", "sports", "countries"]
+
+# Create the app, slow callbacks run in the background if diskcache is installed
+app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP],
+           background_callback_manager=BACKGROUND_MANAGER)
+
+# Nothing is loaded until it is first needed. The chart data is loaded again when the workbook
+# changes.
+event_source = EventFileSource()
+event_data = VersionedLoader(event_source.get_dataframe, version=event_source.version)
+
+# The tables get their rows from the database a page at a time, see the callbacks below
+database = VersionedLoader(ParalympicsData)
+
+
+def database_version() -> str:
+    return database.get().data_version()
+
+
+# The callback outputs are memoized for all the app's workers, with the stats at /_dash-cache/stats
+register_stats_route(app)
+
+
+def layout():
+    """ Returns the layout, Dash calls this for each page load."""
+    return dbc.Container([
+        html.H1(children='Paralympics Dash app'),
+        html.H2("Data table"),
+        dash_table.DataTable(
+            id="para-table",
+            columns=[{"name": col, "id": col} for col in ALL_DATA_COLUMNS],
+            page_current=0,
+            page_size=DEFAULT_PAGE_SIZE,
+            page_action="custom",
+            sort_action="custom",
+            sort_mode="multi",
+            filter_action="custom",
+            filter_query="",
+        ),
+        html.P(id="para-table-message"),
+        html.H2("AG Grid table"),
+        dag.AgGrid(
+            id="para-grid",
+            rowModelType="infinite",
+            columnDefs=all_data_column_defs(),
+            dashGridOptions={"cacheBlockSize": INFINITE_BLOCK_SIZE}),
+        html.H2("Line charts"),
+        dcc.Dropdown(CHART_FEATURES, value="participants", clearable=False, id="chart-feature"),
+        dcc.Loading(dcc.Graph(id="para-chart")),
+    ])
+
+
+app.layout = layout
+
+
+@callback(
+    Output("para-chart", "figure"),
+    Input("chart-feature", "value"),
+    background=BACKGROUND,
+)
+@memoize(version=event_source.version)
+def update_chart(feature):
+    """ Returns the line chart for the feature, built once for each version of the data."""
+    return line_chart(feature, event_data.get(), render_mode=RENDER_MODE)
+
+
+@callback(
+    Output("para-table", "data"),
+    Output("para-table", "page_count"),
+    Output("para-table-message", "children"),
+    Input("para-table", "page_current"),
+    Input("para-table", "page_size"),
+    Input("para-table", "sort_by"),
+    Input("para-table", "filter_query"),
+)
+@memoize(version=database_version)
+def update_table(page_current, page_size, sort_by, filter_query):
+    """ Returns the page of the table for the current sort order and filter, or no rows and a
+    message if the filter is not supported."""
+    try:
+        rows, page_count = datatable_page(page_current, page_size, sort_by, filter_query,
+                                          sql_fetch(database.get()))
+    except ValueError as exc:
+        return [], 1, str(exc)
+    return rows, page_count, ""
+
+
+@callback(
+    Output("para-grid", "getRowsResponse"),
+    Input("para-grid", "getRowsRequest"),
+)
+@memoize(version=database_version)
+def update_grid(request):
+    """ Returns the block of rows the grid asks for as it is scrolled, sorted and filtered."""
+    return ag_grid_rows(request, sql_fetch(database.get()))
+
 
 # Run the app
 if __name__ == '__main__':
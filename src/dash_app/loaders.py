@@ -0,0 +1,160 @@
+""" Lazy, version-checked data loaders and layout functions for the Dash apps
+
+Loading data and building figures when the app module is imported makes every worker pay for it
+before it can accept a request, and the data is then never refreshed. Instead:
+
+- app.layout is a function, Dash calls it for each page load so the layout uses the current data.
+  Dash also calls it once when it is assigned to check the callbacks against it, serving_page() is
+  False then and the layout is built without loading anything
+- the data is loaded by a VersionedLoader the first time it is needed, and loaded again when the
+  version of the source changes or, for a source with no version, when it is older than max_age
+- values computed from the data, e.g. figures, are built once for each version with derived()
+- slow callbacks can run as background callbacks, using a disk cache in this user's private cache
+  directory when diskcache is installed (pip install "dash[diskcache]"); without it they run as
+  normal callbacks
+
+Usage:
+    source = EventFileSource()
+    event_data = VersionedLoader(source.get_dataframe, version=source.version)
+    chart = event_data.derived(lambda df: line_chart("participants", df))
+
+    def layout():
+        return [dcc.Graph(figure=chart() if serving_page() else {})]
+
+    app = Dash(background_callback_manager=BACKGROUND_MANAGER)
+    app.layout = layout
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import flask
+
+from src.utils.disk_cache import private_cache_dir
+
+DEFAULT_CHECK_INTERVAL = 5  # seconds between checks for a new version of the data
+BACKGROUND_CACHE_NAME = "dash_background"  # directory in private_cache_dir()
+
+_MISSING = object()
+
+
+class VersionedLoader:
+    """ Loads data the first time it is used and again when the source changes.
+
+    The version of the source is checked at most every check_interval seconds. A source with no
+    version function is loaded again once the data is older than max_age seconds, or never if
+    max_age is None.
+
+    Attributes:
+        version: version of the source the current data was loaded from, None before the first load
+        loaded_at: time.monotonic() when the current data was loaded, None before the first load
+
+    Methods:
+        get(self): Returns the data, loading it if needed
+        derived(self, func): Returns a function that returns func(data), computed once per version
+        invalidate(self): Loads the data again on the next get()
+    """
+
+    def __init__(self, load: Callable[[], Any], version: Optional[Callable[[], str]] = None,
+                 max_age: Optional[float] = None,
+                 check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self._load = load
+        self._version = version
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self._data: Any = _MISSING
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """ Return the data, loading it on first use or if the source has changed."""
+        if self._data is not _MISSING and not self._due_for_check():
+            return self._data
+        with self._lock:
+            if self._data is _MISSING or self._due_for_check():
+                self._refresh()
+            return self._data
+
+    def derived(self, func: Callable[[Any], Any]) -> Callable[[], Any]:
+        """ Return a function that returns func(data), computed once for each version of the data.
+
+        Args:
+            func: function that takes the data and returns a value computed from it
+        """
+        cache: Dict[str, Any] = {}
+        lock = threading.Lock()
+
+        def value():
+            data = self.get()
+            key = self._data_key()
+            with lock:
+                if cache.get("key", _MISSING) != key:
+                    cache["value"] = func(data)
+                    cache["key"] = key
+                return cache["value"]
+
+        return value
+
+    def invalidate(self) -> None:
+        """ Load the data again on the next get()."""
+        with self._lock:
+            self._data = _MISSING
+            self.version = None
+            self.loaded_at = None
+
+    def _due_for_check(self) -> bool:
+        now = time.monotonic()
+        if self._version is None:
+            return self.max_age is not None and now - self.loaded_at >= self.max_age
+        return now - self._checked_at >= self.check_interval
+
+    def _refresh(self) -> None:
+        """ Load the data if there is none yet or the source version has changed."""
+        if self._version is None:
+            self._data = self._load()
+            self.loaded_at = time.monotonic()
+            return
+        version = self._version()
+        self._checked_at = time.monotonic()
+        if self._data is _MISSING or version != self.version:
+            self._data = self._load()
+            self.version = version
+            self.loaded_at = self._checked_at
+
+    def _data_key(self):
+        # The version if there is one, otherwise when the data was loaded
+        return self.version if self._version is not None else self.loaded_at
+
+
+def serving_page() -> bool:
+    """ Return True if the layout function is called for a page load, False if Dash is calling it at
+    startup to validate the layout."""
+    return flask.has_request_context()
+
+
+def background_callback_manager(cache_dir: Optional[Path] = None):
+    """ Return a DiskcacheManager for background callbacks, or None if diskcache is not installed.
+
+    With None, pass background=False to the callbacks so they run as normal callbacks.
+
+    Args:
+        cache_dir: directory for the diskcache files, BACKGROUND_CACHE_NAME in private_cache_dir()
+            if None. diskcache pickles the callback results, so no other user must be able to write
+            to it.
+    """
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+    except ImportError:
+        return None
+    if cache_dir is None:
+        cache_dir = private_cache_dir().joinpath(BACKGROUND_CACHE_NAME)
+    return DiskcacheManager(diskcache.Cache(str(cache_dir)))
+
+
+BACKGROUND_MANAGER = background_callback_manager()
+# Pass as @callback(..., background=BACKGROUND)
+BACKGROUND = BACKGROUND_MANAGER is not None
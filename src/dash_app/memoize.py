@@ -0,0 +1,85 @@
+""" Memoized Dash callbacks, shared by the app's worker processes
+
+When a Dash app runs as several WSGI workers, each one computes the same callback outputs again
+for the same inputs. memoize() stores a callback's output in a DiskCache, a SQLite file every
+worker on the machine reads, so an output computed by one worker is reused by all of them.
+
+- the key is the callback's name and inputs, an entry stored for another data version is a miss
+- entries expire after a TTL, and when the cache is full those closest to expiring are removed
+- hits and misses are counted for each callback in the cache file, so the counts cover every
+  worker, and register_stats_route() serves them as JSON for monitoring. Each worker adds its
+  counts to the file every CALLBACK_STATS_FLUSH_EVERY lookups or so many seconds, not on every
+  lookup
+- the cache file is in this user's private cache directory, as the outputs are stored as pickles
+
+The inputs and outputs must be picklable, as Dash callback inputs and figures are.
+
+Usage:
+    @callback(Output("chart", "figure"), Input("feature", "value"))
+    @memoize(version=get_event_data_version)
+    def update_chart(feature):
+        ...
+
+    register_stats_route(app)   # GET /_dash-cache/stats
+"""
+import functools
+from typing import Any, Callable, Optional
+
+import dash
+import flask
+
+from src.utils.disk_cache import DiskCache, disk_cached, private_cache_dir
+
+CALLBACK_CACHE_NAME = "dash_callbacks.sqlite"  # file in private_cache_dir()
+CALLBACK_TTL = 600  # seconds
+CALLBACK_MAX_ENTRIES = 4096
+CALLBACK_STATS_FLUSH_EVERY = 50  # lookups
+CALLBACK_STATS_FLUSH_INTERVAL = 5  # seconds
+STATS_PATH = "/_dash-cache/stats"
+
+
+@functools.lru_cache(maxsize=None)
+def callback_cache() -> DiskCache:
+    """ Return the DiskCache for the callback outputs shared by the Dash apps in this process."""
+    return DiskCache(private_cache_dir().joinpath(CALLBACK_CACHE_NAME), ttl=CALLBACK_TTL,
+                     max_entries=CALLBACK_MAX_ENTRIES, shared_stats=True,
+                     stats_flush_every=CALLBACK_STATS_FLUSH_EVERY,
+                     stats_flush_interval=CALLBACK_STATS_FLUSH_INTERVAL)
+
+
+def memoize(ttl: Optional[float] = None, version: Optional[Callable[[], Any]] = None,
+            cache: Optional[DiskCache] = None) -> Callable:
+    """ Decorator that stores the outputs of a Dash callback, put it below @callback.
+
+    Args:
+        ttl: time in seconds an output is used for, the cache ttl if None
+        version: function that returns the current data version, outputs for another version are
+            computed again
+        cache: the DiskCache, callback_cache() if None
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # The cache is looked up for each call rather than when the callback is decorated, so
+            # importing an app does not open the cache file
+            cached = disk_cached(ttl=ttl, version=version, cache=cache or callback_cache())(func)
+            return cached(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def register_stats_route(app: dash.Dash, cache: Optional[DiskCache] = None,
+                         path: str = STATS_PATH) -> None:
+    """ Add a route to the app's Flask server that returns the cache stats as JSON.
+
+    The response has the entry count, the hits and misses of the worker that answered, and under
+    "functions" the hits and misses of each memoized callback from every worker.
+    """
+
+    def callback_cache_stats():
+        return flask.jsonify((cache or callback_cache()).stats())
+
+    app.server.add_url_rule(path, "callback_cache_stats", callback_cache_stats)
@@ -0,0 +1,213 @@
+""" Server-side row model for the Dash grids
+
+Passing df.to_dict('records') to a DataTable or an AG Grid sends the whole dataset to the browser
+with the layout. With a server-side row model the grid asks a callback for the rows it shows, and
+the callback sorts, filters and pages the data on the server:
+
+- AG Grid uses the infinite row model: rowModelType="infinite", the callback takes the grid's
+  getRowsRequest and returns getRowsResponse
+- DataTable uses custom paging, sorting and filtering: the callback takes page_current, page_size,
+  sort_by and filter_query and returns data and page_count
+
+Both convert the grid's request to the same fetch(offset, limit, sort_by, filters) call, which
+returns (rows, total). sql_fetch() queries the paralympics database, dataframe_fetch() pages a
+DataFrame for data that is not in the database.
+
+Usage:
+    fetch = sql_fetch(ParalympicsData())
+
+    @callback(Output("grid", "getRowsResponse"), Input("grid", "getRowsRequest"))
+    def grid_rows(request):
+        return ag_grid_rows(request, fetch)
+"""
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from src.data.data_class import ALL_DATA_COLUMNS, ParalympicsData
+
+# fetch(offset, limit, sort_by, filters) -> (rows, total), see ParalympicsData.get_all_data_page
+Fetch = Callable[[int, int, Sequence[Tuple[str, bool]], Sequence[Tuple[str, str, Any]]],
+                 Tuple[List[Dict], int]]
+
+DEFAULT_PAGE_SIZE = 10  # DataTable rows per page
+INFINITE_BLOCK_SIZE = 100  # AG Grid rows per request
+
+# DataTable filter_query operators and the matching operator names used by fetch
+_DATATABLE_OPERATORS = {
+    "contains": "contains",
+    "datestartswith": "startsWith",
+    "=": "equals", "eq": "equals",
+    "!=": "notEqual", "ne": "notEqual",
+    "<": "lessThan", "lt": "lessThan",
+    "<=": "lessThanOrEqual", "le": "lessThanOrEqual",
+    ">": "greaterThan", "gt": "greaterThan",
+    ">=": "greaterThanOrEqual", "ge": "greaterThanOrEqual",
+}
+# '{column} operator value', the value may be quoted
+_DATATABLE_FILTER = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+"
+    r"(?P<operator>[si]?(?:contains|datestartswith|eq|ne|lt|le|gt|ge)|!=|<=|>=|[=<>])"
+    r"\s+(?P<value>.+)$"
+)
+# '{column} is blank', '{column} is not nil', ...
+_DATATABLE_BLANK_FILTER = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s+is\s+(?P<not>not\s+)?(?:blank|nil)$"
+)
+_QUOTED = re.compile(r"(['\"`]).*?\1")
+
+
+def sql_fetch(data: ParalympicsData) -> Fetch:
+    """ Return a fetch function that pages the joined paralympics data in SQL."""
+    return data.get_all_data_page
+
+
+def all_data_column_defs() -> List[Dict]:
+    """ AG Grid column definitions for the joined paralympics data."""
+    return column_defs(ALL_DATA_COLUMNS)
+
+
+def column_defs(columns) -> List[Dict]:
+    """ AG Grid column definitions with one filter condition per column, as ag_grid_rows needs."""
+    return [{"field": col, "filter": True, "filterParams": {"maxNumConditions": 1}}
+            for col in columns]
+
+
+def ag_grid_rows(request: Optional[Dict], fetch: Fetch) -> Dict:
+    """ Answer an AG Grid infinite row model getRowsRequest.
+
+    Args:
+        request: the grid's getRowsRequest, with startRow, endRow, sortModel and filterModel
+        fetch: the function that returns the rows
+
+    Returns:
+        getRowsResponse: {"rowData": rows, "rowCount": number of rows that match the filters}
+    """
+    request = request or {}
+    start = int(request.get("startRow") or 0)
+    end = int(request.get("endRow") or start + INFINITE_BLOCK_SIZE)
+    sort_by = [(s["colId"], s["sort"] == "desc") for s in request.get("sortModel") or []]
+    filters = []
+    for column, model in (request.get("filterModel") or {}).items():
+        operator = model.get("type")
+        if operator == "inRange":
+            value = (model.get("filter"), model.get("filterTo"))
+        else:
+            value = model.get("filter")
+        filters.append((column, operator, value))
+    rows, total = fetch(start, end - start, sort_by, filters)
+    return {"rowData": rows, "rowCount": total}
+
+
+def parse_filter_query(filter_query: Optional[str]) -> List[Tuple[str, str, Any]]:
+    """ Convert a DataTable filter_query, e.g. '{year} >= 2000 && {place_name} contains Lon', to
+    (column, operator, value) filters.
+
+    Only conditions joined with && are supported, and '{column} is blank' / 'is nil' (or 'is not
+    blank' / 'is not nil') for missing values.
+
+    Raises:
+        ValueError: if a part of the query is not understood, or the query uses || or parentheses
+    """
+    unquoted = _QUOTED.sub("", filter_query or "")
+    if "||" in unquoted or "(" in unquoted or ")" in unquoted:
+        raise ValueError(f"Cannot filter by '{filter_query}', only conditions joined with && are "
+                         f"supported")
+    filters = []
+    for part in (filter_query or "").split(" && "):
+        part = part.strip()
+        if not part:
+            continue
+        blank = _DATATABLE_BLANK_FILTER.match(part)
+        if blank is not None:
+            filters.append((blank["column"], "notBlank" if blank["not"] else "blank", None))
+            continue
+        match = _DATATABLE_FILTER.match(part)
+        if match is None:
+            raise ValueError(f"Cannot filter by '{part}'")
+        # DataTable can put 's' (case-sensitive) or 'i' (insensitive) in front of an operator,
+        # the filters here are case-insensitive for text
+        operator = match["operator"]
+        if operator not in _DATATABLE_OPERATORS:
+            operator = operator[1:]
+        value = match["value"].strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+            value = value[1:-1]
+        else:
+            value = _number(value)
+        filters.append((match["column"], _DATATABLE_OPERATORS[operator], value))
+    return filters
+
+
+def datatable_page(page_current: Optional[int], page_size: Optional[int],
+                   sort_by: Optional[List[Dict]], filter_query: Optional[str],
+                   fetch: Fetch) -> Tuple[List[Dict], int]:
+    """ Answer a DataTable with page_action, sort_action and filter_action set to 'custom'.
+
+    Returns:
+        data: the rows on the page
+        page_count: the number of pages for the rows that match the filter
+    """
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    page_current = page_current or 0
+    sort = [(s["column_id"], s["direction"] == "desc") for s in sort_by or []]
+    rows, total = fetch(page_current * page_size, page_size, sort, parse_filter_query(filter_query))
+    return rows, max(1, math.ceil(total / page_size))
+
+
+def dataframe_fetch(df: pd.DataFrame) -> Fetch:
+    """ Return a fetch function that pages a DataFrame, for data that is not in the database.
+
+    Supports the same operators as ParalympicsData.get_all_data_page.
+    """
+
+    def fetch(offset, limit, sort_by=(), filters=()):
+        mask = pd.Series(True, index=df.index)
+        for column, operator, value in filters:
+            if column not in df.columns:
+                raise ValueError(f"Unknown column '{column}'")
+            mask &= _dataframe_condition(df[column], operator, value)
+        matches = df[mask]
+        if sort_by:
+            matches = matches.sort_values([c for c, _ in sort_by],
+                                          ascending=[not d for _, d in sort_by], kind="stable")
+        page = matches.iloc[offset:offset + limit]
+        return page.to_dict("records"), len(matches)
+
+    return fetch
+
+
+def _dataframe_condition(series: pd.Series, operator: str, value: Any) -> pd.Series:
+    def text():
+        return series.astype(str).str.lower()
+
+    conditions = {
+        "equals": lambda: series == value,
+        "notEqual": lambda: series != value,
+        "lessThan": lambda: series < value,
+        "lessThanOrEqual": lambda: series <= value,
+        "greaterThan": lambda: series > value,
+        "greaterThanOrEqual": lambda: series >= value,
+        "contains": lambda: text().str.contains(str(value).lower(), regex=False),
+        "notContains": lambda: ~text().str.contains(str(value).lower(), regex=False),
+        "startsWith": lambda: text().str.startswith(str(value).lower()),
+        "endsWith": lambda: text().str.endswith(str(value).lower()),
+        "inRange": lambda: series.between(*value),
+        "blank": lambda: series.isna(),
+        "notBlank": lambda: series.notna(),
+    }
+    if operator not in conditions:
+        raise ValueError(f"Unknown filter operator '{operator}'")
+    return conditions[operator]()
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
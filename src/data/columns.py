@@ -0,0 +1,13 @@
+""" Column names of the paralympics data that more than one package needs
+
+This module has no imports, so code that only needs the names, e.g. utils.line_chart, does not
+load the data modules and the database code with them.
+"""
+
+# Names in the paralympics .xlsx file that differ from the chart column names
+EVENT_FILE_COLUMNS = {
+    "type": "event_type",
+    "host": "place_name",
+    "start": "start_date",
+    "end": "end_date",
+}
@@ -1,10 +1,73 @@
 import json
 import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import pandas as pd
 
+from data.snapshot import DatabaseSnapshot, file_change_counter, restore_file, snapshot_file
+from data.write_batcher import WriteBatcher
+
+EVENT_DATA_FILE = Path(__file__).parent.joinpath("paralympics.xlsx")
+# Column types of the event data from load_event_dataframe, the date columns are parsed separately
+EVENT_DATA_DTYPES = {
+    "type": "category",
+    "year": "Int16",
+    "host": "category",
+    "countries": "Int16",
+    "events": "Int16",
+    "sports": "Int16",
+    "participants_m": "Int32",
+    "participants_f": "Int32",
+    "participants": "Int32",
+}
+EVENT_DATA_DATES = ["start", "end"]
+
+# The DataFrame shared by get_event_dataframe and the file version it was read from
+_event_dataframe: Dict[str, Any] = {"version": None, "df": None}
+_event_dataframe_lock = threading.Lock()
+
+# Columns of the joined data returned by get_all_data, and the SQL expression for each
+ALL_DATA_COLUMNS = {
+    "country_name": "country.country_name",
+    "event_type": "games.event_type",
+    "year": "games.year",
+    "start_date": "games.start_date",
+    "end_date": "games.end_date",
+    "place_name": "host.place_name",
+    "events": "games.events",
+    "sports": "games.sports",
+    "countries": "games.countries",
+    "participants_m": "games.participants_m",
+    "participants_f": "games.participants_f",
+    "participants": "games.participants",
+    "latitude": "host.latitude",
+    "longitude": "host.longitude",
+}
+_ALL_DATA_FROM = (
+    "FROM games "
+    "JOIN games_host ON games.id = games_host.games_id "
+    "JOIN host ON games_host.host_id = host.id "
+    "JOIN country ON host.country_id = country.id"
+)
+
+# Filter operators for get_all_data_page (the names AG Grid uses), and the SQL for each.
+# The LIKE patterns escape % and _ in the value with \.
+_FILTER_SQL = {
+    "equals": ("{} = ?", "{}"),
+    "notEqual": ("{} != ?", "{}"),
+    "lessThan": ("{} < ?", "{}"),
+    "lessThanOrEqual": ("{} <= ?", "{}"),
+    "greaterThan": ("{} > ?", "{}"),
+    "greaterThanOrEqual": ("{} >= ?", "{}"),
+    "contains": ("{} LIKE ? ESCAPE '\\'", "%{}%"),
+    "notContains": ("{} NOT LIKE ? ESCAPE '\\'", "%{}%"),
+    "startsWith": ("{} LIKE ? ESCAPE '\\'", "{}%"),
+    "endsWith": ("{} LIKE ? ESCAPE '\\'", "%{}"),
+}
+FILTER_OPERATORS = tuple(_FILTER_SQL) + ("inRange", "blank", "notBlank")
+
 
 class ParalympicsData:
     """ Class representing the paralympics data in JSON format.
@@ -14,18 +77,35 @@ class ParalympicsData:
     Attributes:
         database_file: path to the database file
         tables: list of table names from the database
+        writer: write-behind queue that group-commits the inserts made by add_row
 
     Methods:
+        data_version(self): Returns a version string that changes whenever the database is written
         get_table_as_json(self, table_name): Gets the data from the specified table and returns it as JSON
         get_all_data(self): Gets data from joined tables and returns it as JSON
+        get_all_data_page(self, offset, limit, sort_by, filters): Gets a sorted, filtered page of it
         get_row_by_id(self, row_id): Gets the data from the specified row and returns it as JSON
+        get_rows_by_ids(self, table_name, ids): Gets several rows by id in one query
         add_row(self, row_id): Adds a new row to the table
         search_table(self, table_name, filters): Gets rows based on search criteria in any column
+        get_host_clusters(self, zoom): Gets the host locations binned into grid cells with counts
+        get_quiz_bundle(self, offset, limit): Gets the question count and a page of questions
+        check_response(self, question_id, response_id): Checks whether a quiz response is correct
+        snapshot(self): Copies the database into memory
+        restore(self, snapshot): Puts the database back to the state in a snapshot
+        close(self): Stops the write-behind queue
 
+    Args:
+        database_file: path to the database file, defaults to paralympics.db in this package
+        max_batch_latency: maximum time in seconds an insert waits for others to join its batch
+        max_batch_size: maximum number of inserts committed in one transaction
     """
 
-    def __init__(self):
-        self.database_file = Path(__file__).parent.joinpath("paralympics.db")
+    def __init__(self, database_file: Optional[Path] = None, max_batch_latency: float = 0.005,
+                 max_batch_size: int = 64):
+        if database_file is None:
+            database_file = Path(__file__).parent.joinpath("paralympics.db")
+        self.database_file = Path(database_file)
         if not self.database_file.exists():
             raise FileNotFoundError(f"Database file not found: {self.database_file}")
         self.tables = []
@@ -39,6 +119,8 @@ class ParalympicsData:
                 self.tables = [row[0] for row in cur.fetchall()]
         except Exception as e:
             raise RuntimeError(f"Error querying database tables: {e}") from e
+        self.writer = WriteBatcher(self.database_file, max_latency=max_batch_latency,
+                                   max_batch_size=max_batch_size)
 
     def _get_columns(self, table_name: str) -> List[str]:
         conn = sqlite3.connect(self.database_file)
@@ -63,6 +145,14 @@ class ParalympicsData:
         finally:
             conn.close()
 
+    def data_version(self) -> str:
+        """ Return a version string for the data, it changes whenever the database is written.
+
+        Based on the SQLite file change counter, so it is cheap to read and the same in every
+        process using the database file.
+        """
+        return str(file_change_counter(self.database_file))
+
     def get_table_as_json(self, table_name):
         """ Method to return the specified table data from the paralympics .db file.
 
@@ -93,27 +183,27 @@ class ParalympicsData:
             if conn:
                 conn.close()
 
-    def get_all_data(self):
+    def get_all_data(self, columns: Optional[Sequence[str]] = None):
         """ Method to return all data from the paralympics .db file.
 
         Doesn't currently include games.url, games.highlights, or disabilities
 
+        Args:
+            columns: names from ALL_DATA_COLUMNS to select, or None for every column
+
         Returns:
             data: json format data
 
         Raises:
+            ValueError: if a column is not in ALL_DATA_COLUMNS
             e: Exception
         """
-        sql = (
-            "SELECT country.country_name, games.event_type, games.year, games.start_date, "
-            "games.end_date, host.place_name, games.events, games.sports, games.countries, "
-            "games.participants_m, games.participants_f, games.participants, host.latitude, "
-            "host.longitude "
-            "FROM games "
-            "JOIN games_host ON games.id = games_host.games_id "
-            "JOIN host ON games_host.host_id = host.id "
-            "JOIN country ON host.country_id = country.id"
-        )
+        columns = list(ALL_DATA_COLUMNS) if columns is None else list(columns)
+        unknown = [col for col in columns if col not in ALL_DATA_COLUMNS]
+        if unknown or not columns:
+            raise ValueError(f"Unknown columns: {', '.join(unknown) or 'none given'}")
+        select = ", ".join(f'{ALL_DATA_COLUMNS[col]} AS "{col}"' for col in columns)
+        sql = f"SELECT {select} {_ALL_DATA_FROM}"
         try:
             conn = sqlite3.connect(self.database_file)
             with conn:
@@ -131,6 +221,73 @@ class ParalympicsData:
             if conn:
                 conn.close()
 
+    def get_all_data_page(self, offset: int = 0, limit: int = 100,
+                          sort_by: Sequence[Tuple[str, bool]] = (),
+                          filters: Sequence[Tuple[str, str, Any]] = ()
+                          ) -> Tuple[List[Dict], int]:
+        """ Return one page of the get_all_data rows, sorted and filtered in SQL.
+
+        Only the rows on the page are read from the database, so the grids in the apps can page
+        through the data without sending all of it to the browser.
+
+        Args:
+            offset: number of matching rows to skip
+            limit: maximum number of rows to return
+            sort_by: (column, descending) pairs, the first is the main sort order
+            filters: (column, operator, value) triples that every row must match. The operators
+                are in FILTER_OPERATORS, the value of 'inRange' is a (from, to) pair and 'blank'
+                and 'notBlank' ignore the value.
+
+        Returns:
+            rows: the rows on the page, as dicts
+            total: number of rows that match the filters
+
+        Raises:
+            ValueError: if a column or operator is not valid
+        """
+        where, params = [], []
+        for column, operator, value in filters:
+            expr = self._all_data_column(column)
+            if operator in _FILTER_SQL:
+                clause, pattern = _FILTER_SQL[operator]
+                if "LIKE" in clause:
+                    escaped = str(value).replace("\\", "\\\\")
+                    value = pattern.format(escaped.replace("%", "\\%").replace("_", "\\_"))
+                where.append(clause.format(expr))
+                params.append(value)
+            elif operator == "inRange":
+                where.append(f"{expr} BETWEEN ? AND ?")
+                params.extend(value)
+            elif operator in ("blank", "notBlank"):
+                where.append(f"{expr} IS {'' if operator == 'blank' else 'NOT '}NULL")
+            else:
+                raise ValueError(f"Unknown filter operator '{operator}'")
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        order = [f"{self._all_data_column(column)} {'DESC' if descending else 'ASC'}"
+                 for column, descending in sort_by]
+        # Ties are broken by the ids so that the pages don't overlap
+        order_sql = " ORDER BY " + ", ".join(order + ["games.id", "host.id"])
+
+        conn = sqlite3.connect(self.database_file)
+        try:
+            conn.row_factory = sqlite3.Row
+            count_sql = f"SELECT COUNT(*) {_ALL_DATA_FROM}{where_sql}"
+            total = conn.execute(count_sql, params).fetchone()[0]
+            columns = ", ".join(f"{expr} AS {name}" for name, expr in ALL_DATA_COLUMNS.items())
+            rows = conn.execute(
+                f"SELECT {columns} {_ALL_DATA_FROM}{where_sql}{order_sql} LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            return [dict(row) for row in rows], total
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _all_data_column(column: str) -> str:
+        if column not in ALL_DATA_COLUMNS:
+            raise ValueError(f"Unknown column '{column}'")
+        return ALL_DATA_COLUMNS[column]
+
     def get_row_by_id(self, table_name: str, item_id):
         if table_name not in self.tables:
             raise RuntimeError(f"Table {table_name} does not exist")
@@ -149,6 +306,44 @@ class ParalympicsData:
         finally:
             conn.close()
 
+    def get_rows_by_ids(self, table_name: str, ids: Sequence, chunk_size: int = 500) -> List[
+            Optional[Dict]]:
+        """ Get several rows by primary key (or rowid) using WHERE ... IN (...) queries.
+
+        The ids are queried in chunks of chunk_size to stay below SQLite's limit on the number of
+        query parameters, all chunks are read in one connection.
+
+        Args:
+            table_name: name of the database table
+            ids: ids of the rows, duplicates are allowed
+            chunk_size: maximum number of ids in each query
+
+        Returns:
+            rows: one entry for each id in the order requested, None where the id was not found
+        """
+        if table_name not in self.tables:
+            raise RuntimeError(f"Table {table_name} does not exist")
+        pk = self._get_pk_column(table_name)
+        key_col = f"\"{pk}\"" if pk else "rowid"
+        unique_ids = list(dict.fromkeys(str(i) for i in ids))
+        found = {}
+        conn = sqlite3.connect(self.database_file)
+        try:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                placeholders = ", ".join("?" for _ in chunk)
+                sql = (f"SELECT {key_col} AS _key, * FROM '{table_name}' "
+                       f"WHERE {key_col} IN ({placeholders})")
+                cur.execute(sql, chunk)
+                for row in cur.fetchall():
+                    row = dict(row)
+                    found[str(row.pop("_key"))] = row
+        finally:
+            conn.close()
+        return [found.get(str(i)) for i in ids]
+
     def search_table(self, table_name: str, filters: Dict[str, str]):
         if table_name not in self.tables:
             raise RuntimeError(f"Table {table_name} does not exist")
@@ -172,7 +367,113 @@ class ParalympicsData:
         finally:
             conn.close()
 
+    def get_host_clusters(self, zoom: int, cells_per_tile: int = 4,
+                          max_names: int = 10) -> List[Dict]:
+        """ Bin the location of every Paralympics into grid cells sized for a map zoom level.
+
+        At zoom level z a web map tile spans 360 / 2**z degrees, each tile is split into
+        cells_per_tile x cells_per_tile cells. The binning and counting is done in SQL so only one
+        row per non-empty cell is returned, however many games there are. A games with joint
+        hosts is counted once for each host.
+
+        Args:
+            zoom: map zoom level, 0 (whole world) to 20
+            cells_per_tile: number of cells across a map tile
+            max_names: maximum number of 'place year' names listed for each cluster
+
+        Returns:
+            clusters: list of {"latitude", "longitude", "count", "names"}, the latitude and
+                longitude are the mean position of the games in the cell
+        """
+        cell = 360 / (2 ** zoom) / cells_per_tile
+        sql = (
+            "SELECT CAST((host.latitude + 90) / ? AS INTEGER) AS cell_row, "
+            "CAST((host.longitude + 180) / ? AS INTEGER) AS cell_col, "
+            "COUNT(*) AS count, AVG(host.latitude) AS latitude, AVG(host.longitude) AS longitude, "
+            "GROUP_CONCAT(host.place_name || ' ' || games.year, '|') AS names "
+            "FROM games "
+            "JOIN games_host ON games.id = games_host.games_id "
+            "JOIN host ON games_host.host_id = host.id "
+            "WHERE host.latitude IS NOT NULL AND host.longitude IS NOT NULL "
+            "GROUP BY cell_row, cell_col"
+        )
+        conn = sqlite3.connect(self.database_file)
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(sql, (cell, cell)).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "count": row["count"],
+                "names": (row["names"] or "").split("|")[:max_names],
+            }
+            for row in rows
+        ]
+
+    def get_quiz_bundle(self, offset: int = 0, limit: int = 1) -> Dict:
+        """ Get the number of questions and a page of questions with their response options.
+
+        The responses do not include is_correct, use check_response() to check an answer.
+
+        Args:
+            offset: number of questions to skip, questions are ordered by id
+            limit: maximum number of questions to return
+
+        Returns:
+            bundle: {"count": <number of questions>, "offset": offset,
+                     "questions": [{"id", "question_text", "responses": [{"id", "response_text"}]}]}
+        """
+        conn = sqlite3.connect(self.database_file)
+        try:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            count = cur.execute("SELECT COUNT(*) FROM question").fetchone()[0]
+            cur.execute("SELECT id, question_text FROM question ORDER BY id LIMIT ? OFFSET ?",
+                        (limit, offset))
+            questions = [dict(row, responses=[]) for row in cur.fetchall()]
+            if questions:
+                by_id = {q["id"]: q for q in questions}
+                placeholders = ", ".join("?" for _ in by_id)
+                cur.execute(
+                    "SELECT id, question_id, response_text FROM response "
+                    f"WHERE question_id IN ({placeholders}) ORDER BY id", tuple(by_id))
+                for row in cur.fetchall():
+                    by_id[row["question_id"]]["responses"].append(
+                        {"id": row["id"], "response_text": row["response_text"]})
+            return {"count": count, "offset": offset, "questions": questions}
+        finally:
+            conn.close()
+
+    def check_response(self, question_id: int, response_id: int) -> Optional[bool]:
+        """ Check whether a response is the correct answer to a question.
+
+        Returns:
+            True or False, or None if the response does not belong to the question
+        """
+        row = self.get_row_by_id("response", response_id)
+        if row is None or row["question_id"] != question_id:
+            return None
+        return bool(row["is_correct"])
+
     def add_row(self, table_name: str, row: Dict):
+        """ Insert a row and return it as stored in the database.
+
+        Inserts from concurrent callers are coalesced by the write-behind queue and committed
+        together, each caller still receives its own inserted row.
+
+        Args:
+            table_name: name of the database table
+            row: column names and values, unknown columns are ignored
+
+        Returns:
+            row: the inserted row as a dictionary
+
+        Raises:
+            RuntimeError: if the table does not exist, no valid columns are given or the insert fails
+        """
         if table_name not in self.tables:
             raise RuntimeError(f"Table {table_name} does not exist")
         cols = self._get_columns(table_name)
@@ -183,28 +484,46 @@ class ParalympicsData:
         columns = ", ".join(f"\"{c}\"" for c in data.keys())
         placeholders = ", ".join("?" for _ in data)
         sql = f"INSERT INTO '{table_name}' ({columns}) VALUES ({placeholders})"
-        conn = sqlite3.connect(self.database_file)
         try:
-            cur = conn.cursor()
-            cur.execute(sql, tuple(data.values()))
-            conn.commit()
-            last_id = cur.lastrowid
-            # return the inserted row (by primary key if available)
-            pk = self._get_pk_column(table_name)
-            if pk:
-                return self.get_row_by_id(table_name, last_id)
-            else:
-                # no pk, return the last inserted row via rowid
-                return self.get_row_by_id(table_name, last_id)
-        finally:
-            conn.close()
+            last_id = self.writer.submit(sql, tuple(data.values()))
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Error inserting into {table_name}: {e}") from e
+        # return the inserted row (by primary key if available, otherwise via rowid)
+        return self.get_row_by_id(table_name, last_id)
+
+    def snapshot(self) -> DatabaseSnapshot:
+        """ Copy the database into memory using the SQLite backup API.
+
+        Returns:
+            snapshot: DatabaseSnapshot to pass to restore(), close it when no longer needed
+        """
+        return snapshot_file(self.database_file)
+
+    def restore(self, snapshot: DatabaseSnapshot) -> bool:
+        """ Put the database back to the state it was in when the snapshot was taken.
+
+        Nothing is copied if the database has not been written to since the snapshot was taken
+        or last restored.
+
+        Args:
+            snapshot: DatabaseSnapshot returned by snapshot()
+
+        Returns:
+            True if the database was restored, False if it was unchanged
+        """
+        return restore_file(snapshot, self.database_file)
+
+    def close(self):
+        """ Stop the write-behind queue once any queued inserts have been committed."""
+        self.writer.close()
 
 
 # Example of a function that gets data from an excel file and returns in JSON format
 def get_event_data():
     """ Method to return the data from the paralympics .xlsx file.
 
-    NB: This is a simplified return of all data without validation.
+    NB: This is a simplified return of all data without validation. For a DataFrame use
+    get_event_dataframe(), which does not convert the data to JSON and back.
 
     Returns:
         json_data: json format paralympics data
@@ -214,7 +533,7 @@ def get_event_data():
         FileNotFoundError: if no event file was found
 
         """
-    data_file = Path(__file__).parent.joinpath("paralympics.xlsx")
+    data_file = EVENT_DATA_FILE
     try:
         if not data_file.exists():
             raise FileNotFoundError(f"Data file not found: {data_file}")
@@ -233,6 +552,67 @@ def get_event_data():
         raise RuntimeError(f"Unexpected error loading event data: {e}") from e
 
 
+def load_event_dataframe() -> pd.DataFrame:
+    """ Read the paralympics .xlsx file into a DataFrame with the column types in EVENT_DATA_DTYPES.
+
+    The start and end dates are parsed, type and host are categorical and the counts are nullable
+    integers, so a missing count is <NA> rather than making the column float. Other columns are
+    read as text.
+
+    Returns:
+        df: pandas DataFrame with the paralympics event data
+
+    Raises:
+        RuntimeError: if the data could not be read or does not have the expected columns
+        FileNotFoundError: if no event file was found
+    """
+    if not EVENT_DATA_FILE.exists():
+        raise FileNotFoundError(f"Data file not found: {EVENT_DATA_FILE}")
+    try:
+        df = pd.read_excel(EVENT_DATA_FILE)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+        raise RuntimeError(f"Error reading XLSX {EVENT_DATA_FILE}: {e}") from e
+    missing = [col for col in [*EVENT_DATA_DTYPES, *EVENT_DATA_DATES] if col not in df.columns]
+    if missing:
+        raise RuntimeError(f"Columns missing from {EVENT_DATA_FILE}: {', '.join(missing)}")
+    try:
+        for col in EVENT_DATA_DATES:
+            df[col] = pd.to_datetime(df[col], dayfirst=True)
+        # Some cells have trailing spaces, e.g. 'winter ', which would be separate categories
+        for col, dtype in EVENT_DATA_DTYPES.items():
+            if dtype == "category":
+                df[col] = df[col].str.strip()
+        return df.astype(EVENT_DATA_DTYPES)
+    except (TypeError, ValueError) as e:
+        raise RuntimeError(f"Unexpected values in {EVENT_DATA_FILE}: {e}") from e
+
+
+def get_event_dataframe() -> pd.DataFrame:
+    """ Return the typed event data from load_event_dataframe, shared by every caller in the process.
+
+    The file is read once for each version of it, get_event_data_version() is checked on each call.
+    The same DataFrame is returned to every caller so it must not be modified, use df.copy() first.
+    """
+    version = get_event_data_version()
+    with _event_dataframe_lock:
+        if _event_dataframe["version"] != version:
+            _event_dataframe["df"] = load_event_dataframe()
+            _event_dataframe["version"] = version
+        return _event_dataframe["df"]
+
+
+def get_event_data_version():
+    """ Return a version string for the paralympics .xlsx file that changes when the file changes.
+
+    Returns:
+        version: the modification time of the file in nanoseconds, as a string
+
+    Raises:
+        FileNotFoundError: if no event file was found
+    """
+    return str(EVENT_DATA_FILE.stat().st_mtime_ns)
+
+
 def add_quiz_data():
     """ Method to add question data to the paralympics database."""
     database_file = Path(__file__).parent.joinpath("paralympics.db")
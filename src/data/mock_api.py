@@ -5,17 +5,41 @@
  do not use this as an example for coursework 2!
 
  """
-from typing import Callable
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
 
+import pandas as pd
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import RedirectResponse
+from starlette.responses import JSONResponse, RedirectResponse, Response
 
-from data.data_class import ParalympicsData
+from data.data_class import ALL_DATA_COLUMNS, ParalympicsData
+from utils.admission import AdmissionControlMiddleware, AdmissionController, RouteClass
+from utils.figures import (BAR_CHART_COLUMNS, LINE_CHART_COLUMNS, LINE_CHART_FEATURES, MAP_COLUMNS,
+                           FigureJSONCache, bar_figure, line_figure, map_figure)
+from utils.render_mode import RENDER_MODES
 
 app = FastAPI(title="Mock Paralympics API")
 
+# Limit the number of requests processed at once. /all is the most expensive route so it has its own
+# smaller limit, then writes, then everything else. Excess requests wait in a bounded queue and
+# are rejected with 503 + Retry-After when the queue is full or they have waited too long.
+admission = AdmissionController(
+    [
+        RouteClass("bulk", max_concurrency=4, max_queue=16, queue_timeout=2.0,
+                   paths=("/all", "/batch")),
+        RouteClass("write", max_concurrency=8, max_queue=64, queue_timeout=2.0,
+                   methods=("POST",)),
+        RouteClass("default", max_concurrency=32, max_queue=128, queue_timeout=1.0),
+    ],
+    exempt_paths=("/", "/docs", "/redoc", "/openapi.json", "/metrics/admission"),
+)
+# Added before CORSMiddleware so that the 503 responses also get the CORS headers
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
 origins = [
     "http://localhost",
     "http://127.0.0.1",
@@ -32,7 +56,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-data = ParalympicsData()
+# Inserts that arrive within MAX_BATCH_LATENCY seconds of each other are committed in one
+# transaction, up to MAX_BATCH_SIZE rows per transaction
+MAX_BATCH_LATENCY = 0.005
+MAX_BATCH_SIZE = 64
+
+data = ParalympicsData(max_batch_latency=MAX_BATCH_LATENCY, max_batch_size=MAX_BATCH_SIZE)
 _tables = data.tables
 
 
@@ -49,6 +78,12 @@ async def root(request: Request):
     raise HTTPException(status_code=404, detail="No API docs configured")
 
 
+@app.get("/metrics/admission", summary="Admission control metrics")
+async def admission_metrics():
+    """Concurrency and queue depth metrics for each route class."""
+    return admission.metrics()
+
+
 def _make_get_all_route(table_name: str) -> Callable:
     """ Create a GET /<table> route to get all data from a table """
 
@@ -109,6 +144,93 @@ def _make_search_route(table_name: str) -> Callable:
     return _route
 
 
+def _multi_get(table_name: str, ids: List[int]) -> Dict[str, Any]:
+    rows = data.get_rows_by_ids(table_name, ids)
+    return {
+        "items": rows,
+        "missing": [i for i, row in zip(ids, rows) if row is None],
+    }
+
+
+def _parse_ids(value: str) -> List[int]:
+    """ Return the ids in a comma separated ids query parameter as integers.
+
+    Raises:
+        ValueError: if an id is not an integer
+    """
+    try:
+        return [int(i) for i in value.split(",") if i.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma separated list of integers")
+
+
+def _check_ids(ids: List[Any]) -> List[int]:
+    """ Return the ids from a JSON body, which must all be integers.
+
+    Raises:
+        ValueError: if an id is not an integer
+    """
+    if any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+        raise ValueError("ids must be a list of integers")
+    return ids
+
+
+def _make_multi_get_route(table_name: str) -> Callable:
+    """
+    Create a GET '/<table>/multi?ids=1,2,3' route to get several rows in one request.
+
+    Usage:
+    - Provide a comma separated list of primary key values in the 'ids' query parameter.
+    - The rows are fetched with a single WHERE ... IN (...) query (chunked for long lists).
+
+    Responses:
+    - 200: {"items": [...], "missing": [...]}. "items" has one entry per id in the order requested,
+      null where there is no row with that id. "missing" lists the ids that were not found.
+    - 400: no ids provided, or an id is not an integer.
+    """
+
+    async def _route(ids: str = ""):
+        try:
+            id_list = _parse_ids(ids)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        if not id_list:
+            raise HTTPException(status_code=400, detail="Provide ids, e.g. ?ids=1,2,3")
+        try:
+            return await run_in_threadpool(_multi_get, table_name, id_list)
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=str(exc))
+
+    return _route
+
+
+def _make_multi_post_route(table_name: str) -> Callable:
+    """
+    Create a POST '/<table>/multi' route, the same as GET '/<table>/multi' but the ids are sent as
+    a JSON body {"ids": [1, 2, 3]}. Use this when the list of ids is too long for a URL.
+    """
+
+    async def _route(request: Request):
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be JSON")
+        ids = payload.get("ids") if isinstance(payload, dict) else None
+        if not isinstance(ids, list) or not ids:
+            raise HTTPException(status_code=400,
+                                detail="Request body must be a JSON object with an 'ids' list")
+        try:
+            ids = _check_ids(ids)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        try:
+            return await run_in_threadpool(_multi_get, table_name, ids)
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=str(exc))
+
+    return _route
+
+
 def _make_post_route(table_name: str) -> Callable:
     """
     Create a POST '/<table>' route to insert a new row.
@@ -124,6 +246,10 @@ def _make_post_route(table_name: str) -> Callable:
     - 400: request body is not a JSON object.
     - 500: database or server errors (for example, no valid columns provided for insert).
 
+    Concurrent POSTs are not written one at a time: the insert runs in the thread pool and joins
+    the ParalympicsData write-behind queue, which commits the inserts that arrive together in a
+    single transaction.
+
     Example:
     curl -X POST 'http://localhost:8000/{table}' \\
          -H 'Content-Type: application/json' \\
@@ -135,7 +261,7 @@ def _make_post_route(table_name: str) -> Callable:
             payload = await request.json()
             if not isinstance(payload, dict):
                 raise HTTPException(status_code=400, detail="Request body must be a JSON object")
-            new_row = data.add_row(table_name, payload)
+            new_row = await run_in_threadpool(data.add_row, table_name, payload)
             return new_row
         except HTTPException:
             raise
@@ -145,19 +271,358 @@ def _make_post_route(table_name: str) -> Callable:
     return _route
 
 
+# Host clusters for each zoom level of the current data version, see GET /map/clusters
+MAX_ZOOM = 20
+_cluster_cache: Dict[str, Any] = {"version": None, "zooms": {}}
+
+
+def _get_clusters(zoom: int) -> List[Dict[str, Any]]:
+    version = data.data_version()
+    if version != _cluster_cache["version"]:
+        _cluster_cache["version"] = version
+        _cluster_cache["zooms"] = {}
+    zooms = _cluster_cache["zooms"]
+    if zoom not in zooms:
+        zooms[zoom] = data.get_host_clusters(zoom)
+    return zooms[zoom]
+
+
+@app.get("/map/clusters", summary="Host locations clustered for a map zoom level")
+async def map_clusters(zoom: int = 2):
+    """
+    The locations of the Paralympics binned into a grid for a map zoom level, with a count for each
+    cell, so a map can draw one marker per cluster rather than one per games.
+
+    Usage:
+    - /map/clusters?zoom=2, zoom is the map zoom level from 0 (whole world) to MAX_ZOOM.
+    - The result for each zoom level is cached until the data changes.
+
+    Responses:
+    - 200: list of {"latitude", "longitude", "count", "names"}.
+    - 400: zoom is out of range.
+    """
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"zoom must be between 0 and {MAX_ZOOM}")
+    try:
+        return await run_in_threadpool(_get_clusters, zoom)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+# Chart figures for each data version, see the GET /charts routes
+_figures = FigureJSONCache()
+
+
+async def _chart_response(request: Request, key: Tuple, columns: List[str],
+                          build: Callable[[pd.DataFrame], Any]) -> Response:
+    """ The figure JSON for key, or 304 Not Modified if the client has this data version already.
+
+    The figure is built from the columns of the /all data by build, once per data version.
+    """
+    try:
+        version = data.data_version()
+        etag = f'"{version}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        fig_json = await run_in_threadpool(
+            _figures.get, version, key, lambda: build(pd.DataFrame(data.get_all_data(columns))))
+        return Response(content=fig_json, media_type="application/json", headers={"ETag": etag})
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+def _check_render_mode(render_mode: str) -> None:
+    if render_mode not in RENDER_MODES:
+        raise HTTPException(status_code=400,
+                            detail=f"render_mode must be one of {list(RENDER_MODES)}")
+
+
+@app.get("/charts/trend", summary="Line chart of a feature over time")
+async def chart_trend(request: Request, feature: str, max_points: Optional[int] = None,
+                      render_mode: str = "auto"):
+    """
+    Plotly figure JSON for the line chart of a feature over time for the winter and summer events.
+
+    Usage:
+    - /charts/trend?feature=sports, feature is sports, participants, events or countries.
+    - Add max_points to downsample the series to at most that many points, and render_mode (auto,
+      svg or webgl) to choose how the figure is drawn.
+
+    Responses:
+    - 200: the figure JSON, with the data version as the ETag, as for /all.
+    - 304: the If-None-Match header has the ETag and the data has not changed.
+    - 400: feature, max_points or render_mode is not valid.
+    """
+    feature = feature.lower()
+    if feature not in LINE_CHART_FEATURES:
+        raise HTTPException(status_code=400, detail=f"feature must be one of {LINE_CHART_FEATURES}")
+    if max_points is not None and max_points < 6:
+        raise HTTPException(status_code=400, detail="max_points must be at least 6")
+    _check_render_mode(render_mode)
+    return await _chart_response(request, ("trend", feature, max_points, render_mode),
+                                 LINE_CHART_COLUMNS,
+                                 lambda df: line_figure(df, feature, max_points, render_mode))
+
+
+@app.get("/charts/gender-ratio", summary="Bar chart of the male:female participants")
+async def chart_gender_ratio(request: Request, event_type: str):
+    """
+    Plotly figure JSON for the stacked bar chart of the ratio of male to female participants.
+
+    Usage:
+    - /charts/gender-ratio?event_type=summer, event_type is winter or summer.
+
+    Responses:
+    - 200: the figure JSON, with the data version as the ETag, as for /all.
+    - 304: the If-None-Match header has the ETag and the data has not changed.
+    - 400: event_type is not valid.
+    """
+    event_type = event_type.lower()
+    if event_type not in ("winter", "summer"):
+        raise HTTPException(status_code=400, detail="event_type must be winter or summer")
+    return await _chart_response(request, ("gender-ratio", event_type), BAR_CHART_COLUMNS,
+                                 lambda df: bar_figure(df, event_type))
+
+
+@app.get("/charts/hosts", summary="Map of the host locations")
+async def chart_hosts(request: Request, render_mode: str = "auto"):
+    """
+    Plotly figure JSON for the map of the locations of the Paralympics.
+
+    Usage:
+    - /charts/hosts, add render_mode (auto, svg or webgl) to choose how the map is drawn.
+
+    Responses:
+    - 200: the figure JSON, with the data version as the ETag, as for /all.
+    - 304: the If-None-Match header has the ETag and the data has not changed.
+    - 400: render_mode is not valid.
+    """
+    _check_render_mode(render_mode)
+    return await _chart_response(request, ("hosts", render_mode), MAP_COLUMNS,
+                                 lambda df: map_figure(df, render_mode))
+
+
+# Maximum number of questions returned by GET /quiz
+MAX_QUIZ_LIMIT = 50
+
+
+@app.get("/quiz", summary="Question count and a page of questions with their responses")
+async def quiz(request: Request, offset: int = 0, limit: int = 1):
+    """
+    Everything the quiz needs to show a page of questions, in one request.
+
+    Usage:
+    - /quiz?offset=0&limit=5 returns the first 5 questions (ordered by id).
+
+    Responses:
+    - 200: {"count": <number of questions>, "offset": offset, "questions": [{"id", "question_text",
+      "responses": [{"id", "response_text"}]}]}. The responses do not say which is correct, use
+      POST /quiz/answer to check an answer. The ETag is the data version, as for /all.
+    - 304: the If-None-Match header has the ETag and the data has not changed.
+    - 400: offset is negative or limit is not between 1 and MAX_QUIZ_LIMIT.
+    """
+    if offset < 0 or not 1 <= limit <= MAX_QUIZ_LIMIT:
+        raise HTTPException(status_code=400,
+                            detail=f"offset must be >= 0 and limit between 1 and {MAX_QUIZ_LIMIT}")
+    try:
+        etag = f'"{data.data_version()}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        bundle = await run_in_threadpool(data.get_quiz_bundle, offset, limit)
+        return JSONResponse(bundle, headers={"ETag": etag})
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@app.post("/quiz/answer", summary="Check an answer to a quiz question")
+async def quiz_answer(request: Request):
+    """
+    Check whether a response is the correct answer to a question.
+
+    Usage:
+    - Send HTTP POST with a JSON object body {"question_id": 1, "response_id": 3}.
+
+    Responses:
+    - 200: {"correct": true} or {"correct": false}.
+    - 400: the body does not have integer question_id and response_id.
+    - 404: the response does not belong to the question.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    if not isinstance(payload, dict) or not all(
+            isinstance(payload.get(k), int) for k in ("question_id", "response_id")):
+        raise HTTPException(status_code=400,
+                            detail="Request body must have integer question_id and response_id")
+    try:
+        correct = await run_in_threadpool(data.check_response, payload["question_id"],
+                                          payload["response_id"])
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    if correct is None:
+        raise HTTPException(status_code=404, detail="Response not found for this question")
+    return {"correct": correct}
+
+
+# Maximum number of sub-requests accepted by POST /batch
+MAX_BATCH_REQUESTS = 50
+
+
+def _dispatch(method: str, path: str, params: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+    """ Run a single sub-request of a batch against the data, without going through HTTP.
+
+    Supports the same routes as the app: GET /all, GET /<table>, GET /<table>/search,
+    GET /<table>/multi, GET /<table>/{item_id} and POST /<table>.
+
+    Returns:
+        (status code, response body)
+    """
+    split = urlsplit(path)
+    params = {**dict(parse_qsl(split.query)), **{k: str(v) for k, v in params.items()}}
+    parts = [p for p in split.path.split("/") if p]
+    method = method.upper()
+    if method not in ("GET", "POST"):
+        return 405, {"detail": f"Method {method} is not supported in a batch"}
+    try:
+        if parts == ["all"] and method == "GET":
+            try:
+                columns = _parse_fields(params.get("fields"))
+            except ValueError as exc:
+                return 400, {"detail": str(exc)}
+            return 200, data.get_all_data(columns)
+        if not parts or parts[0] not in _tables:
+            return 404, {"detail": "Not Found"}
+        table_name = parts[0]
+        if len(parts) == 1 and method == "GET":
+            return 200, data.get_table_as_json(table_name)
+        if len(parts) == 1 and method == "POST":
+            if not isinstance(body, dict):
+                return 400, {"detail": "Request body must be a JSON object"}
+            return 200, data.add_row(table_name, body)
+        if len(parts) == 2 and method == "GET" and parts[1] == "search":
+            return 200, data.search_table(table_name, params)
+        if len(parts) == 2 and method == "GET" and parts[1] == "multi":
+            try:
+                ids = _parse_ids(params.get("ids", ""))
+            except ValueError as exc:
+                return 400, {"detail": str(exc)}
+            if not ids:
+                return 400, {"detail": "Provide ids, e.g. ?ids=1,2,3"}
+            return 200, _multi_get(table_name, ids)
+        if len(parts) == 2 and method == "GET":
+            try:
+                item_id = int(parts[1])
+            except ValueError:
+                return 422, {"detail": "item_id must be an integer"}
+            row = data.get_row_by_id(table_name, item_id)
+            if row is None:
+                return 404, {"detail": "Item not found"}
+            return 200, row
+        return 404, {"detail": "Not Found"}
+    except Exception as exc:
+        return 500, {"detail": str(exc)}
+
+
+@app.post("/batch", summary="Run several requests in one round trip")
+async def batch(request: Request):
+    """
+    Run a list of sub-requests against the table routes concurrently and return all the results.
+
+    Usage:
+    - Send HTTP POST to /batch with a JSON object body {"requests": [...]}.
+    - Each sub-request is an object with "path", and optionally "method" (default GET),
+      "params" (query parameters) and "body" (JSON body for a POST).
+    - Supported routes are GET /all, GET /<table>, GET /<table>/search, GET /<table>/multi,
+      GET /<table>/{item_id} and POST /<table>.
+    - Sub-requests are independent and run concurrently, so one may not rely on another's result.
+
+    Responses:
+    - 200: {"responses": [{"status": <code>, "body": <result>}, ...]} in the order of the requests.
+      A failing sub-request reports its own status code, it does not fail the whole batch. A
+      method other than GET or POST gets a 405 for that sub-request.
+    - 400: the body is not valid, e.g. a method that is not a string, or has more than
+      MAX_BATCH_REQUESTS sub-requests.
+
+    Example:
+    curl -X POST 'http://localhost:8000/batch' \\
+         -H 'Content-Type: application/json' \\
+         -d '{"requests": [{"path": "/question/1"},
+                           {"path": "/response/search", "params": {"question_id": 1}}]}'
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    sub_requests = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(sub_requests, list):
+        raise HTTPException(status_code=400, detail="Request body must have a 'requests' list")
+    if len(sub_requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(status_code=400,
+                            detail=f"A batch can have at most {MAX_BATCH_REQUESTS} requests")
+    for sub in sub_requests:
+        if not isinstance(sub, dict) or not isinstance(sub.get("path"), str) \
+                or not isinstance(sub.get("params", {}), dict) \
+                or not isinstance(sub.get("method", "GET"), str):
+            raise HTTPException(status_code=400,
+                                detail="Each request must be an object with a 'path' string and "
+                                       "an optional 'method' string")
+
+    results = await asyncio.gather(*(
+        run_in_threadpool(_dispatch, sub.get("method", "GET"), sub["path"],
+                          sub.get("params", {}), sub.get("body"))
+        for sub in sub_requests
+    ))
+    return {"responses": [{"status": status, "body": body} for status, body in results]}
+
+
 # create the routes for each table
 for _t in _tables:
     app.get(f"/{_t}", name=f"{_t}_all")(_make_get_all_route(_t))
     app.get(f"/{_t}/search", name=f"{_t}_search")(_make_search_route(_t))
+    app.get(f"/{_t}/multi", name=f"{_t}_multi_get")(_make_multi_get_route(_t))
+    app.post(f"/{_t}/multi", name=f"{_t}_multi_post")(_make_multi_post_route(_t))
     app.get(f"/{_t}/{{item_id}}", name=f"{_t}_get")(_make_get_by_id_route(_t))
     app.post(f"/{_t}", name=f"{_t}_post")(_make_post_route(_t))
 
 
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """ Return the column names in a fields query parameter, or None for every column.
+
+    Raises:
+        ValueError: if a name is not a column of the chart data
+    """
+    if fields is None:
+        return None
+    columns = [col.strip() for col in fields.split(",") if col.strip()]
+    unknown = [col for col in columns if col not in ALL_DATA_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or 'none given'}")
+    return columns
+
+
 # Create a route to get data for the charts
 @app.get("/all")
-async def get_all():
+async def get_all(request: Request, fields: Optional[str] = None):
+    """
+    Data from the joined tables for the charts.
+
+    Pass fields, a comma separated list of column names, to only get those columns, e.g.
+    /all?fields=event_type,year,participants. An unknown column gets a 400 response.
+
+    The response has an ETag with the data version. Send it back in an If-None-Match header and
+    the API returns 304 Not Modified, without a body, if the data has not changed.
+    """
+    try:
+        columns = _parse_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     try:
-        return data.get_all_data()
+        etag = f'"{data.data_version()}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        rows = await run_in_threadpool(data.get_all_data, columns)
+        return JSONResponse(rows, headers={"ETag": etag})
     except AttributeError:
         raise HTTPException(status_code=500, detail="ParalympicsData.get_json not implemented")
     except Exception as exc:
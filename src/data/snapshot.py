@@ -0,0 +1,101 @@
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+
+def file_change_counter(database_file: Path) -> int:
+    """ Read the file change counter from the database header.
+
+    SQLite increments the counter every time a transaction changes the database file (in the
+    default rollback journal mode), so an unchanged counter means an unchanged database.
+    """
+    with open(database_file, "rb") as f:
+        f.seek(24)
+        return int.from_bytes(f.read(4), "big")
+
+
+class DatabaseSnapshot:
+    """ In-memory copy of a SQLite database made with the SQLite backup API.
+
+    Taking and restoring a snapshot copies database pages rather than files, so it takes
+    milliseconds for a database the size of paralympics.db and is safe while other connections
+    have the database open.
+
+    Usage:
+        snapshot = DatabaseSnapshot(conn)   # copy the database into memory
+        ...                                 # change the database
+        snapshot.restore(conn)              # put it back as it was
+        snapshot.close()
+
+    Attributes:
+        change_counter: file change counter of the database when it was last in the snapshot state,
+            if known. Used to skip restores when nothing has been written.
+
+    Args:
+        source: open connection to the database to copy
+        change_counter: file change counter of the source database, if known
+    """
+
+    def __init__(self, source: sqlite3.Connection, change_counter: Optional[int] = None):
+        self._memory = sqlite3.connect(":memory:", check_same_thread=False)
+        source.backup(self._memory)
+        self.change_counter = change_counter
+
+    def restore(self, target: sqlite3.Connection) -> None:
+        """ Overwrite the target database with the contents of the snapshot.
+
+        Args:
+            target: open connection to the database to restore
+        """
+        if self._memory is None:
+            raise RuntimeError("Snapshot has been closed")
+        self._memory.backup(target)
+
+    def close(self) -> None:
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def restore_file(snapshot: DatabaseSnapshot, database_file: Path) -> bool:
+    """ Restore a snapshot to a database file, unless the file has not changed since the snapshot.
+
+    Args:
+        snapshot: the snapshot to restore
+        database_file: path to the database file
+
+    Returns:
+        True if the database was restored, False if it was unchanged
+    """
+    if snapshot.change_counter is not None \
+            and file_change_counter(database_file) == snapshot.change_counter:
+        return False
+    conn = sqlite3.connect(database_file, timeout=30)
+    try:
+        snapshot.restore(conn)
+    finally:
+        conn.close()
+    snapshot.change_counter = file_change_counter(database_file)
+    return True
+
+
+def snapshot_file(database_file: Path) -> DatabaseSnapshot:
+    """ Take a snapshot of a database file.
+
+    Args:
+        database_file: path to the database file
+
+    Returns:
+        snapshot: DatabaseSnapshot, close it when no longer needed
+    """
+    conn = sqlite3.connect(database_file)
+    try:
+        return DatabaseSnapshot(conn, change_counter=file_change_counter(database_file))
+    finally:
+        conn.close()
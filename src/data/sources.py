@@ -0,0 +1,180 @@
+""" Chart data sources with interchangeable backends
+
+The charts need the same columns whichever way an app gets its data. A ChartDataSource returns
+the chart data as a DataFrame with the chart column names, the names of the joined data in
+ALL_DATA_COLUMNS (event_type, place_name, ...), so chart code does not depend on the backend:
+
+- SQLiteSource queries the paralympics database directly
+- EventFileSource reads the paralympics .xlsx file, mapping its column names (type, host, ...)
+- ColumnarFileSource keeps a copy of another source in a Parquet file, rewritten when the other
+  source's version changes and shared by every process that uses the same path (needs pyarrow)
+- RESTSource in paralympics.data_client fetches the data from the REST API
+
+get_dataframe(columns) only reads the columns asked for where the backend allows it: the SQL
+selects only those columns and Parquet only reads those columns from the file.
+
+Usage:
+    source = ColumnarFileSource(SQLiteSource())
+    df = source.get_dataframe(["event_type", "year", "participants"])
+    source.version()   # changes when the data changes
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from data.columns import EVENT_FILE_COLUMNS
+from data.data_class import (_ALL_DATA_FROM, ALL_DATA_COLUMNS, get_event_data_version,
+                             get_event_dataframe)
+from data.snapshot import file_change_counter
+from utils.disk_cache import private_cache_dir
+
+# The column names every source returns
+CHART_COLUMNS = list(ALL_DATA_COLUMNS)
+COLUMNAR_FILE_NAME = "chart_data.parquet"  # file in private_cache_dir()
+READ_ATTEMPTS = 3  # reads of a columnar file that another process removes before giving up
+
+
+class ChartDataSource(ABC):
+    """ Base class for a source of the chart data.
+
+    A subclass implements version() and _read(), and sets column_map if its column names differ
+    from the chart column names.
+
+    Attributes:
+        columns: the chart column names the source has
+        column_map: dict of the source's column names to the chart column names they are returned as
+
+    Methods:
+        get_dataframe(self, columns): Returns the data, only the columns asked for if given
+        version(self): Returns a version string that changes when the data changes
+    """
+    columns: List[str] = CHART_COLUMNS
+    column_map: Dict[str, str] = {}
+
+    def get_dataframe(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """ Return the data with the chart column names.
+
+        Args:
+            columns: the chart columns to return, in this order, or None for every column
+
+        Returns:
+            df: the data, shared with other callers for some sources so it must not be modified
+
+        Raises:
+            ValueError: if a column is not one the source has
+        """
+        wanted = list(self.columns) if columns is None else list(columns)
+        unknown = [col for col in wanted if col not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown chart columns: {', '.join(unknown)}")
+        source_names = {chart: name for name, chart in self.column_map.items()}
+        df = self._read([source_names.get(col, col) for col in wanted])
+        return df.rename(columns=self.column_map)[wanted]
+
+    @abstractmethod
+    def version(self) -> str:
+        """ Return a version string that changes when the data changes."""
+
+    @abstractmethod
+    def _read(self, columns: List[str]) -> pd.DataFrame:
+        """ Return the columns with the source's names."""
+
+
+class SQLiteSource(ChartDataSource):
+    """ Chart data queried from the paralympics database, only the columns asked for are selected.
+
+    Args:
+        database_file: path to the SQLite database, the paralympics database if None
+    """
+
+    def __init__(self, database_file: Optional[Path] = None):
+        if database_file is None:
+            database_file = Path(__file__).parent.joinpath("paralympics.db")
+        self.database_file = Path(database_file)
+
+    def version(self) -> str:
+        return str(file_change_counter(self.database_file))
+
+    def _read(self, columns: List[str]) -> pd.DataFrame:
+        select = ", ".join(f'{ALL_DATA_COLUMNS[col]} AS "{col}"' for col in columns)
+        with closing(sqlite3.connect(self.database_file)) as conn:
+            return pd.read_sql_query(f"SELECT {select} {_ALL_DATA_FROM}", conn)
+
+
+class EventFileSource(ChartDataSource):
+    """ Chart data from the paralympics .xlsx file, read once for each version of the file."""
+    column_map = EVENT_FILE_COLUMNS
+
+    def version(self) -> str:
+        return get_event_data_version()
+
+    def _read(self, columns: List[str]) -> pd.DataFrame:
+        return get_event_dataframe()[columns]
+
+
+class ColumnarFileSource(ChartDataSource):
+    """ A copy of another source in a Parquet file, only the columns asked for are read from it.
+
+    The file name includes a hash of the other source's version. When the version changes the data
+    is read from the other source and written to a new file, and the files for older versions are
+    removed. Processes using the same path share the files: once one process has written the file
+    for a version, the others read it rather than the other source. Processes that find no file
+    for a version at the same time each read the other source and write it.
+
+    A process may remove the file for a version another process is about to read, when it has
+    written the file for a newer version. The read is then tried again with the current version.
+
+    Args:
+        source: the source the data is copied from
+        path: path for the Parquet file, the version hash is added before the suffix,
+            COLUMNAR_FILE_NAME in private_cache_dir() if None
+    """
+
+    def __init__(self, source: ChartDataSource, path: Optional[Path] = None):
+        self.source = source
+        self.path = private_cache_dir().joinpath(COLUMNAR_FILE_NAME) if path is None else Path(path)
+        self.columns = list(source.columns)
+        self._lock = threading.Lock()
+
+    def version(self) -> str:
+        return self.source.version()
+
+    def file_for(self, version: str) -> Path:
+        """ Return the path of the Parquet file for a version of the data."""
+        digest = hashlib.sha256(version.encode()).hexdigest()[:16]
+        return self.path.with_name(f"{self.path.stem}.{digest}{self.path.suffix}")
+
+    def _read(self, columns: List[str]) -> pd.DataFrame:
+        for attempt in range(READ_ATTEMPTS):
+            path = self.file_for(self.version())
+            if not path.exists():
+                with self._lock:
+                    if not path.exists():
+                        self._write(path)
+            try:
+                return pd.read_parquet(path, columns=columns)
+            except FileNotFoundError:
+                # Removed by a process that has written the file for a newer version
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    def _write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so another process never reads half a file
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        self.source.get_dataframe().to_parquet(temp, index=False)
+        os.replace(temp, path)
+        for old in self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"):
+            if old != path:
+                try:
+                    old.unlink(missing_ok=True)
+                except OSError:
+                    # Still open in another process on Windows, removed by a later write
+                    pass
@@ -0,0 +1,207 @@
+""" Local store for the Uber pickups dataset used by the demo apps
+
+The demo apps used to download and decompress the CSV from S3, and parse every timestamp, each time
+they needed it. UberDataset does that once:
+
+- the CSV is downloaded in a background thread the first time it is needed and converted to a
+  Parquet file with the timestamps parsed, later reads only load the columns they need from that
+  file. The Parquet files are in this user's private cache directory.
+- until the download has finished, offline, or if the download fails, the small sample bundled in
+  this package is used instead. Set the environment variable COMP0034_OFFLINE=1 to never download
+  the data.
+- the pickups in each hour are counted with np.bincount, once for each version of the file
+
+The columns are lower case: date/time, lat, lon and base, as st.map expects lat and lon.
+
+Usage:
+    dataset = uber_dataset()
+    df = dataset.load(nrows=10000)
+    counts = dataset.hourly_counts()  # pickups in each hour 0-23, over all the rows
+    dataset.path() == dataset.sample_file  # True until the download has finished
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.disk_cache import private_cache_dir
+
+logger = logging.getLogger(__name__)
+
+DATA_URL = ('https://s3-us-west-2.amazonaws.com/'
+            'streamlit-demo-data/uber-raw-data-sep14.csv.gz')
+# A generated sample with the columns and format of the real data, for offline runs and tests
+SAMPLE_FILE = Path(__file__).parent.joinpath("uber_sample.csv.gz")
+STORE_DIR_NAME = "datasets"  # directory in private_cache_dir()
+OFFLINE_ENV = "COMP0034_OFFLINE"
+DATE_COLUMN = "date/time"
+DATE_FORMAT = "%m/%d/%Y %H:%M:%S"
+RETRY_INTERVAL = 300  # seconds before a failed download is tried again
+
+
+def hourly_counts(timestamps: pd.Series) -> np.ndarray:
+    """ Return the number of timestamps in each hour of the day.
+
+    Args:
+        timestamps: datetime Series
+
+    Returns:
+        counts: array of 24 counts, for hours 0 to 23
+    """
+    return np.bincount(timestamps.dt.hour.to_numpy(), minlength=24)
+
+
+class UberDataset:
+    """ The Uber pickups data, stored locally as a Parquet file.
+
+    Attributes:
+        url: URL of the gzipped CSV
+        sample: path to the bundled sample, used until the download has finished, offline, or when
+            the download fails
+        store_dir: directory for the Parquet files, STORE_DIR_NAME in private_cache_dir() if None
+        offline: True to use the sample rather than download the data
+
+    Methods:
+        path(self): Returns the Parquet file, starting the download the first time
+        wait_for_download(self, timeout): Waits for a download that is running to finish
+        version(self, path): Returns a version string that changes when the stored file changes
+        load(self, nrows, columns): Returns the data from the Parquet file
+        hourly_counts(self, path): Returns the pickups in each hour over all the rows
+    """
+
+    def __init__(self, url: str = DATA_URL, sample: Path = SAMPLE_FILE,
+                 store_dir: Optional[Path] = None, offline: Optional[bool] = None):
+        if offline is None:
+            offline = os.environ.get(OFFLINE_ENV, "") not in ("", "0")
+        if store_dir is None:
+            store_dir = private_cache_dir().joinpath(STORE_DIR_NAME)
+        self.url = url
+        self.sample = Path(sample)
+        self.store_dir = Path(store_dir)
+        self.offline = offline
+        self._failed_at: Optional[float] = None
+        self._download: Optional[threading.Thread] = None
+        self._counts: Dict[Tuple[str, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def remote_file(self) -> Path:
+        """ The Parquet file for the downloaded data."""
+        return self.store_dir.joinpath(self.url.rsplit("/", 1)[-1].split(".")[0] + ".parquet")
+
+    @property
+    def sample_file(self) -> Path:
+        """ The Parquet file for the bundled sample."""
+        return self.store_dir.joinpath(self.sample.name.split(".")[0] + ".parquet")
+
+    def path(self) -> Path:
+        """ Return the Parquet file, the downloaded data once there is a file for it, otherwise
+        the sample.
+
+        If there is no file for the downloaded data, the download is started in a background thread
+        and the sample is returned, so a caller never waits for the download.
+        """
+        if self.remote_file.exists():
+            return self.remote_file
+        with self._lock:
+            if self.remote_file.exists():
+                return self.remote_file
+            if not self.offline and self._download is None \
+                    and (self._failed_at is None
+                         or time.monotonic() - self._failed_at > RETRY_INTERVAL):
+                self._download = threading.Thread(target=self._download_remote, daemon=True,
+                                                  name="uber-download")
+                self._download.start()
+            if not self.sample_file.exists():
+                self._convert(self.sample, self.sample_file)
+            return self.sample_file
+
+    def wait_for_download(self, timeout: Optional[float] = None) -> bool:
+        """ Wait for a download started by path() to finish.
+
+        Args:
+            timeout: maximum time to wait in seconds, or None to wait until it finishes
+
+        Returns:
+            True if the downloaded data is stored
+        """
+        download = self._download
+        if download is not None:
+            download.join(timeout)
+        return self.remote_file.exists()
+
+    def version(self, path: Optional[Path] = None) -> str:
+        """ Return the name and modification time of the stored file, e.g. for a cache key.
+
+        Args:
+            path: the file from an earlier call of path(), or None to call path()
+        """
+        path = self.path() if path is None else path
+        return f"{path.name}:{path.stat().st_mtime_ns}"
+
+    def load(self, nrows: Optional[int] = None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """ Return the data, with the date/time column as datetimes.
+
+        Args:
+            nrows: number of rows to return from the start of the data, or None for all of them
+            columns: the columns to read, or None for every column
+
+        Returns:
+            df: DataFrame with the data
+        """
+        df = pd.read_parquet(self.path(), columns=None if columns is None else list(columns))
+        return df if nrows is None else df.head(nrows)
+
+    def hourly_counts(self, path: Optional[Path] = None) -> np.ndarray:
+        """ Return the pickups in each hour 0 to 23 over all the rows, counted once per file.
+
+        Args:
+            path: the file from an earlier call of path(), or None to call path()
+        """
+        path = self.path() if path is None else path
+        key = (str(path), path.stat().st_mtime_ns)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = hourly_counts(pd.read_parquet(path, columns=[DATE_COLUMN])[DATE_COLUMN])
+            self._counts = {key: counts}
+        return counts
+
+    def _download_remote(self) -> None:
+        """ Download and convert the data, run in a background thread by path()."""
+        try:
+            self._convert(self.url, self.remote_file)
+        except Exception:
+            # No network, the download failed or the file is not the CSV expected. Any error is
+            # recorded, so the sample is used and the download is not retried before RETRY_INTERVAL
+            logger.warning("Download of %s failed, using the sample", self.url, exc_info=True)
+            with self._lock:
+                self._failed_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._download = None
+
+    def _convert(self, source, dest: Path) -> None:
+        """ Read the gzipped CSV and write it to dest as Parquet with the timestamps parsed."""
+        df = pd.read_csv(source, compression="gzip")
+        df.columns = [str(col).lower() for col in df.columns]
+        # Parsing with the format is much faster than inferring it for every row
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT)
+        df["base"] = df["base"].astype("category")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so another process never reads half a file
+        temp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+        df.to_parquet(temp, index=False)
+        os.replace(temp, dest)
+
+
+@functools.lru_cache(maxsize=None)
+def uber_dataset() -> UberDataset:
+    """ Return the UberDataset shared by the demo apps in this process."""
+    return UberDataset()
@@ -0,0 +1,169 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+
+class WriteBatcher:
+    """ Write-behind queue that group-commits INSERT statements to a SQLite database.
+
+    Each call to submit() places the statement on a queue and blocks until it has been written.
+    A single writer thread takes statements from the queue and commits all the statements that
+    arrive within max_latency seconds (up to max_batch_size) in one transaction. This means there
+    is one write lock and one fsync per batch instead of one per row.
+
+    Each statement runs inside its own SAVEPOINT, so a failing row is rolled back and reported to
+    its own caller without affecting the other rows in the batch.
+
+    Every submitted statement gets a result or an error: if the writer thread stops, e.g. because
+    the database cannot be opened, the statements still queued for it fail with that error. Each
+    writer thread has its own queue, so a thread started after another one stopped never takes the
+    statements or the stop signal meant for the other.
+
+    Attributes:
+        database_file: path to the database file
+        max_latency: maximum time in seconds a statement waits for others to join its batch
+        max_batch_size: maximum number of statements committed in one transaction
+
+    Methods:
+        submit(self, sql, values): Queues an INSERT and returns the rowid of the inserted row
+        close(self): Stops the writer thread once the queued statements have been written, later
+            calls to submit() raise RuntimeError
+    """
+
+    def __init__(self, database_file: Path, max_latency: float = 0.005, max_batch_size: int = 64):
+        if max_latency < 0:
+            raise ValueError("max_latency must not be negative")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.database_file = database_file
+        self.max_latency = max_latency
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, sql: str, values: Sequence) -> int:
+        """ Queue an INSERT statement and wait until the batch it joined has been committed.
+
+        Args:
+            sql: parameterised INSERT statement
+            values: values for the statement placeholders
+
+        Returns:
+            rowid: the rowid of the inserted row
+
+        Raises:
+            sqlite3.Error: if the statement, or the commit of its batch, failed
+            RuntimeError: if the batcher has been closed
+        """
+        future: Future = Future()
+        # Queued under the lock, so a statement is never put on the queue of a thread that has been
+        # told to stop
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("WriteBatcher is closed")
+            if self._thread is None:
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                name="sqlite-write-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put((sql, tuple(values), future))
+        return future.result()
+
+    def close(self) -> None:
+        """ Stop the writer thread after the statements already queued have been written."""
+        with self._lock:
+            self._closed = True
+            thread, stop_queue = self._thread, self._queue
+            self._thread = self._queue = None
+            if stop_queue is not None:
+                stop_queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _collect_batch(self, items: queue.Queue, first) -> Tuple[list, bool]:
+        """ Gather the statements that arrive within max_latency of the first one."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = items.get(timeout=remaining) if remaining > 0 else items.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self, items: queue.Queue) -> None:
+        batch: list = []
+        error: Exception = RuntimeError("WriteBatcher stopped")
+        try:
+            # isolation_level=None so that the transaction and savepoints are controlled explicitly
+            conn = sqlite3.connect(self.database_file, isolation_level=None, timeout=30)
+            try:
+                stop = False
+                while not stop:
+                    first = items.get()
+                    if first is None:
+                        break
+                    batch, stop = self._collect_batch(items, first)
+                    self._write_batch(conn, batch)
+                    batch = []
+            finally:
+                conn.close()
+        except Exception as e:
+            # Reported to the callers through their futures
+            error = e
+        finally:
+            with self._lock:
+                # A later submit() starts a new thread with a new queue
+                if self._queue is items:
+                    self._thread = self._queue = None
+            # Nothing else is put on this queue now, fail whatever it still holds
+            pending = [future for _, _, future in batch]
+            while True:
+                try:
+                    item = items.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    pending.append(item[2])
+            for future in pending:
+                if not future.done():
+                    future.set_exception(error)
+
+    @staticmethod
+    def _write_batch(conn: sqlite3.Connection, batch: list) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.cursor()
+            for sql, values, _ in batch:
+                cur.execute("SAVEPOINT batch_row")
+                try:
+                    cur.execute(sql, values)
+                    results.append((cur.lastrowid, None))
+                    cur.execute("RELEASE batch_row")
+                except sqlite3.Error as e:
+                    cur.execute("ROLLBACK TO batch_row")
+                    cur.execute("RELEASE batch_row")
+                    results.append((None, e))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), (rowid, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(rowid)
@@ -1,29 +1,44 @@
-import json
+import functools
+from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
 from flask import Flask, render_template
-from plotly.utils import PlotlyJSONEncoder
+
+from src.data.uber import uber_dataset
+from src.flask_app.plotly_js import figure_html, plotly_js
 
 app = Flask(__name__)
+app.register_blueprint(plotly_js)
 
 
-@app.route("/")
-def index():
-    DATA_URL = ('https://s3-us-west-2.amazonaws.com/'
-                'streamlit-demo-data/uber-raw-data-sep14.csv.gz')
-    df = pd.read_csv(DATA_URL, compression='gzip')
-    df['Date/Time'] = pd.to_datetime(df['Date/Time'])
-    df['hour'] = df['Date/Time'].dt.hour
+@functools.lru_cache(maxsize=1)
+def hourly_chart_html(path: Path, version: str) -> str:
+    """ Returns the chart HTML for a version of the stored data, built once per version.
 
-    fig = px.histogram(df, x='hour', nbins=24, title='Uber rides by hour (Sep 2014)')
-    plot_json = json.dumps(fig, cls=PlotlyJSONEncoder)
-    plot_html = fig.to_html(include_plotlyjs='cdn', full_html=False)
+    The chart only has the 24 hourly counts rather than an x value for every ride. The title says
+    when the chart is for the bundled sample, which is used while the full data is downloading.
+    """
+    dataset = uber_dataset()
+    counts = dataset.hourly_counts(path)
+    title = 'Uber rides by hour (Sep 2014)'
+    if path == dataset.sample_file:
+        title += ' - sample data'
+    fig = px.bar(x=list(range(24)), y=counts, title=title, labels={'x': 'hour', 'y': 'count'})
+    # plotly.js is loaded by the page from the plotly_js blueprint
+    return figure_html(fig)
 
-    return render_template('index.html', plot_json=plot_json, plot_html=plot_html)
+
+@app.route("/")
+def index():
+    # The data is downloaded and converted once in the background, the sample is shown until then,
+    # see src/data/uber.py
+    dataset = uber_dataset()
+    path = dataset.path()
+    plot_html = hourly_chart_html(path, dataset.version(path))
+    return render_template('index.html', plot_html=plot_html)
 
 
 # Run the Flask app
 # Runs by default on http://127.0.0.1:5000
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -1,27 +1,30 @@
-from io import StringIO
+from flask import Flask, abort, request, stream_template
 
-import pandas as pd
-from flask import Flask, render_template
-
-from src.data.mock_api import get_event_data
-from src.utils.line_chart import line_chart
+from src.flask_app.page_cache import PageCache, TableQuery
+from src.flask_app.plotly_js import plotly_js
 
 app = Flask(__name__)
+# Serves plotly.js as a cacheable static asset, the pages only include the figure JSON
+app.register_blueprint(plotly_js)
+
+# The data, table sort orders and chart HTML are loaded once and rebuilt in the background when
+# the data file changes
+page_cache = PageCache()
 
 @app.route("/")
 def paralympics():
-    # Get the data
-    para_data = get_event_data()
-    df = pd.read_json(StringIO(para_data))
-    df['start'] = pd.to_datetime(df['start'], dayfirst=True)
-    df['end'] = pd.to_datetime(df['end'], dayfirst=True)
+    page = page_cache.get()
 
-    # Convert the data to a type the template will accept
-    data = df.to_dict('records')
+    # Get the page of the table for ?page=&per_page=&sort=&order=asc|desc&q=
+    # ?render_mode=svg|webgl|auto chooses SVG or WebGL traces, 'auto' uses WebGL for large data
+    try:
+        table = page.table(TableQuery.from_args(request.args, page.columns))
+    except ValueError as e:
+        abort(400, description=str(e))
 
-    # Generate the plotly chart as html
-    fig = line_chart("participants", df)
-    plot_html = fig.to_html()
+    # Get the plotly chart as HTML, the render mode is kept in the table links
+    plot_html = page.chart_html(table.query.render_mode)
 
-    # Render the template using the data and the chart_html
-    return render_template("paralympics.html", data=data, plot_html=plot_html)
\ No newline at end of file
+    # Stream the template using the table and the chart_html, so the browser can start drawing
+    # the page before all the rows have been rendered
+    return stream_template("paralympics.html", table=table, plot_html=plot_html)
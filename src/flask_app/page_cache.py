@@ -0,0 +1,275 @@
+""" App-level cache of the data and chart HTML for the Flask paralympics pages
+
+Reading the Excel workbook, parsing it and building the Plotly figure takes far longer than
+rendering the template. PageCache does that work once, keeps the table rows and the chart HTML,
+and rebuilds them in a background thread when the data source changes, so a request only renders
+the template.
+
+The table is served a page of rows at a time, sorted and filtered on the server. The sort order
+of each column and the text the filter searches are computed once for each version of the data,
+and a request only builds the dicts for the rows on its page.
+
+Usage:
+    page_cache = PageCache()
+
+    @app.route("/")
+    def paralympics():
+        page = page_cache.get()
+        table = page.table(TableQuery.from_args(request.args, page.columns))
+        return stream_template("paralympics.html", table=table,
+                               plot_html=page.chart_html(table.query.render_mode))
+"""
+import math
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.data.sources import ChartDataSource, EventFileSource
+from src.flask_app.plotly_js import figure_html
+from src.utils.line_chart import line_chart
+from src.utils.render_mode import RENDER_MODES
+
+DEFAULT_CHECK_INTERVAL = 5  # seconds between checks for a new version of the data
+DEFAULT_FEATURE = "participants"
+DEFAULT_PER_PAGE = 25  # table rows per page
+MAX_PER_PAGE = 500
+
+
+@dataclass
+class TableQuery:
+    """ The page, sort order and filter for the table, and the chart render mode, from the request
+    query string. The render mode is here so the sort, page and filter links keep it.
+
+    Attributes:
+        page: page number, 1 is the first page
+        per_page: number of rows on a page
+        sort: name of the column to sort by, None for the order of the data
+        descending: True to sort from largest to smallest
+        q: only rows containing this text (ignoring case) in any column are shown
+        render_mode: 'svg', 'webgl' or 'auto' for the chart, see src.utils.render_mode
+    """
+    page: int = 1
+    per_page: int = DEFAULT_PER_PAGE
+    sort: Optional[str] = None
+    descending: bool = False
+    q: str = ""
+    render_mode: str = "auto"
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, str], columns: Sequence[str]) -> "TableQuery":
+        """ Read the query from request args, e.g.
+        ?page=2&per_page=50&sort=year&order=desc&q=london&render_mode=svg
+
+        Args:
+            args: the request args
+            columns: the columns that can be sorted by
+
+        Raises:
+            ValueError: if an argument is not valid
+        """
+        try:
+            page = int(args.get("page", 1))
+            per_page = int(args.get("per_page", DEFAULT_PER_PAGE))
+        except ValueError:
+            raise ValueError("page and per_page must be whole numbers")
+        if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+            raise ValueError(f"page must be at least 1 and per_page between 1 and {MAX_PER_PAGE}")
+        sort = args.get("sort") or None
+        if sort is not None and sort not in columns:
+            raise ValueError(f"Cannot sort by '{sort}', it is not a column")
+        order = args.get("order", "asc")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        render_mode = args.get("render_mode", "auto")
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"render_mode must be one of {list(RENDER_MODES)}")
+        return cls(page, per_page, sort, order == "desc", args.get("q", "").strip(), render_mode)
+
+    def args(self, **changes) -> Dict[str, object]:
+        """ Return the query as request args, with changes, e.g. for a link to another page."""
+        query = dict(page=self.page, per_page=self.per_page, sort=self.sort,
+                     order="desc" if self.descending else "asc", q=self.q,
+                     render_mode=self.render_mode)
+        query.update(changes)
+        return {k: v for k, v in query.items() if v not in (None, "")}
+
+
+@dataclass
+class TableSlice:
+    """ One page of the sorted and filtered table.
+
+    Attributes:
+        query: the query the slice is for, with the page limited to the pages there are
+        columns: the column names
+        rows: iterator over the rows on the page as dicts, for streaming into the template
+        total: number of rows that match the filter
+        pages: number of pages for the rows that match the filter
+    """
+    query: TableQuery
+    columns: List[str]
+    rows: Iterator[Dict]
+    total: int
+    pages: int
+
+
+class Page:
+    """ The data for one version of the source, with the chart HTML built for it.
+
+    Attributes:
+        version: version of the source the data was loaded from
+        df: the DataFrame, shared by every request so it must not be modified
+        columns: the column names
+
+    Methods:
+        chart_html(self, render_mode): Returns the HTML for the line chart
+        table(self, query): Returns a page of the sorted and filtered table
+    """
+
+    def __init__(self, version: str, df: pd.DataFrame, feature: str = DEFAULT_FEATURE):
+        self.version = version
+        self.df = df.reset_index(drop=True)
+        self.columns: List[str] = [str(c) for c in self.df.columns]
+        self.feature = feature
+        self._charts: Dict[str, str] = {}
+        self._sort_orders: Dict[tuple, np.ndarray] = {}
+        self._search_text: Optional[pd.Series] = None
+        self._lock = threading.Lock()
+
+    def table(self, query: TableQuery) -> TableSlice:
+        """ Return the page of the table for the query.
+
+        Only the positions of the matching rows are computed for the request, the dicts are built
+        for the rows on the page as the template reads them.
+        """
+        order = self._sort_order(query.sort, query.descending)
+        if query.q:
+            matches = self._get_search_text().str.contains(query.q.lower(), regex=False).to_numpy()
+            order = order[matches[order]]
+        total = len(order)
+        pages = max(1, math.ceil(total / query.per_page))
+        page = min(query.page, pages)
+        start = (page - 1) * query.per_page
+        positions = order[start:start + query.per_page]
+        return TableSlice(
+            query=replace(query, page=page),
+            columns=self.columns,
+            rows=self._iter_rows(positions),
+            total=total,
+            pages=pages,
+        )
+
+    def _iter_rows(self, positions: np.ndarray) -> Iterator[Dict]:
+        for row in self.df.iloc[positions].itertuples(index=False, name=None):
+            yield dict(zip(self.columns, row))
+
+    def _sort_order(self, column: Optional[str], descending: bool) -> np.ndarray:
+        """ Row positions in sort order, computed once for each column and direction."""
+        key = (column, descending)
+        order = self._sort_orders.get(key)
+        if order is None:
+            if column is None:
+                order = np.arange(len(self.df))
+            else:
+                # Missing values go last in either direction
+                order = self.df[column].sort_values(ascending=not descending, kind="stable",
+                                                    na_position="last").index.to_numpy()
+            self._sort_orders[key] = order
+        return order
+
+    def _get_search_text(self) -> pd.Series:
+        """ The text of each row in lower case, searched by the table filter."""
+        if self._search_text is None:
+            self._search_text = pd.Series([
+                " ".join("" if pd.isna(value) else str(value) for value in row).lower()
+                for row in self.df.itertuples(index=False, name=None)
+            ])
+        return self._search_text
+
+    def chart_html(self, render_mode: str = "auto") -> str:
+        """ Return the HTML for the line chart, building it the first time a render mode is used.
+
+        The HTML does not include plotly.js, the page loads it from the plotly_js blueprint.
+
+        Raises:
+            ValueError: if render_mode is not a valid render mode
+        """
+        html = self._charts.get(render_mode)
+        if html is None:
+            with self._lock:
+                html = self._charts.get(render_mode)
+                if html is None:
+                    fig = line_chart(self.feature, self.df, render_mode=render_mode)
+                    html = self._charts[render_mode] = figure_html(fig)
+        return html
+
+
+class PageCache:
+    """ Loads the data once and swaps in a rebuilt Page in the background when the source changes.
+
+    The background thread starts on the first call to get() and checks the source version every
+    check_interval seconds. Requests use the current Page until the new one has been built.
+
+    Args:
+        source: the source of the data, the paralympics .xlsx file if None
+        check_interval: seconds between checks for a new version
+        prebuild: render modes whose chart HTML is built with each new Page
+    """
+
+    def __init__(self, source: Optional[ChartDataSource] = None,
+                 check_interval: float = DEFAULT_CHECK_INTERVAL, prebuild=("auto",)):
+        self.source = EventFileSource() if source is None else source
+        self.check_interval = check_interval
+        self.prebuild = tuple(prebuild)
+        self._page: Optional[Page] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self) -> Page:
+        """ Return the current Page, loading it if this is the first request."""
+        page = self._page
+        if page is not None:
+            return page
+        with self._lock:
+            if self._page is None:
+                self._page = self._build(self.source.version())
+                self._thread = threading.Thread(target=self._refresh_loop, daemon=True,
+                                                name="page-cache-refresh")
+                self._thread.start()
+            return self._page
+
+    def refresh(self) -> bool:
+        """ Rebuild the Page if the source version has changed.
+
+        Returns:
+            True if a new Page was built
+        """
+        version = self.source.version()
+        if self._page is not None and version == self._page.version:
+            return False
+        page = self._build(version)
+        self._page = page
+        return True
+
+    def close(self) -> None:
+        """ Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _build(self, version: str) -> Page:
+        page = Page(version, self.source.get_dataframe())
+        for render_mode in self.prebuild:
+            page.chart_html(render_mode)
+        return page
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the current Page, the next check tries again
+                continue
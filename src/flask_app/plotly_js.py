@@ -0,0 +1,64 @@
+""" plotly.js served by the Flask app as a versioned static asset
+
+fig.to_html() with its defaults inlines the whole plotly.js bundle, several MB, into every page.
+The plotly_js blueprint serves the bundle that comes with the plotly package from a URL that
+includes its version, with headers that let the browser cache it for a year. Pages load it with a
+script tag and embed only the figure JSON, see figure_html().
+
+Usage:
+    app.register_blueprint(plotly_js)
+
+    In the template <head>: <script src="{{ plotly_js_url }}"></script>
+    In the view: plot_html = figure_html(fig)
+"""
+import hashlib
+
+from flask import Blueprint, Response, abort, request, url_for
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+PLOTLY_JS_VERSION = get_plotlyjs_version()
+CACHE_MAX_AGE = 365 * 24 * 60 * 60  # seconds, the URL changes when the version does
+
+plotly_js = Blueprint("plotly_js", __name__)
+
+_bundle = {}
+
+
+def _plotly_js_bundle():
+    """ Return the plotly.js source as bytes and its ETag, read from the plotly package once."""
+    if not _bundle:
+        source = get_plotlyjs().encode("utf-8")
+        _bundle["source"] = source
+        _bundle["etag"] = hashlib.sha256(source).hexdigest()[:16]
+    return _bundle["source"], _bundle["etag"]
+
+
+@plotly_js.route("/plotly/<version>/plotly.min.js")
+def plotly_min_js(version):
+    if version != PLOTLY_JS_VERSION:
+        abort(404)
+    source, etag = _plotly_js_bundle()
+    response = Response(source, mimetype="text/javascript")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+@plotly_js.app_context_processor
+def plotly_js_url():
+    """ Makes plotly_js_url, the URL of the plotly.js asset, available to every template."""
+    return {"plotly_js_url": url_for("plotly_js.plotly_min_js", version=PLOTLY_JS_VERSION)}
+
+
+def figure_html(fig) -> str:
+    """ Return the HTML for a figure without plotly.js, the page must load it from plotly_js_url.
+
+    Args:
+        fig: Plotly figure
+
+    Returns:
+        html: a div and a script with the figure JSON that draws the figure in it
+    """
+    return fig.to_html(include_plotlyjs=False, full_html=False)
@@ -1,18 +1,24 @@
-from typing import Any, Dict, List
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
-from paralympics.charts import scatter_map, line_chart, bar_chart
+from paralympics.charts import get_chart_figure, scatter_map, line_chart, bar_chart
+from paralympics.data_client import CHART_DATA_COLUMNS, get_chart_client, get_chart_source
+from utils.disk_cache import default_cache
 
 API_BASE = "http://127.0.0.1:8000"  # REST API default URL
 TIMEOUT = 5  # seconds
+QUIZ_PAGE_SIZE = 5  # questions fetched per /quiz request
+QUIZ_CACHE_TTL = 300  # seconds a quiz page is used before it is revalidated with the API
+FETCH_WORKERS = 8  # threads fetching from the API at the same time
+RENDER_MODE = "auto"  # chart rendering: "svg", "webgl" or "auto" (WebGL for large data)
+SERVER_CHARTS = True  # draw the figures built by the API /charts routes, False to build them here
 
 st.set_page_config(page_title="Paralympics Dashboard", layout="wide")
 
-# Row 1: two columns
-# use [1,1] for equal widths or e.g. [1,3] for 1:3
-left_col, right_col = st.columns([1, 3])
-
 
 # 2. Callback to clear the state of the secondary selectors when the chart
 # type is changed
@@ -24,149 +30,265 @@ def clear_other_state():
 
 # Helper functions for interacting with the REST API
 
+@st.cache_resource
+def _api_session() -> requests.Session:
+    """Keep-alive HTTP session shared by every user session in this process.
+
+    The connection pool is sized for the fetch thread pool. The chart data client uses it too.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=FETCH_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    get_chart_client().session = session
+    return session
+
+
+def _session() -> requests.Session:
+    """The keep-alive HTTP session shared with the chart data client."""
+    return get_chart_client().session
+
+
 def _get(url: str, **kwargs) -> requests.Response:
     """HTTP GET with a uniform timeout and error handling."""
     try:
-        resp = requests.get(url, timeout=TIMEOUT, **kwargs)
+        resp = _session().get(url, timeout=TIMEOUT, **kwargs)
+        resp.raise_for_status()
+        return resp
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Request failed for {url}: {e}") from e
+
+
+def _post(url: str, **kwargs) -> requests.Response:
+    """HTTP POST with a uniform timeout and error handling."""
+    try:
+        resp = _session().post(url, timeout=TIMEOUT, **kwargs)
         resp.raise_for_status()
         return resp
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"Request failed for {url}: {e}") from e
 
 
-@st.cache_data(show_spinner=False)
-def count_questions() -> int:
-    """Return the number of questions available."""
-    resp = _get(f"{API_BASE}/question")
-    data = resp.json()
-    return len(data)
+@st.cache_resource
+def _fetch_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by all sessions for fetching data from the API concurrently."""
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="api-fetch")
 
 
-@st.cache_data(show_spinner=False)
-def get_question(qid: int) -> Dict[str, Any]:
-    """Return the question object by ID."""
-    resp = _get(f"{API_BASE}/question/{qid}")
-    return resp.json()
+def fetch_quiz_page(offset: int) -> Dict[str, Any]:
+    """Return the question count and a page of questions with their response options.
 
+    Pages are stored in the disk cache with the ETag (data version) of the /quiz response, so the
+    other app processes use them too. A page older than QUIZ_CACHE_TTL is revalidated with the
+    ETag, which costs a 304 response if the data has not changed. Runs in the fetch thread pool,
+    so it must not use any Streamlit functions.
+    """
+    url = f"{API_BASE}/quiz"
+    params = {"offset": offset, "limit": QUIZ_PAGE_SIZE}
+    cache = default_cache()
+    key = f"fetch_quiz_page:{url}?offset={offset}&limit={QUIZ_PAGE_SIZE}"
+    bundle, etag, fetched_at = cache.get(key) or (None, None, 0.0)
+    if bundle is not None and time.time() - fetched_at < QUIZ_CACHE_TTL:
+        return bundle
+    headers = {"If-None-Match": etag} if bundle is not None and etag else {}
+    resp = _get(url, params=params, headers=headers)
+    if resp.status_code != 304:
+        bundle, etag = resp.json(), resp.headers.get("ETag")
+    # Kept for longer than the ttl, so an expired page can still be revalidated with its ETag
+    cache.set(key, (bundle, etag, time.time()), ttl=10 * QUIZ_CACHE_TTL)
+    return bundle
 
-@st.cache_data(show_spinner=False)
-def get_responses(qid: int) -> List[Dict[str, Any]]:
-    """Return the responses for a given question ID."""
-    resp = _get(f"{API_BASE}/response/search", params={"question_id": qid})
-    return resp.json()
 
+def _quiz_page(offset: int) -> Future:
+    """Return the (possibly still running) fetch of the quiz page at offset, starting it if needed."""
+    pages = st.session_state.setdefault("quiz_pages", {})
+    if offset not in pages:
+        pages[offset] = _fetch_pool().submit(fetch_quiz_page, offset)
+    return pages[offset]
 
-def render_question_block():
+
+def _quiz_page_offset(position: int) -> int:
+    return (position - 1) // QUIZ_PAGE_SIZE * QUIZ_PAGE_SIZE
+
+
+def get_quiz_question(position: int) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """Return the number of questions and the question at position (1 is the first question).
+
+    Questions are fetched a page at a time with /quiz. The page with the next question is fetched
+    in the background while the current question is being answered.
+    """
+    offset = _quiz_page_offset(position)
+    try:
+        bundle = _quiz_page(offset).result()
+    except RuntimeError:
+        # Forget the failed fetch so the next rerun tries again
+        st.session_state.quiz_pages.pop(offset, None)
+        raise
+    num_q = bundle["count"]
+    if position < num_q:
+        _quiz_page(_quiz_page_offset(position + 1))
+    index = position - 1 - offset
+    question = bundle["questions"][index] if index < len(bundle["questions"]) else None
+    return num_q, question
+
+
+def check_answer(question_id: int, response_id: int) -> bool:
+    """Return True if the response is the correct answer to the question."""
+    resp = _post(f"{API_BASE}/quiz/answer",
+                 json={"question_id": question_id, "response_id": response_id})
+    return resp.json()["correct"]
+
+
+def start_page_fetches() -> None:
+    """Start the data fetches this run of the page needs, so they run at the same time.
+
+    The chart data and the quiz page are requested in the fetch thread pool before anything is
+    drawn. The chart functions and render_question_block() then use the results, and the page
+    waits for the slowest request rather than the sum of them. Both are usually in the disk cache
+    already, put there by this or another process of the app. With SERVER_CHARTS the charts do not
+    need the chart data, each figure is one request to the API.
+    """
+    _api_session()
     if "q_index" not in st.session_state:
         st.session_state.q_index = 1
+    if st.session_state.get("chart_choice") and not SERVER_CHARTS:
+        # The source the charts read, so a source set with set_chart_source() is used rather than
+        # the API. The REST source caches the data, so the charts use the result of this fetch
+        _fetch_pool().submit(get_chart_source().get_dataframe, CHART_DATA_COLUMNS)
+    _quiz_page(_quiz_page_offset(st.session_state.q_index))
+
 
+def _submit_answer(question_id: int, label_to_id: Dict[str, int], num_q: int) -> None:
+    """Form callback: check the selected answer and move to the next question if it is correct.
+
+    Runs before the quiz panel reruns, so the panel draws the next question in the same rerun.
+    """
+    selected_label = st.session_state.get("quiz_answer")
+    if not selected_label:
+        st.session_state.quiz_feedback = "Please select an answer."
+    elif check_answer(question_id, label_to_id[selected_label]):
+        st.session_state.quiz_feedback = None
+        st.session_state.q_index = min(st.session_state.q_index + 1, num_q + 1)
+        st.session_state.pop("quiz_answer", None)
+    else:
+        st.session_state.quiz_feedback = "Please try again!"
+
+
+def render_question_block():
     q_index = st.session_state.q_index
 
-    # Fetch total count
-    num_q = count_questions()
+    # Fetch the total count and the current question with its responses
+    num_q, q = get_quiz_question(q_index)
 
     # If past the last question, show completion and exit
-    if q_index > num_q:
+    if q_index > num_q or q is None:
         st.success("Questions complete, well done!")
         return
 
-    # Fetch the current question + its responses
-    q = get_question(q_index)
-    responses = get_responses(q_index)
-
     # Build radio options as label -> id map
     label_to_id = {
-        r.get("response_text", ""): r.get("id") for r in responses if
+        r.get("response_text", ""): r.get("id") for r in q["responses"] if
         r.get("response_text", "")
                    }
 
     with st.form(key="quiz_form", clear_on_submit=False):
         st.write(q.get("question_text", ""))
-        selected_label = st.radio(
+        st.radio(
             "Select one answer:",
             options=list(label_to_id.keys()),
             index=None,
+            key="quiz_answer",
         )
-        submitted = st.form_submit_button("Submit answer")
+        # The answer is checked in the callback, so a correct answer shows the next question
+        # without another rerun
+        st.form_submit_button("Submit answer", on_click=_submit_answer,
+                              args=(q["id"], label_to_id, num_q))
 
-    # Handle submission
-    if submitted:
-        if not selected_label:
-            st.info("Please select an answer.")
-            return
+    if st.session_state.get("quiz_feedback"):
+        st.info(st.session_state.quiz_feedback)
 
-        selected_id = str(label_to_id[selected_label])
 
-        # Find the selected response to inspect correctness
-        selected_obj = next(
-            (r for r in responses if str(r.get("id")) == selected_id),
-            None,
-        )
+@st.fragment
+def chart_panel():
+    """The chart selectors and the chart.
 
-        if selected_obj and selected_obj.get("is_correct"):
-            # Advance or finish
-            if q_index >= num_q:
-                st.session_state.q_index = num_q + 1
-                st.success("Questions complete, well done!")
-            else:
-                st.session_state.q_index = q_index + 1
-                # Using rerun ensures the next question renders cleanly
-                st.rerun()
-        else:
-            st.info("Please try again!")
-
-
-left_col, right_col = st.columns([1, 3])
-
-with left_col:
-    # 1. Choose chart
-    st.selectbox(
-        "Choose a chart:",
-        ["Trends", "Participants by gender", "Paralympics locations"],
-        key="chart_choice",
-        index=None,
-        placeholder="Select chart to view...",
-        on_change=clear_other_state
-    )
-
-    # 3. Line chart → show the second selectbox
-    if st.session_state.get("chart_choice") == "Trends":
+    A fragment, so changing a chart option reruns only this panel and not the quiz.
+    """
+    left_col, right_col = st.columns([1, 3])
+
+    with left_col:
+        # 1. Choose chart
         st.selectbox(
-            "Choose feature:",
-            ["Sports", "Events", "Countries", "Participants"],
-            key="trend_feature"
+            "Choose a chart:",
+            ["Trends", "Participants by gender", "Paralympics locations"],
+            key="chart_choice",
+            index=None,
+            placeholder="Select chart to view...",
+            on_change=clear_other_state
         )
 
-    # 5. Bar chart → show pills
-    elif st.session_state.get("chart_choice") == "Participants by gender":
-        st.pills(
-            "Choose the type of Paralympics:",
-            ["Winter", "Summer"],
-            key="bar_pills",
-            selection_mode="multi"
-        )
+        # 3. Line chart → show the second selectbox
+        if st.session_state.get("chart_choice") == "Trends":
+            st.selectbox(
+                "Choose feature:",
+                ["Sports", "Events", "Countries", "Participants"],
+                key="trend_feature"
+            )
+
+        # 5. Bar chart → show pills
+        elif st.session_state.get("chart_choice") == "Participants by gender":
+            st.pills(
+                "Choose the type of Paralympics:",
+                ["Winter", "Summer"],
+                key="bar_pills",
+                selection_mode="multi"
+            )
+
+    with right_col:
+        # 4. Draw a line chart after the feature is selected
+        if st.session_state.get("chart_choice") == "Trends"\
+           and st.session_state.get("trend_feature"):
+            feature = str.lower(st.session_state.trend_feature)
+            if SERVER_CHARTS:
+                fig = get_chart_figure("trend", feature=feature, render_mode=RENDER_MODE)
+            else:
+                fig = line_chart(feature, render_mode=RENDER_MODE)
+            st.plotly_chart(fig, width="content")
 
-with right_col:
-    # 4. Draw a line chart after the feature is selected
-    if st.session_state.get("chart_choice") == "Trends"\
-       and st.session_state.get("trend_feature"):
-        feature = str.lower(st.session_state.trend_feature)
-        fig = line_chart(feature)
-        st.plotly_chart(fig, width="content")
-
-    # 6. Draw one or more bar charts depending on pill selection
-    if st.session_state.get("chart_choice") == "Participants by gender"\
-       and st.session_state.get(
-            "bar_pills"):
-        for pill in st.session_state.bar_pills:
-            event_type = str.lower(pill)
-            fig = bar_chart(event_type)
+        # 6. Draw one or more bar charts depending on pill selection
+        if st.session_state.get("chart_choice") == "Participants by gender"\
+           and st.session_state.get(
+                "bar_pills"):
+            for pill in st.session_state.bar_pills:
+                event_type = str.lower(pill)
+                if SERVER_CHARTS:
+                    fig = get_chart_figure("gender-ratio", event_type=event_type)
+                else:
+                    fig = bar_chart(event_type)
+                st.plotly_chart(fig, width="content")
+
+        # 7. Map chart displays once chosen
+        if st.session_state.get("chart_choice") == "Paralympics locations":
+            if SERVER_CHARTS:
+                fig = get_chart_figure("hosts", render_mode=RENDER_MODE)
+            else:
+                fig = scatter_map(render_mode=RENDER_MODE)
             st.plotly_chart(fig, width="content")
 
-    # 7. Map chart displays once chosen
-    if st.session_state.get("chart_choice") == "Paralympics locations":
-        fig = scatter_map()
-        st.plotly_chart(fig, width="content")
+
+@st.fragment
+def quiz_panel():
+    """The quiz questions.
+
+    A fragment, so submitting an answer reruns only this panel and not the charts.
+    """
+    render_question_block()
+
+
+start_page_fetches()
+
+# Row 1: the chart panel, two columns [1, 3] for the selectors and the chart
+chart_panel()
 
 # Row 2: full-width (spans both columns)
 st.divider()  # Added to show the separation visually, not required
@@ -195,4 +317,4 @@ st.markdown("""
 st.header("Questions")
 question_container = st.container()
 with question_container:
-    render_question_block()
+    quiz_panel()
@@ -1,6 +1,22 @@
+import time
+
 import requests
 import pandas as pd
-import plotly.express as px
+import plotly.io as pio
+
+from paralympics.data_client import (API_BASE, DEFAULT_TTL, TIMEOUT, get_chart_client,
+                                     get_chart_data)
+from paralympics.figure_cache import cached_figure
+from utils.disk_cache import default_cache
+from utils.figures import (BAR_CHART_COLUMNS, LINE_CHART_COLUMNS, MAP_COLUMNS, bar_figure,
+                           cluster_map_figure, line_figure, map_figure)
+
+# The chart functions are decorated with @cached_figure, which returns a copy of the cached figure
+# when the arguments and the data version are unchanged. Pass use_cache=False to rebuild the figure.
+# They get the data from the chart data source, see paralympics.data_client.set_chart_source, and
+# only ask it for the columns the figure needs.
+# get_chart_figure() gets a figure built by the REST API /charts routes instead, so the app does
+# not need the chart data at all.
 
 
 def get_api_data(url):
@@ -19,7 +35,8 @@ def get_api_data(url):
     return df
 
 
-def line_chart(feature):
+@cached_figure
+def line_chart(feature, max_points=None, render_mode="auto"):
     """ Creates a line chart
 
     Data is displayed over time from 1960 onwards.
@@ -27,6 +44,9 @@ def line_chart(feature):
 
      Args:
         feature (str): events, sports, countries, or participants
+        max_points (int): optional point budget, the series are downsampled with LTTB to at most
+            this many points in total
+        render_mode (str): 'svg', 'webgl', or 'auto' to use WebGL for large data
 
      Returns:
         fig: Plotly Express line figure
@@ -34,28 +54,11 @@ def line_chart(feature):
      Raises:
          ValueError: If the feature is not one of the valid options
      """
-    if feature not in ["sports", "participants", "events", "countries"]:
-        raise ValueError(
-            'Invalid value for "feature". Must be one of ["sports", "participants", "events", "countries"]')
-    else:
-        # Make sure it is lowercase to match the dataframe column names
-        feature = feature.lower()
-
-    # Get the data from the REST API using the get_api_data() function you just created
-    df = get_api_data("http://127.0.0.1:8000/all")
-
-    # Only the columns needed for this chart
-    chart_df = df[["event_type", "year", feature]]
-
-    # Create a Plotly Express line chart with the following parameters
-    #    chart_df is the DataFrame
-    #    x="year" is the column to use as the x-axis
-    #    y=feature is the column to use as the y-axis
-    #    color="event_type" indicates if winter or summer
-    fig = px.line(chart_df, x="year", y=feature, color="event_type")
-    return fig
+    df = get_chart_data(LINE_CHART_COLUMNS)
+    return line_figure(df, feature, max_points, render_mode)
 
 
+@cached_figure
 def bar_chart(event_type):
     """
     Creates a stacked bar chart showing change in the ration of male and female competitors in the summer and winter paralympics.
@@ -66,59 +69,75 @@ def bar_chart(event_type):
     Returns
     fig: Plotly Express bar chart
     """
-    df = get_api_data("http://127.0.0.1:8000/all")
-    needed = ['event_type', 'year', 'place_name', 'participants_m', 'participants_f',
-              'participants']
-    df_plot = (
-        df[needed]
-        .dropna(subset=['participants_m', 'participants_f'])
-        .query("event_type == @event_type")
-        .assign(  # Avoid divide-by-zero; if participants==0, set NaN, then drop
-            Male=lambda d: d['participants_m'].where(d['participants'] != 0, pd.NA) / d[
-                'participants'],
-            Female=lambda d: d['participants_f'].where(d['participants'] != 0, pd.NA) / d[
-                'participants'],
-            xlabel=lambda d: d['place_name'] + " " + d['year'].astype(str), )
-        .dropna(subset=['Male', 'Female'])
-        .sort_values(['event_type', 'year'])
-    )
-
-    fig = px.bar(df_plot,
-                 x='xlabel',
-                 y=['Male', 'Female'],
-                 title=f'How has the ratio of female:male participants changed in the {event_type} paralympics?',
-                 labels={'xlabel': '', 'value': '', 'variable': ''},
-                 template="simple_white"
-                 )
-    fig.update_xaxes(ticklen=0)
-    fig.update_yaxes(tickformat=".0%")
-    return fig
-
-
-def scatter_map():
+    df = get_chart_data(BAR_CHART_COLUMNS)
+    return bar_figure(df, event_type)
+
+
+@cached_figure
+def scatter_map(render_mode="auto", clusters=False, zoom=2):
     """ Creates a scatter chart with locations of all Paralympics
 
+    Args:
+        render_mode (str): 'svg', 'webgl', or 'auto' to use WebGL for large data
+        clusters (bool): if True, show the locations clustered by the API for the zoom level, one
+            marker per cluster sized by the number of games, rather than one marker per games
+        zoom (int): map zoom level the clusters are computed for, 0 (whole world) to 20
+
+    Returns:
+        fig: Plotly Express scatter geo (SVG) or scatter map (WebGL) figure
+    """
+    if clusters:
+        return cluster_map_figure(get_cluster_data(zoom), render_mode)
+    df = get_chart_data(MAP_COLUMNS)
+    return map_figure(df, render_mode)
+
+
+def get_cluster_data(zoom):
+    """ Gets the host locations clustered for a map zoom level from the REST API
+
+    Args:
+        zoom: map zoom level, 0 (whole world) to 20
+
     Returns:
-        fig: Plotly Express scatter geo figure
+        df: DataFrame with latitude, longitude, count and names for each cluster
     """
+    response = get_chart_client().session.get(f"{API_BASE}/map/clusters", params={"zoom": zoom},
+                                              timeout=TIMEOUT)
+    response.raise_for_status()
+    return pd.DataFrame(response.json(), columns=["latitude", "longitude", "count", "names"])
+
+
+def get_chart_figure(chart, **params):
+    """ Gets a chart figure built by the REST API /charts routes
 
-    # Prepare the data
-    df = get_api_data("http://127.0.0.1:8000/all")
-    chart_df = df[["year", "place_name", "latitude", "longitude"]]
-    # The lat and lon must be floats for the scatter_geo
-    chart_df['longitude'] = chart_df['longitude'].astype(float)
-    chart_df['latitude'] = chart_df['latitude'].astype(float)
-    # Add a new column that concatenates the place_name and year e.g. Barcelona 2012
-    chart_df['name'] = chart_df['place_name'] + ' ' + chart_df['year'].astype(str)
-
-    # Create the figure
-    fig = px.scatter_geo(chart_df,
-                         lat=chart_df.latitude,
-                         lon=chart_df.longitude,
-                         hover_name=chart_df.name,
-                         title="Where have the paralympics been held?"
-                         )
-    return fig
+    The figure JSON is stored in the disk cache with its ETag (data version), so the other app
+    processes use it too. After DEFAULT_TTL seconds it is revalidated with the ETag, which costs a
+    304 response if the data has not changed.
+
+    Args:
+        chart: the chart route, trend, gender-ratio or hosts
+        **params: the query parameters of the route, e.g. feature="sports"
+
+    Returns:
+        fig: Plotly figure
+
+    Raises:
+        requests.HTTPError: if the API returns an error status, e.g. 400 for an invalid parameter
+    """
+    url = f"{API_BASE}/charts/{chart}"
+    cache = default_cache()
+    key = f"get_chart_figure:{url}?{sorted(params.items())}"
+    fig_json, etag, fetched_at = cache.get(key) or (None, None, 0.0)
+    if fig_json is None or time.time() - fetched_at >= DEFAULT_TTL:
+        headers = {"If-None-Match": etag} if fig_json is not None and etag else {}
+        response = get_chart_client().session.get(url, params=params, headers=headers,
+                                                  timeout=TIMEOUT)
+        response.raise_for_status()
+        if response.status_code != 304:
+            fig_json, etag = response.text, response.headers.get("ETag")
+        # Kept for longer than the ttl, so an expired figure can still be revalidated with its ETag
+        cache.set(key, (fig_json, etag, time.time()), ttl=10 * DEFAULT_TTL)
+    return pio.from_json(fig_json)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+""" Shared client for the chart data from the REST API
+
+All the chart functions need the same /all data. ChartDataClient downloads and parses it once and
+shares the DataFrame between them:
+
+- one requests.Session, so the HTTP connection is kept alive between requests
+- the parsed DataFrame is cached for ttl seconds
+- after the ttl the cached data is revalidated with the ETag (data version) sent by the API, so an
+  unchanged dataset costs a 304 response rather than a download and parse
+- concurrent callers share one fetch (single-flight) rather than each downloading the data
+- with a DiskCache, the data and its ETag are shared with the other processes of the app, so
+  the data is downloaded once per ttl however many processes there are
+
+RESTSource is the data.sources.ChartDataSource for the API. The chart functions get their data
+from get_chart_source(), the REST API unless set_chart_source() is given another source, e.g. a
+SQLiteSource when the app runs next to the database. The shared client only requests
+CHART_DATA_COLUMNS, the columns the chart figures use.
+
+Usage:
+    df = get_chart_data()            # the shared client for http://127.0.0.1:8000/all?fields=...
+    client = ChartDataClient(url)    # or a client for another URL
+    df = client.get_dataframe()
+
+    set_chart_source(SQLiteSource()) # the charts read the database rather than the API
+"""
+import functools
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import pandas as pd
+import requests
+
+from data.sources import CHART_COLUMNS, ChartDataSource
+from utils.disk_cache import DiskCache, default_cache
+from utils.figures import BAR_CHART_COLUMNS, LINE_CHART_COLUMNS, MAP_COLUMNS
+
+API_BASE = "http://127.0.0.1:8000"  # REST API default URL
+API_ALL_URL = f"{API_BASE}/all"
+# The columns any chart figure needs, requested by the shared client in one download
+CHART_DATA_COLUMNS = list(dict.fromkeys(LINE_CHART_COLUMNS + BAR_CHART_COLUMNS + MAP_COLUMNS))
+DEFAULT_TTL = 60  # seconds
+TIMEOUT = 5  # seconds
+
+
+class ChartDataClient:
+    """ Fetches and caches the chart data from a REST API route as a DataFrame.
+
+    The DataFrame returned by get_dataframe() is shared by every caller, do not modify it in place.
+
+    Attributes:
+        url: URL for the REST API route, e.g. http://127.0.0.1:8000/all
+        ttl: time in seconds the data is used before it is revalidated with the API
+        timeout: request timeout in seconds
+        session: requests.Session used for every request
+        cache: DiskCache shared with other processes, or None to only cache in this process
+        fetch_count: number of requests made to the API, including revalidations
+
+    Methods:
+        get_dataframe(self): Returns the cached DataFrame, fetching it if needed
+        version: The data version (ETag) of the cached data
+        invalidate(self): Discards the cached data
+    """
+
+    def __init__(self, url: str = API_ALL_URL, ttl: float = DEFAULT_TTL, timeout: float = TIMEOUT,
+                 session: Optional[requests.Session] = None, cache: Optional[DiskCache] = None):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.cache = cache
+        self.fetch_count = 0
+        self._df: Optional[pd.DataFrame] = None
+        self._version: Optional[str] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        """ The data version (ETag) of the cached data, None if unknown."""
+        return self._version
+
+    def _is_fresh(self) -> bool:
+        return self._df is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """ Return the data as a DataFrame, fetching or revalidating it if the cache has expired.
+
+        Returns:
+            df: DataFrame with the data
+
+        Raises:
+            requests.HTTPError: if the API returns an error status
+        """
+        if self._is_fresh():
+            return self._df
+        # Only one thread fetches, the others wait here and then use the data it fetched
+        with self._lock:
+            if not self._is_fresh():
+                self._fetch()
+            return self._df
+
+    def invalidate(self) -> None:
+        """ Discard the cached data so the next call to get_dataframe() downloads it again."""
+        with self._lock:
+            self._df = None
+            self._version = None
+            if self.cache is not None:
+                self.cache.delete(self._cache_key)
+
+    @property
+    def _cache_key(self) -> str:
+        return f"ChartDataClient:{self.url}"
+
+    def _load_shared(self) -> None:
+        """ Use the data another process stored in the cache, if there is any."""
+        entry = self.cache.get(self._cache_key)
+        if entry is not None:
+            self._df, self._version, fetched_at = entry
+            # The cache stores wall clock time, the freshness check uses the monotonic clock
+            self._fetched_at = time.monotonic() - (time.time() - fetched_at)
+
+    def _save_shared(self) -> None:
+        # Kept for longer than the ttl, so an expired entry can still be revalidated with its ETag
+        self.cache.set(self._cache_key, (self._df, self._version, time.time()),
+                       ttl=max(10 * self.ttl, self.cache.ttl))
+
+    def _fetch(self) -> None:
+        if self.cache is not None:
+            self._load_shared()
+            if self._is_fresh():
+                return
+        headers = {}
+        if self._df is not None and self._version:
+            headers["If-None-Match"] = self._version
+        self.fetch_count += 1
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self._fetched_at = time.monotonic()
+        else:
+            response.raise_for_status()
+            self._df = pd.DataFrame(response.json())
+            self._version = response.headers.get("ETag")
+            self._fetched_at = time.monotonic()
+        if self.cache is not None:
+            self._save_shared()
+
+
+def all_data_url(columns: Optional[Sequence[str]] = None) -> str:
+    """ Return the URL of the /all route for the columns, or for every column if None."""
+    return API_ALL_URL if columns is None else f"{API_ALL_URL}?fields={','.join(columns)}"
+
+
+class RESTSource(ChartDataSource):
+    """ Chart data from the REST API /all route, fetched and cached by a ChartDataClient.
+
+    With columns, only those columns are requested from the API (/all?fields=...). Give the columns
+    every chart of the app needs, so the charts share one download.
+
+    Args:
+        client: the client for the /all route, a new client sharing the default DiskCache if None
+        columns: the chart columns to request, or None for every column
+    """
+
+    def __init__(self, client: Optional[ChartDataClient] = None,
+                 columns: Optional[Sequence[str]] = None):
+        self.columns = list(CHART_COLUMNS if columns is None else columns)
+        if client is None:
+            client = ChartDataClient(all_data_url(columns), cache=default_cache())
+        self.client = client
+
+    def version(self) -> Optional[str]:
+        """ The ETag of the current data, after revalidating the cached data if it has expired."""
+        self.client.get_dataframe()
+        return self.client.version
+
+    def _read(self, columns: List[str]) -> pd.DataFrame:
+        return self.client.get_dataframe()[columns]
+
+
+# The source set with set_chart_source(), None for the REST API
+_chart_source: Optional[ChartDataSource] = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_chart_client() -> ChartDataClient:
+    """ Return the REST API client shared by the chart functions, created on first use."""
+    return ChartDataClient(all_data_url(CHART_DATA_COLUMNS), cache=default_cache())
+
+
+@functools.lru_cache(maxsize=None)
+def _default_source() -> ChartDataSource:
+    return RESTSource(get_chart_client(), columns=CHART_DATA_COLUMNS)
+
+
+def get_chart_source() -> ChartDataSource:
+    """ Return the source the chart functions get their data from."""
+    return _default_source() if _chart_source is None else _chart_source
+
+
+def set_chart_source(source: ChartDataSource) -> None:
+    """ Make the chart functions get their data from another source."""
+    global _chart_source
+    _chart_source = source
+
+
+def get_chart_data(columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """ Return the chart data from the source shared by the chart functions.
+
+    Args:
+        columns: the chart columns to return, or None for every column
+    """
+    return get_chart_source().get_dataframe(columns)
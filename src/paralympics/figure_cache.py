@@ -0,0 +1,120 @@
+""" Memoized figures for the chart functions
+
+Building a figure with Plotly Express takes tens of milliseconds, and a Streamlit rerun rebuilds
+every chart on the page even when the chart options have not changed. The cached_figure decorator
+stores each figure as its JSON and rebuilds the figure from the JSON on a cache hit, which is
+several times faster than constructing it again with Plotly Express.
+
+The cache key is the chart function, its arguments and the version of the chart data source, so a
+figure is rebuilt once the data changes. The least recently used figures are evicted when the cache has
+more than max_entries figures or their JSON is larger than max_bytes in total.
+
+Usage:
+    @cached_figure
+    def line_chart(feature):
+        ...
+
+    figure_cache.stats()  # hits, misses, entries and bytes
+"""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import plotly.io as pio
+
+from paralympics.data_client import get_chart_source
+
+
+class FigureCache:
+    """ LRU cache of serialized figure JSON with a limit on the number of entries and total size.
+
+    Attributes:
+        max_entries: maximum number of figures in the cache
+        max_bytes: maximum total size of the cached figure JSON
+        hits: number of lookups that found a figure
+        misses: number of lookups that did not find a figure
+
+    Methods:
+        get(self, key): Returns the figure JSON for the key, or None
+        put(self, key, fig_json): Adds the figure JSON, evicting the least recently used figures
+        clear(self): Empties the cache
+        stats(self): Returns the hit, miss, entry and size counts
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            fig_json = self._entries.get(key)
+            if fig_json is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fig_json
+
+    def put(self, key: Hashable, fig_json: str) -> None:
+        size = len(fig_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = fig_json
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+figure_cache = FigureCache()
+
+
+def cached_figure(func: Callable) -> Callable:
+    """ Decorator that returns figures from figure_cache when the arguments and data are unchanged.
+
+    The arguments must be hashable. Each call returns a new figure object, so callers can update
+    the figure without changing the cached copy. Pass use_cache=False to build a new figure.
+    Figures are not cached if the chart data source has no version, e.g. the API did not send one.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, use_cache: bool = True, **kwargs):
+        if not use_cache:
+            return func(*args, **kwargs)
+        # The version is checked with the source, e.g. revalidated with the API, on each call
+        version = get_chart_source().version()
+        if version is None:
+            return func(*args, **kwargs)
+        key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())), version)
+        fig_json = figure_cache.get(key)
+        if fig_json is not None:
+            return pio.from_json(fig_json)
+        fig = func(*args, **kwargs)
+        figure_cache.put(key, fig.to_json())
+        return fig
+
+    return wrapper
@@ -1,24 +1,19 @@
 # https://docs.streamlit.io/get-started/tutorials/create-an-app#lets-put-it-all-together
 import streamlit as st
-import pandas as pd
-import numpy as np
 
-st.title('Uber pickups in NYC')
+from src.data.uber import DATE_COLUMN, hourly_counts, uber_dataset
 
-DATE_COLUMN = 'date/time'
-DATA_URL = ('https://s3-us-west-2.amazonaws.com/'
-            'streamlit-demo-data/uber-raw-data-sep14.csv.gz')
+st.title('Uber pickups in NYC')
 
 @st.cache_data
-def load_data(nrows):
-    data = pd.read_csv(DATA_URL, nrows=nrows)
-    lowercase = lambda x: str(x).lower()
-    data.rename(lowercase, axis='columns', inplace=True)
-    data[DATE_COLUMN] = pd.to_datetime(data[DATE_COLUMN])
-    return data
+def load_data(nrows, version):
+    # Read from the local copy of the data, it is downloaded and converted in the background the
+    # first time. Until then, and offline, a small bundled sample is used, see src/data/uber.py.
+    # The version is part of the cache key, so the full data replaces the sample once it is stored.
+    return uber_dataset().load(nrows=nrows)
 
 data_load_state = st.text('Loading data...')
-data = load_data(10000)
+data = load_data(10000, uber_dataset().version())
 data_load_state.text("Done! (using st.cache_data)")
 
 if st.checkbox('Show raw data'):
@@ -26,7 +21,7 @@ if st.checkbox('Show raw data'):
     st.write(data)
 
 st.subheader('Number of pickups by hour')
-hist_values = np.histogram(data[DATE_COLUMN].dt.hour, bins=24, range=(0,24))[0]
+hist_values = hourly_counts(data[DATE_COLUMN])
 st.bar_chart(hist_values)
 
 # Some number in the range 0-23
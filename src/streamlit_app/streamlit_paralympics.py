@@ -1,23 +1,23 @@
 import streamlit as st
-import pandas as pd
-from src.data.mock_api import get_event_data
+from src.data.sources import EventFileSource
 from src.utils.line_chart import line_chart
 
+# Chart rendering: "svg", "webgl" or "auto" to use WebGL for large data
+RENDER_MODE = "auto"
+# The paralympics .xlsx file, with the chart column names (event_type, place_name, ...)
+event_source = EventFileSource()
+
 
-@st.cache_data
 def load_data():
-    """ Read the JSON structured data into a pandas DataFrame
+    """ Return the paralympics data as a typed pandas DataFrame
 
-    @st.cache_data allows the data to be cached
+    The DataFrame is read from the .xlsx file once for each version of the file and shared by every
+    session of the app, so it is not modified here.
 
     Returns:
         df  pandas DataFrame with the unstructured paralympics data i.e. single table
     """
-    para_data = get_event_data()
-    df = pd.read_json(StringIO(para_data))
-    df['start'] = pd.to_datetime(df['start'], dayfirst=True)
-    df['end'] = pd.to_datetime(df['end'], dayfirst=True)
-    return df
+    return event_source.get_dataframe()
 
 st.title("Paralympics Streamlit App")
 
@@ -27,6 +27,6 @@ st.subheader("Table of data")
 st.dataframe(df)
 
 st.subheader("Chart")
-chart = line_chart("participants", df)
+chart = line_chart("participants", df, render_mode=RENDER_MODE)
 st.plotly_chart(chart)
 
@@ -0,0 +1,214 @@
+""" Admission control for the FastAPI apps
+
+Limits the number of requests that are processed at the same time. Requests are grouped into route
+classes (e.g. 'bulk' for /all, 'write' for POST) and each class has its own concurrency limit and
+a bounded wait queue. When the queue is full, or a request waits longer than the queue timeout, the
+request is rejected straight away with 503 Service Unavailable and a Retry-After header. This keeps
+latency predictable when load exceeds capacity instead of letting requests pile up.
+
+Usage:
+    admission = AdmissionController([
+        RouteClass("bulk", max_concurrency=4, max_queue=16, paths=("/all",)),
+        RouteClass("default", max_concurrency=32, max_queue=64),
+    ])
+    app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
+    admission.metrics() returns the in-flight count and queue depth for each route class.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence
+
+
+@dataclass
+class RouteClass:
+    """ Concurrency limits for a group of routes.
+
+    Attributes:
+        name: name of the route class, used in the metrics
+        max_concurrency: maximum number of requests processed at the same time
+        max_queue: maximum number of requests waiting for a slot, further requests are rejected
+        queue_timeout: maximum time in seconds a request waits in the queue before it is rejected
+        retry_after: value in seconds of the Retry-After header sent with a 503 response
+        paths: paths in the class, a path ending in '*' is a prefix. Empty matches every path.
+        methods: HTTP methods in the class. Empty matches every method.
+    """
+    name: str
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float = 1.0
+    retry_after: int = 1
+    paths: Sequence[str] = ()
+    methods: Sequence[str] = ()
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method.upper() not in self.methods:
+            return False
+        if not self.paths:
+            return True
+        for p in self.paths:
+            if p.endswith("*"):
+                if path.startswith(p[:-1]):
+                    return True
+            elif path == p:
+                return True
+        return False
+
+
+class _Gate:
+    """ Counting semaphore with a bounded FIFO wait queue and metrics for one route class."""
+
+    def __init__(self, route_class: RouteClass):
+        self.route_class = route_class
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """ Wait for a slot. Returns False if the request should be rejected."""
+        rc = self.route_class
+        if self.in_flight < rc.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= rc.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        start = time.perf_counter()
+        try:
+            # release() hands its slot directly to the waiter, so in_flight is not changed here
+            await asyncio.wait_for(waiter, timeout=rc.queue_timeout)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as the timeout fired, give it back
+                self.release()
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self.total_wait += time.perf_counter() - start
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _remove(self, waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def metrics(self) -> Dict:
+        rc = self.route_class
+        return {
+            "max_concurrency": rc.max_concurrency,
+            "max_queue": rc.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_queue_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+        }
+
+
+class AdmissionController:
+    """ Holds the route classes, their gates and metrics.
+
+    The first route class that matches a request is used. Requests that match no route class,
+    or whose path is in exempt_paths, are not limited.
+
+    Args:
+        route_classes: route classes in the order they are matched
+        exempt_paths: paths that are never limited, e.g. the API docs and the metrics route
+    """
+
+    def __init__(self, route_classes: Iterable[RouteClass], exempt_paths: Iterable[str] = ()):
+        self._gates = [_Gate(rc) for rc in route_classes]
+        names = [g.route_class.name for g in self._gates]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Route class names must be unique: {names}")
+        self.exempt_paths = set(exempt_paths)
+
+    def gate_for(self, method: str, path: str) -> Optional[_Gate]:
+        if path in self.exempt_paths:
+            return None
+        for gate in self._gates:
+            if gate.route_class.matches(method, path):
+                return gate
+        return None
+
+    def metrics(self) -> Dict[str, Dict]:
+        """ Returns the current metrics for each route class, keyed by route class name."""
+        return {g.route_class.name: g.metrics() for g in self._gates}
+
+
+class AdmissionControlMiddleware:
+    """ ASGI middleware that applies an AdmissionController to HTTP requests.
+
+    Args:
+        app: the ASGI app
+        controller: the AdmissionController with the route classes
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        gate = self.controller.gate_for(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        if not await gate.acquire():
+            await self._reject(gate.route_class, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    @staticmethod
+    async def _reject(route_class: RouteClass, send) -> None:
+        body = json.dumps({
+            "detail": f"Server busy ({route_class.name} requests), retry later"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(route_class.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
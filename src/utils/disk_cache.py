@@ -0,0 +1,308 @@
+""" Cache shared by the processes of an app, stored in a local SQLite file
+
+st.cache_data and functools.lru_cache are per process: when an app runs as several processes each
+one loads the same data again. DiskCache stores pickled values in a SQLite file that every process
+on the machine can read, so data loaded by one process is reused by the others.
+
+- each entry expires after a TTL
+- each entry can store the data version it was loaded from, an entry for another version is a miss
+- when there are more than max_entries entries, those closest to expiring are removed
+- hits and misses are counted, per process, and with shared_stats=True also in the cache file for
+  each function (the part of the key before ':'), summed over every process. The shared counts
+  are kept in memory and added to the file every stats_flush_every lookups or
+  stats_flush_interval seconds, so a lookup does not write to the file
+
+Values are pickled, so anyone who can write to the cache file can run code in the apps. The default
+file is in this user's cache directory, private_cache_dir(), which only this user can access, and a
+cache file that belongs to another user or that other users can write to is refused.
+
+Usage:
+    @disk_cached(ttl=60, version=get_data_version)
+    def load_data(query):
+        ...
+
+    cache = DiskCache(private_cache_dir() / "data.sqlite", ttl=300, max_entries=256)
+    cache.set("key", value, version="3")
+    cache.get("key", version="3")
+"""
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import platformdirs
+
+CACHE_DIR_ENV = "COMP0034_CACHE_DIR"  # set to use another directory for the cache files
+DEFAULT_CACHE_NAME = "cache.sqlite"
+DEFAULT_TTL = 300  # seconds
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_STATS_FLUSH_EVERY = 100  # lookups
+DEFAULT_STATS_FLUSH_INTERVAL = 10  # seconds
+
+_MISSING = object()
+
+
+def private_cache_dir() -> Path:
+    """ Return this user's directory for the apps' cache files, creating it with mode 0700.
+
+    The directory is platformdirs.user_cache_dir("comp0034"), or $COMP0034_CACHE_DIR if it is set.
+
+    Raises:
+        PermissionError: if the directory belongs to another user or other users can access it
+    """
+    path = Path(os.environ.get(CACHE_DIR_ENV) or platformdirs.user_cache_dir("comp0034"))
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    check_private(path, other_access=0o077)
+    return path
+
+
+def check_private(path: Path, other_access: int = 0o022) -> None:
+    """ Check that a file or directory belongs to this user and other users cannot use it.
+
+    Does nothing on platforms without POSIX file owners and modes.
+
+    Args:
+        path: the file or directory
+        other_access: the mode bits other users must not have, by default group and other write
+
+    Raises:
+        PermissionError: if the path belongs to another user or has any of the other_access bits
+    """
+    if not hasattr(os, "getuid"):
+        return
+    stat = path.stat()
+    if stat.st_uid != os.getuid() or stat.st_mode & other_access:
+        raise PermissionError(f"{path} must belong to this user and have no {other_access:o} "
+                              f"permissions, it has {stat.st_mode & 0o777:o}")
+
+
+class DiskCache:
+    """ Key-value cache in a SQLite file, shared by every process that uses the same file.
+
+    Attributes:
+        path: path to the SQLite cache file, created if it does not exist, DEFAULT_CACHE_NAME in
+            private_cache_dir() if None
+        ttl: default time in seconds an entry is used for
+        max_entries: maximum number of entries in the cache
+        hits: number of lookups by this process that found an entry
+        misses: number of lookups by this process that did not find an entry
+        shared_stats: if True, hits and misses are also counted in the cache file for each function,
+            so the counts cover every process
+        stats_flush_every: with shared_stats, the counts are added to the file after this many
+            lookups
+        stats_flush_interval: with shared_stats, the counts are also added to the file by the first
+            lookup this many seconds after they were last added
+
+    Methods:
+        get(self, key, default, version): Returns the value for the key, or default
+        set(self, key, value, version, ttl): Stores the value, evicting entries if the cache is full
+        delete(self, key): Removes the entry for the key
+        clear(self): Removes every entry
+        flush_stats(self): Adds the shared counts kept in memory to the file
+        stats(self): Returns the hit, miss and entry counts
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, shared_stats: bool = False,
+                 stats_flush_every: int = DEFAULT_STATS_FLUSH_EVERY,
+                 stats_flush_interval: float = DEFAULT_STATS_FLUSH_INTERVAL):
+        if path is None:
+            path = private_cache_dir().joinpath(DEFAULT_CACHE_NAME)
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_stats = shared_stats
+        self.stats_flush_every = stats_flush_every
+        self.stats_flush_interval = stats_flush_interval
+        self.hits = 0
+        self.misses = 0
+        # Shared counts not yet added to the file: function name -> [hits, misses]
+        self._pending: Dict[str, List[int]] = {}
+        self._pending_lookups = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Create the file readable only by this user, and refuse a file another user could have
+        # written pickles to
+        os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+        check_private(self.path)
+        with closing(self._connect()) as conn, conn:
+            # WAL lets the other processes read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, version TEXT, expires REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "name TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, key: str, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if not self.shared_stats:
+                return
+            counts = self._pending.setdefault(key.split(":", 1)[0], [0, 0])
+            counts[0 if hit else 1] += 1
+            self._pending_lookups += 1
+            due = (self._pending_lookups >= self.stats_flush_every
+                   or time.monotonic() - self._flushed_at >= self.stats_flush_interval)
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self) -> None:
+        """ Add the hits and misses counted since the last flush to the shared counts."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_lookups = 0
+            self._flushed_at = time.monotonic()
+        if pending:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT INTO stats (name, hits, misses) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (name) DO UPDATE SET "
+                                 "hits = hits + excluded.hits, misses = misses + excluded.misses",
+                                 [(name, hits, misses) for name, (hits, misses) in pending.items()])
+
+    def get(self, key: str, default: Any = None, version: Optional[str] = None) -> Any:
+        """ Return the value stored for the key.
+
+        Args:
+            key: the cache key
+            default: value returned if there is no entry, or it has expired
+            version: if given, an entry stored for another version is treated as missing
+
+        Returns:
+            value: the stored value, or default
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT version, expires, value FROM cache WHERE key = ?",
+                               (key,)).fetchone()
+        if row is None or row[1] < time.time() \
+                or (version is not None and row[0] != str(version)):
+            self._count(key, hit=False)
+            return default
+        self._count(key, hit=True)
+        return pickle.loads(row[2])
+
+    def set(self, key: str, value: Any, version: Optional[str] = None,
+            ttl: Optional[float] = None) -> None:
+        """ Store a value, replacing any entry for the key.
+
+        Args:
+            key: the cache key
+            value: the value, must be picklable
+            version: the data version the value was loaded from
+            ttl: time in seconds the value is used for, the cache ttl if None
+        """
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, version, expires, value) "
+                         "VALUES (?, ?, ?, ?)",
+                         (key, None if version is None else str(version), expires, blob))
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+            excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM cache WHERE key IN "
+                             "(SELECT key FROM cache ORDER BY expires LIMIT ?)", (excess,))
+
+    def delete(self, key: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending = {}
+            self._pending_lookups = 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM stats")
+
+    def stats(self) -> Dict[str, Any]:
+        """ Return the hits and misses of this process and the number of entries.
+
+        With shared_stats, "functions" has the hits and misses for each function from every process,
+        including this process's counts that were not yet in the file. Other processes' counts are
+        only included once they have been added to the file.
+        """
+        if self.shared_stats:
+            self.flush_stats()
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            shared = conn.execute("SELECT name, hits, misses FROM stats ORDER BY name").fetchall()
+        with self._lock:
+            stats = {"hits": self.hits, "misses": self.misses, "entries": entries}
+        if self.shared_stats:
+            stats["functions"] = {name: {"hits": hits, "misses": misses}
+                                  for name, hits, misses in shared}
+        return stats
+
+
+@functools.lru_cache(maxsize=None)
+def default_cache() -> DiskCache:
+    """ Return the DiskCache in private_cache_dir() shared by the apps in this process.
+
+    It is created on first use, so importing a module that uses it does not open the file.
+    """
+    return DiskCache()
+
+
+def cache_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    """ Return the cache key for a call of func, the arguments must be picklable.
+
+    The key includes the file func is defined in, as the scripts run by 'streamlit run' are all
+    called __main__.
+    """
+    code = getattr(func, "__code__", None)
+    digest = hashlib.sha256(pickle.dumps(
+        (getattr(code, "co_filename", ""), args, sorted(kwargs.items())),
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )).hexdigest()
+    return f"{func.__module__}.{func.__qualname__}:{digest}"
+
+
+def disk_cached(ttl: Optional[float] = None, version: Optional[Callable[[], Any]] = None,
+                cache: Optional[DiskCache] = None) -> Callable:
+    """ Decorator that stores the results of a function in a DiskCache.
+
+    Args:
+        ttl: time in seconds a result is used for, the cache ttl if None
+        version: function that returns the current data version, results for another version are
+            loaded again
+        cache: the DiskCache, default_cache() if None
+
+    Usage:
+        @disk_cached(ttl=60, version=get_data_version)
+        def load_data():
+            ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = cache or default_cache()
+            key = cache_key(func, args, kwargs)
+            current = None if version is None else version()
+            value = store.get(key, _MISSING, version=current)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                store.set(key, value, version=current, ttl=ttl)
+            return value
+
+        return wrapper
+
+    return decorator
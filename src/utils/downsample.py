@@ -0,0 +1,95 @@
+""" Downsampling for time-series charts
+
+Largest-Triangle-Three-Buckets (LTTB) reduces a series to a fixed number of points while keeping
+its visual shape: peaks and troughs are kept, points on straight stretches are dropped. Use it to
+limit the number of points a line chart sends to the browser.
+
+Reference: Sveinn Steinarsson, 'Downsampling Time Series for Visual Representation', 2013.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """ Return the indices of the points LTTB keeps when reducing a series to n_out points.
+
+    Args:
+        x: x values in ascending order (numbers or datetimes)
+        y: y values, the same length as x
+        n_out: number of points to keep, at least 3
+
+    Returns:
+        indices: sorted array of n_out indices into x and y, or all indices if len(x) <= n_out
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out < 3:
+        raise ValueError("n_out must be at least 3")
+    if n <= n_out:
+        return np.arange(n)
+
+    # Bucket edges for the points between the first and the last, which are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    # The mean of every bucket, computed at once. The last point is the 'next bucket' of the last.
+    counts = ends - starts
+    x_means = np.append(np.add.reduceat(x[:n - 1], starts) / counts, x[-1])
+    y_means = np.append(np.add.reduceat(y[:n - 1], starts) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    # Each choice depends on the point chosen from the previous bucket, so the buckets are visited
+    # in order, the areas within a bucket are computed with one vectorised expression
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs((x[a] - x_means[i + 1]) * (by - y[a]) - (x[a] - bx) * (y_means[i + 1] - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: Optional[int],
+               group: Optional[str] = None) -> pd.DataFrame:
+    """ Reduce a DataFrame to at most max_points rows for plotting y against x with LTTB.
+
+    When group is given (e.g. the column used for the line colour) each group is downsampled
+    separately and the point budget is shared between the groups in proportion to their size.
+    Rows where x or y is missing are dropped from a series that is downsampled.
+
+    Args:
+        df: DataFrame with the series
+        x: name of the x column
+        y: name of the y column
+        max_points: maximum number of rows to return, None to return df unchanged
+        group: name of the column that splits the rows into separate series
+
+    Returns:
+        df: DataFrame with the rows that were kept, in x order within each group
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    if group is None:
+        groups = [df]
+    else:
+        groups = [g for _, g in df.groupby(group, sort=False, observed=True)]
+    if max_points < 3 * len(groups):
+        raise ValueError(f"max_points must be at least 3 for each series ({3 * len(groups)})")
+
+    groups = [g.dropna(subset=[x, y]).sort_values(x, kind="stable") for g in groups]
+    total = sum(len(g) for g in groups)
+    if total == 0:
+        return df.iloc[0:0]
+    budgets = [max(3, max_points * len(g) // total) for g in groups]
+    # The minimum of 3 per series can take the total over budget, take the excess from the largest
+    while sum(budgets) > max_points:
+        budgets[budgets.index(max(budgets))] -= 1
+    parts = [g.iloc[lttb_indices(g[x].to_numpy(), g[y].to_numpy(), budget)]
+             for g, budget in zip(groups, budgets)]
+    return pd.concat(parts)
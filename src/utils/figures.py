@@ -0,0 +1,210 @@
+""" Figure builders for the paralympics charts
+
+These functions build the Plotly figures from a DataFrame of the /all (chart) data and do not fetch
+any data themselves, so every app and API builds the same figures: the chart functions in
+paralympics.charts build them from a data.sources.ChartDataSource, and the /charts routes of the
+backend and of the mock_api build them from the database. The *_COLUMNS lists are the columns each
+figure needs, for the sources to read only those.
+
+FigureJSONCache keeps the JSON of the figures built by the /charts routes for a data version.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+import plotly.express as px
+
+from utils.downsample import downsample
+from utils.render_mode import WEBGL_THRESHOLD, resolve_render_mode
+
+LINE_CHART_FEATURES = ["sports", "participants", "events", "countries"]
+LINE_CHART_COLUMNS = ["event_type", "year", *LINE_CHART_FEATURES]
+BAR_CHART_COLUMNS = ["event_type", "year", "place_name", "participants_m", "participants_f",
+                     "participants"]
+MAP_COLUMNS = ["year", "place_name", "latitude", "longitude"]
+
+
+def line_figure(df, feature, max_points=None, render_mode="auto",
+                webgl_threshold=WEBGL_THRESHOLD):
+    """ Creates a line chart
+
+    Data is displayed over time from 1960 onwards.
+    The figure shows separate trends for the winter and summer events.
+
+     Args:
+        df: DataFrame with the chart data
+        feature (str): events, sports, countries, or participants
+        max_points (int): optional point budget, the series are downsampled with LTTB to at most
+            this many points in total
+        render_mode (str): 'svg', 'webgl' (scattergl traces), or 'auto' to use WebGL when there
+            are more than webgl_threshold points
+        webgl_threshold (int): number of points above which 'auto' uses WebGL
+
+     Returns:
+        fig: Plotly Express line figure
+
+     Raises:
+         ValueError: If the feature is not one of the valid options
+     """
+    if feature not in LINE_CHART_FEATURES:
+        raise ValueError(
+            'Invalid value for "feature". Must be one of ["sports", "participants", "events", "countries"]')
+    else:
+        # Make sure it is lowercase to match the dataframe column names
+        feature = feature.lower()
+
+    # Only the columns needed for this chart
+    chart_df = df[["event_type", "year", feature]]
+    chart_df = downsample(chart_df, "year", feature, max_points, group="event_type")
+
+    # Create a Plotly Express line chart with the following parameters
+    #    chart_df is the DataFrame
+    #    x="year" is the column to use as the x-axis
+    #    y=feature is the column to use as the y-axis
+    #    color="event_type" indicates if winter or summer
+    #    render_mode="webgl" uses scattergl traces rather than SVG
+    fig = px.line(chart_df, x="year", y=feature, color="event_type",
+                  render_mode=resolve_render_mode(len(chart_df), render_mode, webgl_threshold))
+    return fig
+
+
+def bar_figure(df, event_type):
+    """
+    Creates a stacked bar chart showing change in the ration of male and female competitors in the summer and winter paralympics.
+
+    Parameters
+    df: DataFrame with the chart data
+    event_type: str winter or summer
+
+    Returns
+    fig: Plotly Express bar chart
+    """
+    df_plot = (
+        df[BAR_CHART_COLUMNS]
+        .dropna(subset=['participants_m', 'participants_f'])
+        .query("event_type == @event_type")
+        .assign(  # Avoid divide-by-zero; if participants==0, set NaN, then drop
+            Male=lambda d: d['participants_m'].where(d['participants'] != 0, pd.NA) / d[
+                'participants'],
+            Female=lambda d: d['participants_f'].where(d['participants'] != 0, pd.NA) / d[
+                'participants'],
+            xlabel=lambda d: d['place_name'].astype(str) + " " + d['year'].astype(str), )
+        .dropna(subset=['Male', 'Female'])
+        .sort_values(['event_type', 'year'])
+    )
+
+    fig = px.bar(df_plot,
+                 x='xlabel',
+                 y=['Male', 'Female'],
+                 title=f'How has the ratio of female:male participants changed in the {event_type} paralympics?',
+                 labels={'xlabel': '', 'value': '', 'variable': ''},
+                 template="simple_white"
+                 )
+    fig.update_xaxes(ticklen=0)
+    fig.update_yaxes(tickformat=".0%")
+    return fig
+
+
+def map_figure(df, render_mode="auto", webgl_threshold=WEBGL_THRESHOLD):
+    """ Creates a scatter chart with locations of all Paralympics
+
+    Args:
+        df: DataFrame with the chart data
+        render_mode (str): 'svg' (scatter_geo), 'webgl' (scatter_map, drawn with WebGL), or 'auto'
+            to use WebGL when there are more than webgl_threshold points
+        webgl_threshold (int): number of points above which 'auto' uses WebGL
+
+    Returns:
+        fig: Plotly Express scatter geo or scatter map figure
+    """
+
+    # copy() so that the DataFrame passed in is not modified
+    chart_df = df[MAP_COLUMNS].copy()
+    # The lat and lon must be floats for the scatter_geo
+    chart_df['longitude'] = chart_df['longitude'].astype(float)
+    chart_df['latitude'] = chart_df['latitude'].astype(float)
+    # Add a new column that concatenates the place_name and year e.g. Barcelona 2012
+    chart_df['name'] = chart_df['place_name'].astype(str) + ' ' + chart_df['year'].astype(str)
+
+    # Create the figure
+    if resolve_render_mode(len(chart_df), render_mode, webgl_threshold) == "webgl":
+        return px.scatter_map(chart_df,
+                              lat="latitude",
+                              lon="longitude",
+                              hover_name="name",
+                              zoom=0,
+                              title="Where have the paralympics been held?"
+                              )
+    fig = px.scatter_geo(chart_df,
+                         lat=chart_df.latitude,
+                         lon=chart_df.longitude,
+                         hover_name=chart_df.name,
+                         title="Where have the paralympics been held?"
+                         )
+    return fig
+
+
+def cluster_map_figure(df, render_mode="auto", webgl_threshold=WEBGL_THRESHOLD):
+    """ Creates a scatter chart of clustered Paralympics locations, sized by the number of games
+
+    Args:
+        df: DataFrame with the clusters from the /map/clusters route (latitude, longitude, count,
+            names)
+        render_mode (str): 'svg' (scatter_geo), 'webgl' (scatter_map), or 'auto' to use WebGL
+            when there are more than webgl_threshold clusters
+        webgl_threshold (int): number of clusters above which 'auto' uses WebGL
+
+    Returns:
+        fig: Plotly Express scatter geo or scatter map figure
+    """
+    chart_df = df[["latitude", "longitude", "count"]].copy()
+    # Hover text lists the games in the cluster e.g. "Sydney 2000, Sydney 2000 (+1 more)"
+    chart_df["label"] = [
+        ", ".join(names) + (f" (+{count - len(names)} more)" if count > len(names) else "")
+        for names, count in zip(df["names"], df["count"])
+    ]
+    args = dict(lat="latitude", lon="longitude", size="count", hover_name="label",
+                hover_data={"count": True, "latitude": False, "longitude": False},
+                title="Where have the paralympics been held?")
+    if resolve_render_mode(len(chart_df), render_mode, webgl_threshold) == "webgl":
+        return px.scatter_map(chart_df, zoom=0, **args)
+    return px.scatter_geo(chart_df, **args)
+
+
+class FigureJSONCache:
+    """ Plotly figure JSON cached with the data version it was built from.
+
+    When a figure is requested for another data version the cache is emptied, so each figure is
+    built at most once per version of the data however many clients request it.
+
+    Methods:
+        get(self, version, key, build): Returns the figure JSON for key, building it if needed
+    """
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._figures: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, version: str, key: Hashable, build: Callable[[], Any]) -> str:
+        """ Return the JSON of the figure for key, calling build() to make the figure if needed.
+
+        Args:
+            version: the current data version
+            key: identifies the figure and its options, e.g. ("trend", "sports", None)
+            build: function that returns the Plotly figure
+
+        Returns:
+            the figure JSON
+        """
+        # One lock so concurrent requests for a figure wait for it to be built rather than each
+        # building it
+        with self._lock:
+            if version != self._version:
+                self._figures.clear()
+                self._version = version
+            fig_json = self._figures.get(key)
+            if fig_json is None:
+                fig_json = build().to_json()
+                self._figures[key] = fig_json
+        return fig_json
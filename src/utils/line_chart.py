@@ -1,6 +1,11 @@
 import plotly.express as px
 
-def line_chart(feature, df):
+from data.columns import EVENT_FILE_COLUMNS
+from utils.downsample import downsample
+from utils.render_mode import resolve_render_mode
+
+
+def line_chart(feature, df, max_points=None, render_mode="auto"):
     """ Creates a line chart with data
 
     Data is displayed over time from 1960 onwards.
@@ -8,6 +13,11 @@ def line_chart(feature, df):
 
      Parameters
      feature: events, sports or participants
+     df: DataFrame with the paralympics event data, with the chart column names (event_type, ...)
+        from a data.sources.ChartDataSource or the .xlsx names (type, ...)
+     max_points: optional point budget, the series are downsampled with LTTB to at most this many
+        points in total
+     render_mode: 'svg', 'webgl' (scattergl traces), or 'auto' to use WebGL for large data
 
      Returns
      fig: Plotly Express line figure
@@ -21,9 +31,11 @@ def line_chart(feature, df):
         # Make sure it is lowercase to match the dataframe column names
         feature = feature.lower()
 
-    # Read the data from pandas into a dataframe
-    cols = ["type", "year", "host", "events", "sports", "participants", "countries"]
+    # Use the chart column names, whichever source the data came from
+    df = df.rename(columns={k: v for k, v in EVENT_FILE_COLUMNS.items() if k in df.columns})
+    cols = ["event_type", "year", "place_name", "events", "sports", "participants", "countries"]
     line_chart_data = df[cols]
+    line_chart_data = downsample(line_chart_data, "year", feature, max_points, group="event_type")
 
     # Set the title for the chart using the value of 'feature'
     title_text = f"How has the number of {feature} changed over time?"
@@ -33,17 +45,19 @@ def line_chart(feature, df):
       line_chart_data is the DataFrane
       x="year" is the column to use as a x-axis
       y=feature is the column to use as the y-axis
-      color="type" indicates if winter or summer
+      color="event_type" indicates if winter or summer
       title=title_text sets the title using the variable title_text
       labels={} sets the X label to Year, sets the Y axis and the legend to nothing (an empty string)
       template="simple_white" uses a Plotly theme to style the chart
+      render_mode="webgl" uses scattergl traces rather than SVG, 'auto' chooses by the data size
     '''
     fig = px.line(line_chart_data,
                   x="year",
                   y=str(feature),
-                  color="type",
+                  color="event_type",
                   title=title_text,
-                  labels={'year': 'Year', str(feature): '', 'type': ''},
-                  template="simple_white"
+                  labels={'year': 'Year', str(feature): '', 'event_type': ''},
+                  template="simple_white",
+                  render_mode=resolve_render_mode(len(line_chart_data), render_mode)
                   )
     return fig
\ No newline at end of file
@@ -0,0 +1,31 @@
+""" Choice between SVG and WebGL rendering for Plotly charts
+
+SVG traces (scatter, scattergeo) draw every point as a DOM element and become unusable past a few
+thousand points. WebGL traces (scattergl, scattermap) draw on a canvas and stay responsive with
+hundreds of thousands of points, but each WebGL chart uses a browser WebGL context, and browsers
+limit how many a page can have. So charts use SVG for small data and switch to WebGL above a
+threshold.
+"""
+RENDER_MODES = ("auto", "svg", "webgl")
+WEBGL_THRESHOLD = 1000  # number of points above which 'auto' uses WebGL
+
+
+def resolve_render_mode(n_points, render_mode="auto", threshold=WEBGL_THRESHOLD):
+    """ Return 'svg' or 'webgl' for a chart with n_points points.
+
+    Args:
+        n_points: number of points the chart will draw
+        render_mode: 'svg', 'webgl', or 'auto' to choose by the number of points
+        threshold: number of points above which 'auto' uses WebGL
+
+    Returns:
+        'svg' or 'webgl'
+
+    Raises:
+        ValueError: if render_mode is not one of RENDER_MODES
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f'Invalid value for "render_mode". Must be one of {list(RENDER_MODES)}')
+    if render_mode == "auto":
+        return "webgl" if n_points > threshold else "svg"
+    return render_mode
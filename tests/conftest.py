@@ -1,4 +1,6 @@
+import os
 import subprocess
+import tempfile
 import time
 from pathlib import Path
 
@@ -9,6 +11,19 @@ import threading
 import requests
 
 
+def pytest_configure(config):
+    """Put the apps' cache files in a temporary directory rather than the user's cache directory.
+
+    Set before the tests are collected, as importing an app module can create a cache.
+    """
+    config.cache_dir_for_apps = tempfile.mkdtemp(prefix="comp0034-tests-")
+    os.environ["COMP0034_CACHE_DIR"] = config.cache_dir_for_apps
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(getattr(config, "cache_dir_for_apps", ""), ignore_errors=True)
+
+
 def wait_for_http(url, timeout=60):
     start = time.time()
     while time.time() - start < timeout:
@@ -24,19 +39,14 @@ def wait_for_http(url, timeout=60):
 def api_server():
     """Start the REST API server before app testing."""
 
-    # Create a copy of the database
-    root = Path(__file__).parent.parent
-    _orig_db = root.joinpath("src", "data", "paralympics.db")
-    _backup_db = _orig_db.with_suffix(_orig_db.suffix + ".orig")
-
-    if not _orig_db.exists():
-        raise RuntimeError(f"Original DB not found: {_orig_db}")
-
-    # backup original database
-    shutil.copy2(_orig_db, _backup_db)
-
     # Import the REST API app and run in a thread
-    from src.data.mock_api import app
+    from src.data.mock_api import app, data
+
+    # Snapshot the original database in memory so it can be restored after each test.
+    # Also keep the file bytes: a restored database has the same data but a different file
+    # header, and the file is tracked by git.
+    snapshot = data.snapshot()
+    original_bytes = data.database_file.read_bytes()
 
     thread = threading.Thread(
         target=uvicorn.run,
@@ -54,15 +64,37 @@ def api_server():
     # Alternative use `time.sleep(10)`
     wait_for_http("http://127.0.0.1:8000")
 
+    yield snapshot
+
+    # Teardown: restore the original database file if anything was written
+    data.restore(snapshot)
+    snapshot.close()
+    if data.database_file.read_bytes() != original_bytes:
+        data.database_file.write_bytes(original_bytes)
+
+
+@pytest.fixture(autouse=True)
+def reset_db(api_server):
+    """Restore the database after each test so tests can't affect each other.
+
+    Restoring the in-memory snapshot with the SQLite backup API takes milliseconds.
+    """
     yield
+    from src.data.mock_api import data
+    data.restore(api_server)
 
-    # Teardown: restore the original database
-    if _backup_db.exists():
-        shutil.copy2(_backup_db, _orig_db)
-        try:
-            _backup_db.unlink()
-        except Exception:
-            pass
+
+@pytest.fixture
+def paralympics_data(tmp_path):
+    """ParalympicsData for a copy of the database so tests can write to it."""
+    from src.data.data_class import ParalympicsData
+
+    root = Path(__file__).parent.parent
+    db_file = tmp_path.joinpath("paralympics.db")
+    shutil.copy2(root.joinpath("src", "data", "paralympics.db"), db_file)
+    para_data = ParalympicsData(database_file=db_file)
+    yield para_data
+    para_data.close()
 
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from src.utils.admission import AdmissionControlMiddleware, AdmissionController, RouteClass
+
+
+def _slow_app(controller):
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, controller=controller)
+    release = asyncio.Event()
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    return app, release
+
+
+def test_excess_requests_rejected_with_retry_after():
+    """
+    GIVEN an app that allows 1 'slow' request at a time with a queue of 1
+    WHEN 4 slow requests arrive at the same time
+    THEN 2 should be rejected straight away with 503 and a Retry-After header
+    AND the other 2 should succeed once the first completes
+    AND the other route class should not be affected
+    """
+    controller = AdmissionController([
+        RouteClass("slow", max_concurrency=1, max_queue=1, queue_timeout=5, retry_after=3,
+                   paths=("/slow",)),
+        RouteClass("default", max_concurrency=10, max_queue=10),
+    ])
+    app, release = _slow_app(controller)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            tasks = [asyncio.create_task(client.get("/slow")) for _ in range(4)]
+            await asyncio.sleep(0.1)
+            metrics = controller.metrics()["slow"]
+            fast = await client.get("/fast")
+            release.set()
+            return await asyncio.gather(*tasks), metrics, fast
+
+    responses, metrics, fast = asyncio.run(run())
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200, 200, 503, 503]
+    rejected = [r for r in responses if r.status_code == 503]
+    assert all(r.headers["retry-after"] == "3" for r in rejected)
+    assert metrics["in_flight"] == 1
+    assert metrics["queue_depth"] == 1
+    assert metrics["rejected"] == 2
+    assert fast.status_code == 200
+    assert controller.metrics()["slow"]["in_flight"] == 0
+
+
+def test_queued_request_times_out():
+    """
+    GIVEN an app that allows 1 'slow' request at a time with a short queue timeout
+    WHEN a second request waits longer than the timeout
+    THEN it should be rejected with 503 and counted as timed out
+    """
+    controller = AdmissionController([
+        RouteClass("slow", max_concurrency=1, max_queue=5, queue_timeout=0.05, paths=("/slow",)),
+    ])
+    app, release = _slow_app(controller)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/slow"))
+            await asyncio.sleep(0.01)
+            second = await client.get("/slow")
+            release.set()
+            return await first, second
+
+    first, second = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert controller.metrics()["slow"]["timed_out"] == 1
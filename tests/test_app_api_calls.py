@@ -0,0 +1,117 @@
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+from streamlit.testing.v1 import AppTest
+
+from paralympics import data_client
+from paralympics.data_client import get_chart_client
+from paralympics.figure_cache import figure_cache
+from utils.disk_cache import CACHE_DIR_ENV, default_cache
+
+APP_FILE = Path(__file__).parent.parent.joinpath("src", "paralympics", "app.py")
+
+
+def _reset_shared_caches():
+    default_cache.cache_clear()
+    get_chart_client.cache_clear()
+    data_client._default_source.cache_clear()
+    figure_cache.clear()
+
+
+@pytest.fixture
+def api_calls(monkeypatch, tmp_path):
+    """Counts the requests the app makes to the REST API, keyed by (method, path).
+
+    The disk cache is in tmp_path rather than the user's cache directory, so the tests start with
+    an empty cache and do not clear the cache of the user's running apps.
+    """
+    calls = Counter()
+    original = requests.Session.request
+
+    def counting_request(self, method, url, *args, **kwargs):
+        calls[(method.upper(), urlsplit(url).path)] += 1
+        return original(self, method, url, *args, **kwargs)
+
+    monkeypatch.setattr(requests.Session, "request", counting_request)
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    # Start without data or figures cached by earlier tests, with a new client and disk cache
+    _reset_shared_caches()
+    yield calls
+    _reset_shared_caches()
+
+
+def test_quiz_answer_makes_one_api_call(api_calls):
+    """
+    GIVEN the dashboard showing the first quiz question
+    WHEN a wrong answer and then the correct answer are submitted
+    THEN each submission should make one request, to check the answer
+    AND the chart data should not be requested
+    """
+    at = AppTest.from_file(APP_FILE, default_timeout=30).run()
+    assert not at.exception
+    assert api_calls == {("GET", "/quiz"): 1}
+
+    responses = requests.get("http://127.0.0.1:8000/response/search",
+                             params={"question_id": 1}, timeout=5).json()
+    wrong = next(r["response_text"] for r in responses if not r["is_correct"])
+    correct = next(r["response_text"] for r in responses if r["is_correct"])
+
+    api_calls.clear()
+    at.radio(key="quiz_answer").set_value(wrong)
+    at.button[0].click().run()
+    assert at.session_state.q_index == 1
+    assert api_calls == {("POST", "/quiz/answer"): 1}
+
+    api_calls.clear()
+    at.radio(key="quiz_answer").set_value(correct)
+    at.button[0].click().run()
+    assert at.session_state.q_index == 2
+    # The second question is on the page of questions that has already been fetched
+    assert api_calls == {("POST", "/quiz/answer"): 1}
+
+
+def test_chart_options_fetch_each_figure_once(api_calls):
+    """
+    GIVEN the dashboard with no chart chosen
+    WHEN the line chart is chosen, then another feature, then the first feature again
+    THEN each figure should be requested once from the API /charts routes
+    AND neither the chart data nor the quiz should be requested
+    """
+    at = AppTest.from_file(APP_FILE, default_timeout=30).run()
+    assert ("GET", "/charts/trend") not in api_calls
+
+    api_calls.clear()
+    at.selectbox(key="chart_choice").set_value("Trends").run()
+    assert not at.exception
+    assert at.get("plotly_chart")
+    assert api_calls == {("GET", "/charts/trend"): 1}
+
+    api_calls.clear()
+    at.selectbox(key="trend_feature").set_value("Events").run()
+    assert not at.exception
+    assert api_calls == {("GET", "/charts/trend"): 1}
+
+    api_calls.clear()
+    at.selectbox(key="trend_feature").set_value("Sports").run()
+    assert not at.exception
+    assert api_calls == {}
+
+
+def test_new_process_uses_shared_cache(api_calls):
+    """
+    GIVEN the dashboard has been loaded, filling the disk cache
+    WHEN the page is loaded in a new process, whose chart data client has no data in memory
+    THEN no requests should be made
+    """
+    AppTest.from_file(APP_FILE, default_timeout=30).run()
+    # Forget the in-memory data, as a new process would not have it
+    client = get_chart_client()
+    client._df, client._version = None, None
+
+    api_calls.clear()
+    at = AppTest.from_file(APP_FILE, default_timeout=30).run()
+    assert not at.exception
+    assert api_calls == {}
@@ -0,0 +1,140 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from backend.core.db import data_version, engine, isolated_session, restore_db, snapshot_db
+from backend.main import app
+from backend.models.models import Disability
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def test_chart_figure_built_once_per_version(client):
+    """
+    GIVEN the backend API
+    WHEN the trend chart is requested twice
+    THEN the same figure JSON should be returned with the data version as the ETag
+    AND a request with that ETag should get 304 Not Modified
+    """
+    first = client.get("/charts/trend", params={"feature": "sports"})
+    second = client.get("/charts/trend", params={"feature": "sports"})
+    assert first.status_code == 200
+    assert first.json()["data"]
+    assert second.content == first.content
+    etag = first.headers["etag"]
+    not_modified = client.get("/charts/trend", params={"feature": "sports"},
+                              headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+
+def test_chart_invalid_feature(client):
+    """
+    GIVEN the backend API
+    WHEN the trend chart is requested for a feature that does not exist
+    THEN a 422 error should be returned
+    """
+    assert client.get("/charts/trend", params={"feature": "medals"}).status_code == 422
+
+
+def test_games_multi_in_requested_order(client):
+    """
+    GIVEN the backend API
+    WHEN games are requested with GET and POST /multi in an order that is not the id order
+    THEN the games should be returned in the order requested, including duplicates
+    """
+    ids = [3, 1, 2, 1]
+    for resp in (client.get("/multi", params={"ids": "3,1,2,1"}),
+                 client.post("/multi", json={"ids": ids})):
+        assert resp.status_code == 200
+        assert [game["id"] for game in resp.json()["items"]] == ids
+        assert resp.json()["missing"] == []
+
+
+def test_games_multi_marks_missing_ids(client):
+    """
+    GIVEN the backend API
+    WHEN games are requested with an id that does not exist
+    THEN the item for that id should be None and the id should be listed as missing
+    """
+    resp = client.get("/multi", params={"ids": "1,99999,2"})
+    assert resp.status_code == 200
+    items = resp.json()["items"]
+    assert items[0]["id"] == 1 and items[1] is None and items[2]["id"] == 2
+    assert resp.json()["missing"] == [99999]
+
+
+def test_games_multi_chunks_ids_beyond_in_limit(client):
+    """
+    GIVEN the backend API
+    WHEN more games are requested than SQLite allows parameters in one query (32766 by default)
+    THEN every id should get an item, the games found in their positions and the others missing
+    """
+    ids = list(range(33_000, 0, -1))
+    resp = client.post("/multi", json={"ids": ids})
+    assert resp.status_code == 200
+    items, missing = resp.json()["items"], resp.json()["missing"]
+    assert len(items) == len(ids)
+    found = [item["id"] for item in items if item is not None]
+    missing_ids = set(missing)
+    assert found and found == [game_id for game_id in ids if game_id not in missing_ids]
+    assert len(found) + len(missing) == len(ids)
+
+
+def test_games_multi_rejects_malformed_ids(client):
+    """
+    GIVEN the backend API
+    WHEN games are requested with ids that are not integers, with GET and with POST /multi
+    THEN a 400 error should be returned for both
+    """
+    assert client.get("/multi", params={"ids": "1,two"}).status_code == 400
+    assert client.post("/multi", json={"ids": [1, "two"]}).status_code == 400
+    assert client.post("/multi", json={"ids": "1,2"}).status_code == 400
+
+
+def _disability_exists(description):
+    with Session(engine) as session:
+        statement = select(Disability).where(Disability.description == description)
+        return session.exec(statement).first() is not None
+
+
+def test_snapshot_restore_db():
+    """
+    GIVEN a snapshot of the backend database
+    WHEN it is restored before and after a row is written through the shared engine
+    THEN the first restore should be skipped as nothing was written
+    AND the second should restore the database, removing the row
+    """
+    description = "Snapshot test disability"
+    snapshot = snapshot_db()
+    try:
+        assert restore_db(snapshot) is False
+        with Session(engine) as session:
+            session.add(Disability(description=description))
+            session.commit()
+        assert _disability_exists(description)
+        assert restore_db(snapshot) is True
+        assert not _disability_exists(description)
+        assert restore_db(snapshot) is False
+    finally:
+        snapshot.close()
+
+
+def test_isolated_session_rolls_back_commits():
+    """
+    GIVEN an isolated session on the shared engine
+    WHEN a row is added and committed in the session
+    THEN the session should see the row
+    AND once the session exits the row should be rolled back and the data version unchanged
+    """
+    description = "Isolated session test disability"
+    version = data_version()
+    with isolated_session() as session:
+        session.add(Disability(description=description))
+        session.commit()
+        statement = select(Disability).where(Disability.description == description)
+        assert session.exec(statement).first() is not None
+    assert not _disability_exists(description)
+    assert data_version() == version
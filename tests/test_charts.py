@@ -0,0 +1,122 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from paralympics.charts import line_chart
+from paralympics.data_client import API_ALL_URL, ChartDataClient
+from paralympics.figure_cache import FigureCache, figure_cache
+from utils.downsample import downsample
+from utils.figures import line_figure, map_figure
+
+
+def test_concurrent_fetches_share_one_request():
+    """
+    GIVEN a chart data client with an empty cache
+    WHEN the data is requested from several threads at once
+    THEN only one request should be made
+    AND every caller should get the same DataFrame
+    """
+    client = ChartDataClient()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        frames = list(pool.map(lambda _: client.get_dataframe(), range(8)))
+    assert client.fetch_count == 1
+    assert all(df is frames[0] for df in frames)
+    assert not frames[0].empty
+
+
+def test_expired_data_revalidated_with_etag():
+    """
+    GIVEN a chart data client whose cached data has expired
+    WHEN the data has not changed
+    THEN the cached DataFrame should be reused
+    WHEN the data has changed
+    THEN the new data should be downloaded
+    """
+    client = ChartDataClient(ttl=0)
+    first = client.get_dataframe()
+    version = client.version
+    assert client.get_dataframe() is first
+    assert client.fetch_count == 2
+
+    requests.post(API_ALL_URL.replace("/all", "/question"),
+                  json={"question_text": "Changes the data version?"}, timeout=5)
+    assert client.get_dataframe() is not first
+    assert client.version != version
+
+
+def test_figure_cache_evicts_least_recently_used():
+    """
+    GIVEN a figure cache with room for 2 figures
+    WHEN a third figure is added
+    THEN the least recently used figure should be evicted
+    """
+    cache = FigureCache(max_entries=2)
+    cache.put("a", "{}")
+    cache.put("b", "{}")
+    cache.get("a")
+    cache.put("c", "{}")
+    assert cache.get("b") is None
+    assert cache.get("a") == "{}"
+    assert cache.stats()["entries"] == 2
+
+
+def test_chart_returned_from_cache():
+    """
+    GIVEN a line chart has been created
+    WHEN the same line chart is requested again
+    THEN the figure should come from the cache
+    AND it should be a separate copy of the same figure
+    """
+    figure_cache.clear()
+    first = line_chart("sports")
+    hits = figure_cache.stats()["hits"]
+    second = line_chart("sports")
+    assert figure_cache.stats()["hits"] == hits + 1
+    assert second is not first
+    assert json.loads(second.to_json()) == json.loads(first.to_json())
+
+
+def test_downsample_keeps_shape_within_budget():
+    """
+    GIVEN two series of different lengths, one with a single spike
+    WHEN they are downsampled to a budget of 100 points
+    THEN at most 100 points should be kept, shared in proportion to the series lengths
+    AND the first, last and spike points should be kept
+    """
+    x = np.arange(10000)
+    y = np.zeros(10000)
+    y[4321] = 50
+    df = pd.DataFrame({
+        "year": np.concatenate([x, x[:1000]]),
+        "value": np.concatenate([y, np.ones(1000)]),
+        "type": ["summer"] * 10000 + ["winter"] * 1000,
+    })
+    result = downsample(df, "year", "value", 100, group="type")
+    summer = result[result["type"] == "summer"]
+    assert len(result) <= 100
+    assert len(summer) > len(result) - len(summer)
+    assert {0, 4321, 9999} <= set(summer["year"])
+    assert downsample(df, "year", "value", None) is df
+
+
+def test_render_mode_switches_to_webgl_above_threshold():
+    """
+    GIVEN chart data with more points than the WebGL threshold
+    WHEN the line and map figures are built with render_mode 'auto'
+    THEN they should use WebGL traces, and SVG traces below the threshold
+    """
+    df = pd.DataFrame({
+        "event_type": ["summer", "winter"] * 50,
+        "year": range(100),
+        "sports": range(100),
+        "place_name": "Place",
+        "latitude": 1.0,
+        "longitude": 2.0,
+    })
+    assert line_figure(df, "sports", webgl_threshold=50).data[0].type == "scattergl"
+    assert line_figure(df, "sports", webgl_threshold=500).data[0].type == "scatter"
+    assert map_figure(df, webgl_threshold=50).data[0].type == "scattermap"
+    assert map_figure(df, webgl_threshold=500).data[0].type == "scattergeo"
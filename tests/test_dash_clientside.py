@@ -0,0 +1,32 @@
+import pandas as pd
+import plotly.express as px
+from dash import Dash, dcc
+
+from src.dash_app.clientside import figure_store, precompute_figures, register_figure_switch
+
+
+def test_figures_precomputed_and_switched_clientside():
+    """
+    GIVEN data aggregated once for every option
+    WHEN the figures are precomputed and the figure switch is registered
+    THEN there should be one figure per option with only the aggregated values
+    AND the switch should be a clientside callback from the control and store to the graph
+    """
+    df = pd.DataFrame({"continent": ["Asia", "Asia", "Europe"], "pop": [1, 3, 5],
+                       "lifeExp": [60, 70, 80]})
+    averages = df.groupby("continent")[["pop", "lifeExp"]].mean().reset_index()
+    figures = precompute_figures(["pop", "lifeExp"],
+                                 lambda col: px.bar(averages, x="continent", y=col))
+    assert set(figures) == {"pop", "lifeExp"}
+    assert list(figures["pop"]["data"][0]["x"]) == ["Asia", "Europe"]
+
+    app = Dash(__name__)
+    app.layout = [dcc.RadioItems(["pop", "lifeExp"], id="radio"), dcc.Graph(id="graph"),
+                  figure_store("figures", figures)]
+    register_figure_switch(control_id="radio", graph_id="graph", store_id="figures", app=app)
+    callback = next(c for c in app._callback_list if c["output"] == "graph.figure")
+    assert callback["inputs"] == [{"id": "radio", "property": "value"}]
+    assert callback["state"] == [{"id": "figures", "property": "data"}]
+    # A clientside callback has no server function to call
+    assert "clientside_function" in callback
+    assert "callback" not in app.callback_map["graph.figure"]
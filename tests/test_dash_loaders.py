@@ -0,0 +1,75 @@
+from dash import dcc
+
+from src.dash_app.loaders import VersionedLoader
+from src.dash_app.memoize import callback_cache
+from src.utils.disk_cache import CACHE_DIR_ENV
+
+
+def test_loader_is_lazy_and_reloads_when_version_changes():
+    """
+    GIVEN a VersionedLoader for a source at version 1
+    WHEN the data and a value derived from it are used before and after the source changes
+    THEN nothing should be loaded until the first use
+    AND the data and the derived value should be computed once for each version
+    """
+    source = {"version": "1"}
+    loads, derived = [], []
+
+    def load():
+        loads.append(source["version"])
+        return source["version"]
+
+    loader = VersionedLoader(load, version=lambda: source["version"], check_interval=0)
+    upper = loader.derived(lambda data: derived.append(data) or f"v{data}")
+    assert loads == [] and loader.version is None
+
+    assert [loader.get(), upper(), upper()] == ["1", "v1", "v1"]
+    source["version"] = "2"
+    assert [upper(), loader.get()] == ["v2", "2"]
+    assert loads == ["1", "2"]
+    assert derived == ["1", "2"]
+
+
+def test_loader_without_version_reloads_after_max_age():
+    """
+    GIVEN a VersionedLoader for a source with no version
+    WHEN the data is used with no max_age, and with a max_age of 0
+    THEN it should be loaded once with no max_age and on every use with a max_age of 0
+    """
+    loads = []
+    once = VersionedLoader(lambda: loads.append("once"))
+    always = VersionedLoader(lambda: loads.append("always"), max_age=0)
+    for _ in range(2):
+        once.get()
+        always.get()
+    assert loads.count("once") == 1
+    assert loads.count("always") == 2
+
+
+def test_dash_app_loads_data_on_first_page_load(tmp_path, monkeypatch):
+    """
+    GIVEN the Dash paralympics apps
+    WHEN the modules are imported, which assigns the layout functions
+    THEN no data should have been loaded
+    AND the data should be loaded by a page load or the chart callback
+    """
+    from src.dash_app import dash_para_app, dash_paralympics
+
+    assert callable(dash_para_app.app.layout)
+    assert dash_para_app.event_data.version is None
+    with dash_para_app.app.server.test_request_context("/"):
+        table, graph = dash_para_app.layout()[1:]
+    assert len(table.data) == len(dash_para_app.event_data.get())
+    assert graph.figure.data
+
+    dash_paralympics.event_data.invalidate()
+    # An empty callback cache in tmp_path rather than the user's cache directory
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    callback_cache.cache_clear()
+    layout = dash_paralympics.layout()
+    assert any(isinstance(child, dcc.Dropdown) for child in layout.children)
+    assert dash_paralympics.event_data.version is None
+    figure = dash_paralympics.update_chart("events")
+    assert dash_paralympics.event_data.version is not None
+    assert "events" in figure.layout.title.text
+    callback_cache.cache_clear()
@@ -0,0 +1,41 @@
+from dash import Dash, html
+
+from src.dash_app.memoize import memoize, register_stats_route
+from src.utils.disk_cache import DiskCache
+
+
+def test_memoized_callback_shared_between_workers(tmp_path):
+    """
+    GIVEN a callback memoized in a cache file used by two workers, each with its own DiskCache
+    WHEN both workers call it with the same inputs, and then after the data version changes
+    THEN it should run once for the inputs and again for the new version
+    AND the stats route should report the hits and misses from both workers
+    """
+    path = tmp_path / "callbacks.sqlite"
+    version = {"current": "1"}
+    calls = []
+
+    def update_chart(feature, year):
+        calls.append((feature, year))
+        return {"data": [{"y": [year]}], "layout": {"title": feature}}
+
+    workers = [DiskCache(path, shared_stats=True) for _ in range(2)]
+    callbacks = [memoize(version=lambda: version["current"], cache=cache)(update_chart)
+                 for cache in workers]
+
+    assert callbacks[0]("events", 2012) == callbacks[1]("events", 2012)
+    callbacks[1]("sports", 2012)
+    version["current"] = "2"
+    callbacks[0]("events", 2012)
+    assert calls == [("events", 2012), ("sports", 2012), ("events", 2012)]
+
+    # The second worker adds its counts to the file, as it does every CALLBACK_STATS_FLUSH_EVERY
+    # lookups, the first adds its own when asked for the stats
+    workers[1].flush_stats()
+    app = Dash(__name__)
+    app.layout = html.Div()
+    register_stats_route(app, cache=workers[0])
+    stats = app.server.test_client().get("/_dash-cache/stats").get_json()
+    assert stats["functions"] == {f"{__name__}.{update_chart.__qualname__}": {"hits": 1,
+                                                                              "misses": 3}}
+    assert stats["hits"] == 0 and stats["misses"] == 2
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from src.dash_app.server_side import (ag_grid_rows, datatable_page, dataframe_fetch,
+                                      parse_filter_query, sql_fetch)
+
+
+def test_parse_filter_query():
+    """
+    GIVEN a DataTable filter query with numeric, quoted and prefixed operators
+    WHEN it is parsed
+    THEN each part should become a (column, operator, value) filter
+    """
+    query = '{year} >= 2000 && {place_name} scontains "Lon" && {country_name} icontains Ca'
+    assert parse_filter_query(query) == [
+        ("year", "greaterThanOrEqual", 2000),
+        ("place_name", "contains", "Lon"),
+        ("country_name", "contains", "Ca"),
+    ]
+
+
+def test_parse_filter_query_blank_and_unsupported():
+    """
+    GIVEN DataTable filter queries for missing values, and queries with || and parentheses
+    WHEN they are parsed
+    THEN 'is blank' and 'is not nil' should become blank and notBlank filters
+    AND the queries with || or parentheses should be rejected rather than misread
+    """
+    assert parse_filter_query("{year} is blank && {place_name} is not nil") == [
+        ("year", "blank", None),
+        ("place_name", "notBlank", None),
+    ]
+    assert parse_filter_query('{place_name} = "Rio (Brazil)"') == [
+        ("place_name", "equals", "Rio (Brazil)")]
+    for query in ["{year} > 2000 || {year} < 1970", "({year} > 2000) && {year} < 2010"]:
+        with pytest.raises(ValueError):
+            parse_filter_query(query)
+
+
+def test_sql_and_dataframe_rows_match(paralympics_data):
+    """
+    GIVEN the joined paralympics data, paged in SQL and as a DataFrame
+    WHEN the same AG Grid block and DataTable page are requested from both
+    THEN both should return the same rows and counts
+    """
+    sql = sql_fetch(paralympics_data)
+    frame = dataframe_fetch(pd.DataFrame(paralympics_data.get_all_data()))
+    request = {
+        "startRow": 0, "endRow": 8,
+        "sortModel": [{"colId": "participants", "sort": "desc"}],
+        "filterModel": {"event_type": {"filterType": "text", "type": "equals", "filter": "summer"},
+                        "year": {"filterType": "number", "type": "inRange",
+                                 "filter": 1970, "filterTo": 2010}},
+    }
+    from_sql = ag_grid_rows(request, sql)
+    assert from_sql == ag_grid_rows(request, frame)
+    assert len(from_sql["rowData"]) == 8 < from_sql["rowCount"]
+
+    args = (1, 5, [{"column_id": "year", "direction": "asc"}], "{country_name} contains a")
+    assert datatable_page(*args, sql) == datatable_page(*args, frame)
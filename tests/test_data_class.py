@@ -0,0 +1,181 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from data.write_batcher import WriteBatcher
+
+
+def test_add_row_returns_inserted_row(paralympics_data):
+    """
+    GIVEN a ParalympicsData instance
+    WHEN a question is added
+    THEN the inserted row should be returned with its new id
+    """
+    row = paralympics_data.add_row("question", {"question_text": "A new question?"})
+    assert row["question_text"] == "A new question?"
+    assert paralympics_data.get_row_by_id("question", row["id"]) == row
+
+
+def test_concurrent_inserts_are_group_committed(paralympics_data, monkeypatch):
+    """
+    GIVEN a ParalympicsData instance with a write-behind queue
+    WHEN many questions are added at the same time
+    THEN each caller should get its own row back
+    AND the rows should be committed in fewer transactions than there are rows
+    """
+    paralympics_data.writer.max_latency = 0.05
+    batch_sizes = []
+    write_batch = paralympics_data.writer._write_batch
+
+    def counting_write_batch(conn, batch):
+        batch_sizes.append(len(batch))
+        write_batch(conn, batch)
+
+    monkeypatch.setattr(paralympics_data.writer, "_write_batch", counting_write_batch)
+
+    texts = [f"Question {i}" for i in range(20)]
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        rows = list(pool.map(
+            lambda t: paralympics_data.add_row("question", {"question_text": t}), texts))
+
+    assert [r["question_text"] for r in rows] == texts
+    assert len({r["id"] for r in rows}) == len(texts)
+    assert sum(batch_sizes) == len(texts)
+    assert len(batch_sizes) < len(texts)
+
+
+def test_failed_insert_does_not_affect_batch(paralympics_data, monkeypatch):
+    """
+    GIVEN a ParalympicsData instance
+    WHEN an insert that breaks a constraint and valid inserts are made at the same time
+    THEN they should be committed in one batch
+    AND a RuntimeError should be raised for the failing insert only
+    AND the valid rows should be committed
+    """
+    paralympics_data.writer.max_latency = 0.2
+    batch_sizes = []
+    write_batch = paralympics_data.writer._write_batch
+
+    def counting_write_batch(conn, batch):
+        batch_sizes.append(len(batch))
+        write_batch(conn, batch)
+
+    monkeypatch.setattr(paralympics_data.writer, "_write_batch", counting_write_batch)
+    existing = paralympics_data.get_table_as_json("question")[0]
+    rows = [{"id": existing["id"], "question_text": "Duplicate"}] + [
+        {"question_text": f"Not a duplicate {i}"} for i in range(3)]
+
+    def add(row):
+        try:
+            return paralympics_data.add_row("question", row)
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(rows)) as pool:
+        results = list(pool.map(add, rows))
+
+    assert batch_sizes == [len(rows)]
+    assert isinstance(results[0], RuntimeError)
+    assert [r["question_text"] for r in results[1:]] == [r["question_text"] for r in rows[1:]]
+    with sqlite3.connect(paralympics_data.database_file) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM question WHERE question_text LIKE ?",
+                             ("Not a duplicate %",)).fetchone()[0]
+    assert count == 3
+
+
+def test_write_batcher_fails_rather_than_hangs(tmp_path):
+    """
+    GIVEN a WriteBatcher for a database that cannot be opened, and a closed WriteBatcher
+    WHEN a statement is submitted to each
+    THEN the first should raise the error from opening the database
+    AND the second should raise RuntimeError
+    """
+    broken = WriteBatcher(tmp_path / "missing" / "db.sqlite")
+    with pytest.raises(sqlite3.OperationalError):
+        broken.submit("INSERT INTO t VALUES (?)", (1,))
+    broken.close()
+
+    closed = WriteBatcher(tmp_path / "db.sqlite")
+    closed.close()
+    with pytest.raises(RuntimeError):
+        closed.submit("INSERT INTO t VALUES (?)", (1,))
+
+
+def test_get_rows_by_ids_in_request_order(paralympics_data):
+    """
+    GIVEN a ParalympicsData instance
+    WHEN several rows are requested by id, in more than one chunk and with a missing id
+    THEN the rows should be returned in the order requested with None for the missing id
+    """
+    rows = paralympics_data.get_rows_by_ids("question", [3, 1, 99999, 2, 1], chunk_size=2)
+    assert [r["id"] if r else None for r in rows] == [3, 1, None, 2, 1]
+    assert rows[0] == paralympics_data.get_row_by_id("question", 3)
+
+
+def test_restore_snapshot(paralympics_data):
+    """
+    GIVEN a snapshot of the database
+    WHEN a row is added and the snapshot is restored
+    THEN the row should no longer be in the database
+    """
+    before = paralympics_data.get_table_as_json("question")
+    with paralympics_data.snapshot() as snapshot:
+        paralympics_data.add_row("question", {"question_text": "Temporary question?"})
+        assert len(paralympics_data.get_table_as_json("question")) == len(before) + 1
+        paralympics_data.restore(snapshot)
+    assert paralympics_data.get_table_as_json("question") == before
+
+
+def test_restore_skipped_when_unchanged(paralympics_data):
+    """
+    GIVEN a snapshot of the database
+    WHEN nothing is written before the snapshot is restored
+    THEN the database file should not be rewritten
+    """
+    with paralympics_data.snapshot() as snapshot:
+        paralympics_data.get_table_as_json("question")
+        assert paralympics_data.restore(snapshot) is False
+        paralympics_data.add_row("question", {"question_text": "Temporary question?"})
+        assert paralympics_data.restore(snapshot) is True
+        assert paralympics_data.restore(snapshot) is False
+
+
+def test_all_data_page_sorted_and_filtered(paralympics_data):
+    """
+    GIVEN the paralympics database
+    WHEN a page of the joined data is requested for winter games, sorted by year descending
+    THEN the page should have the next rows in that order and the total should count every match
+    AND an unknown column should be rejected
+    """
+    winter_years = sorted((row["year"] for row in paralympics_data.get_all_data()
+                           if row["event_type"] == "winter"), reverse=True)
+    rows, total = paralympics_data.get_all_data_page(
+        offset=2, limit=3, sort_by=[("year", True)], filters=[("event_type", "equals", "winter")])
+    assert total == len(winter_years)
+    assert [row["year"] for row in rows] == winter_years[2:5]
+
+    with pytest.raises(ValueError):
+        paralympics_data.get_all_data_page(sort_by=[("year; DROP TABLE games", False)])
+
+
+def test_event_dataframe_typed_and_shared(monkeypatch):
+    """
+    GIVEN the paralympics .xlsx file
+    WHEN the event DataFrame is requested twice, and again after the file version changes
+    THEN it should have the schema's column types, with missing counts as <NA>
+    AND the same DataFrame should be returned until the version changes
+    """
+    from data import data_class
+
+    df = data_class.get_event_dataframe()
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["host"].dtype, pd.CategoricalDtype)
+    assert str(df["participants"].dtype) == "Int32"
+    assert df["participants_m"].isna().any()
+    assert pd.api.types.is_datetime64_any_dtype(df["start"])
+    assert data_class.get_event_dataframe() is df
+
+    monkeypatch.setattr(data_class, "get_event_data_version", lambda: "changed")
+    assert data_class.get_event_dataframe() is not df
@@ -0,0 +1,103 @@
+import os
+import time
+
+import pytest
+
+from utils.disk_cache import CACHE_DIR_ENV, DiskCache, disk_cached, private_cache_dir
+
+
+def test_entries_shared_between_cache_instances(tmp_path):
+    """
+    GIVEN two DiskCache instances for the same file, as two processes of an app would have
+    WHEN a value is stored with one
+    THEN the other should return it
+    AND a lookup for another data version should miss
+    """
+    path = tmp_path / "cache.sqlite"
+    DiskCache(path).set("df", {"rows": [1, 2, 3]}, version="7")
+    other = DiskCache(path)
+    assert other.get("df", version="7") == {"rows": [1, 2, 3]}
+    assert other.get("df", version="8") is None
+    assert other.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_expired_and_excess_entries_removed(tmp_path):
+    """
+    GIVEN a DiskCache with a limit of three entries
+    WHEN an entry outlives its ttl and then more entries than the limit are stored
+    THEN the expired entry should miss
+    AND only the three entries stored last should be kept
+    """
+    cache = DiskCache(tmp_path / "cache.sqlite", ttl=60, max_entries=3)
+    cache.set("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short", "missing") == "missing"
+    for i in range(5):
+        cache.set(f"key{i}", i)
+    assert cache.stats()["entries"] == 3
+    assert [cache.get(f"key{i}") for i in range(5)] == [None, None, 2, 3, 4]
+
+
+def test_disk_cached_reloads_for_new_version(tmp_path):
+    """
+    GIVEN a function decorated with disk_cached and a data version
+    WHEN it is called twice with the same argument, then again after the version changes
+    THEN the function should run for the first call and after the version change only
+    """
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    version = {"current": 1}
+    calls = []
+
+    @disk_cached(version=lambda: version["current"], cache=cache)
+    def load(x):
+        calls.append(x)
+        return x * 2
+
+    assert load(3) == 6
+    assert load(3) == 6
+    version["current"] = 2
+    assert load(3) == 6
+    assert calls == [3, 3]
+
+
+def test_shared_stats_counted_for_each_function(tmp_path):
+    """
+    GIVEN two DiskCache instances with shared_stats for the same file, flushing every 2 lookups
+    WHEN each looks up keys for two functions
+    THEN stats() should have the per-process counts and the per-function counts in the file
+    AND the other instance's counts should be included once it has flushed them
+    """
+    path = tmp_path / "cache.sqlite"
+    first, second = [DiskCache(path, shared_stats=True, stats_flush_every=2,
+                               stats_flush_interval=60) for _ in range(2)]
+    first.set("app.chart:1", "figure")
+    first.get("app.chart:1")
+    second.get("app.chart:1")
+    second.get("app.table:1")
+    stats = second.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["functions"] == {"app.chart": {"hits": 1, "misses": 0},
+                                  "app.table": {"hits": 0, "misses": 1}}
+    first.flush_stats()
+    assert second.stats()["functions"]["app.chart"] == {"hits": 2, "misses": 0}
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="needs POSIX file owners and modes")
+def test_cache_file_must_be_private(tmp_path, monkeypatch):
+    """
+    GIVEN a cache directory set with COMP0034_CACHE_DIR, and a cache file other users can write to
+    WHEN the private cache directory is used and a DiskCache is opened for the file
+    THEN the directory should be created with mode 0700
+    AND the file should be refused, as another user could have written pickles to it
+    """
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    path = private_cache_dir()
+    assert path == tmp_path / "cache"
+    assert path.stat().st_mode & 0o777 == 0o700
+    assert DiskCache().path.stat().st_mode & 0o777 == 0o600
+
+    shared = tmp_path / "shared.sqlite"
+    shared.touch()
+    shared.chmod(0o666)
+    with pytest.raises(PermissionError):
+        DiskCache(shared)
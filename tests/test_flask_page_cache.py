@@ -0,0 +1,148 @@
+import re
+import time
+
+import pandas as pd
+
+from src.data.data_class import get_event_dataframe
+from src.data.sources import ChartDataSource, EventFileSource
+from src.flask_app import flask_para_app
+from src.flask_app.page_cache import Page, PageCache, TableQuery
+from src.flask_app.plotly_js import PLOTLY_JS_VERSION
+
+
+def test_paralympics_route_uses_cached_page(monkeypatch):
+    """
+    GIVEN the Flask paralympics app
+    WHEN the page is requested twice, and then with an invalid render mode
+    THEN the data should only be loaded once and both responses should include the table and chart
+    AND the invalid render mode should get a 400 response
+    """
+    loads = []
+
+    class CountingSource(EventFileSource):
+        def _read(self, columns):
+            loads.append(1)
+            return super()._read(columns)
+
+    cache = PageCache(CountingSource())
+    monkeypatch.setattr(flask_para_app, "page_cache", cache)
+    client = flask_para_app.app.test_client()
+    try:
+        for _ in range(2):
+            # The page is streamed, read it before the next request
+            response = client.get("/")
+            assert response.status_code == 200
+            assert b"<table>" in response.data and b"plotly" in response.data
+        assert len(loads) == 1
+        assert client.get("/?render_mode=canvas").status_code == 400
+    finally:
+        cache.close()
+
+
+def test_page_rebuilt_in_background_when_source_changes():
+    """
+    GIVEN a PageCache that has loaded version 1 of the data
+    WHEN the source changes to version 2
+    THEN the background thread should swap in a page for version 2
+    """
+    class ChangingSource(ChartDataSource):
+        columns = ["event_type", "year", "place_name", "events", "sports", "participants",
+                   "countries"]
+        current = {"version": "1", "participants": 100}
+
+        def version(self):
+            return self.current["version"]
+
+        def _read(self, columns):
+            return pd.DataFrame({
+                "event_type": ["summer", "summer", "winter"], "year": [1960, 1964, 1976],
+                "place_name": ["Rome", "Tokyo", "Örnsköldsvik"], "events": [57, 144, 198],
+                "sports": [8, 9, 2], "participants": [self.current["participants"], 375, 196],
+                "countries": [23, 21, 16],
+            })[columns]
+
+    source = ChangingSource()
+    cache = PageCache(source, check_interval=0.01)
+    try:
+        assert cache.get().df.loc[0, "participants"] == 100
+        source.current.update(version="2", participants=209)
+        deadline = time.monotonic() + 5
+        while cache.get().version != "2" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        page = cache.get()
+        assert page.version == "2"
+        assert page.df.loc[0, "participants"] == 209
+        assert "plotly" in page.chart_html()
+    finally:
+        cache.close()
+
+
+def test_plotly_js_served_as_cacheable_asset():
+    """
+    GIVEN the Flask paralympics app
+    WHEN the page is requested
+    THEN the page should load plotly.js from the versioned asset URL rather than inline it
+    AND the asset should be cacheable for a year and revalidate with a 304 response
+    """
+    client = flask_para_app.app.test_client()
+    url = f"/plotly/{PLOTLY_JS_VERSION}/plotly.min.js"
+    page = client.get("/")
+    assert f'<script src="{url}"></script>'.encode() in page.data
+    assert len(page.data) < 500_000
+
+    asset = client.get(url)
+    assert asset.status_code == 200
+    assert asset.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert client.get(url, headers={"If-None-Match": asset.headers["ETag"]}).status_code == 304
+    assert client.get("/plotly/0.0.0/plotly.min.js").status_code == 404
+
+
+def test_table_sorted_filtered_and_paged():
+    """
+    GIVEN a Page with the paralympics data
+    WHEN the table is requested filtered to summer games, sorted by year descending, 5 rows a page
+    THEN the second page should have the next 5 matching rows in descending year order
+    AND a page past the end should be limited to the last page
+    """
+    df = get_event_dataframe()
+    page = Page("1", df)
+    query = TableQuery.from_args({"q": "Summer", "sort": "year", "order": "desc", "per_page": "5",
+                                  "page": "2"}, page.columns)
+    table = page.table(query)
+    summer_years = sorted(df[df["type"].str.lower() == "summer"]["year"], reverse=True)
+    assert table.total == len(summer_years)
+    assert [row["year"] for row in table.rows] == summer_years[5:10]
+
+    last = page.table(TableQuery(page=999, per_page=5))
+    assert last.query.page == last.pages == -(-len(df) // 5)
+
+
+def test_table_query_rejects_invalid_args():
+    """
+    GIVEN the Flask paralympics app
+    WHEN the table is requested with an unknown sort column or a page size over the maximum
+    THEN the response should be 400
+    """
+    client = flask_para_app.app.test_client()
+    assert client.get("/?sort=not_a_column").status_code == 400
+    assert client.get("/?per_page=100000").status_code == 400
+    assert client.get("/?page=two").status_code == 400
+
+
+def test_table_links_keep_render_mode(monkeypatch):
+    """
+    GIVEN the Flask paralympics app
+    WHEN the page is requested with a render mode
+    THEN every sort and page link, and the filter form, should keep the render mode
+    """
+    cache = PageCache()
+    monkeypatch.setattr(flask_para_app, "page_cache", cache)
+    client = flask_para_app.app.test_client()
+    try:
+        html = client.get("/?render_mode=svg&per_page=5&page=2").get_data(as_text=True)
+        links = re.findall(r'<a href="([^"]*)"', html)
+        assert len(links) > 2
+        assert all("render_mode=svg" in link for link in links)
+        assert '<input type="hidden" name="render_mode" value="svg">' in html
+    finally:
+        cache.close()
@@ -0,0 +1,152 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.data.mock_api import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def test_batch_returns_results_in_order(client):
+    """
+    GIVEN the mock API
+    WHEN a batch of a question, its responses and a missing question is requested
+    THEN each result should be returned in the order requested with its own status code
+    """
+    resp = client.post("/batch", json={"requests": [
+        {"path": "/question/1"},
+        {"path": "/response/search", "params": {"question_id": 1}},
+        {"path": "/question/99999"},
+    ]})
+    assert resp.status_code == 200
+    question, responses, missing = resp.json()["responses"]
+    assert question["status"] == 200
+    assert question["body"] == client.get("/question/1").json()
+    assert responses["status"] == 200
+    assert all(r["question_id"] == 1 for r in responses["body"])
+    assert missing["status"] == 404
+
+
+def test_batch_rejects_invalid_body(client):
+    """
+    GIVEN the mock API
+    WHEN a batch is sent without a list of requests
+    THEN a 400 error should be returned
+    """
+    assert client.post("/batch", json={"path": "/question"}).status_code == 400
+
+
+def test_batch_checks_sub_request_methods(client):
+    """
+    GIVEN the mock API
+    WHEN a batch has a method that is not a string, or a method other than GET or POST
+    THEN the batch with the invalid method should get a 400 error
+    AND the unsupported method should get a 405 for its sub-request only
+    """
+    invalid = client.post("/batch", json={"requests": [{"path": "/all", "method": 1},
+                                                       {"path": "/all"}]})
+    assert invalid.status_code == 400
+
+    resp = client.post("/batch", json={"requests": [{"path": "/question/1", "method": "DELETE"},
+                                                    {"path": "/question/1"}]})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.json()["responses"]] == [405, 200]
+
+
+def test_multi_get_marks_missing_ids(client):
+    """
+    GIVEN the mock API
+    WHEN several questions are requested by id including an id that does not exist
+    THEN the questions should be returned in the order requested
+    AND the missing id should be listed
+    """
+    resp = client.get("/question/multi", params={"ids": "2,99999,1"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [q["id"] if q else None for q in body["items"]] == [2, None, 1]
+    assert body["missing"] == [99999]
+
+
+def test_multi_get_rejects_non_integer_ids(client):
+    """
+    GIVEN the mock API
+    WHEN several questions are requested with an id that is not an integer, by GET and by POST
+    THEN the response should be 400
+    """
+    assert client.get("/question/multi", params={"ids": "a,1"}).status_code == 400
+    assert client.post("/question/multi", json={"ids": ["a", 1]}).status_code == 400
+
+
+def test_quiz_bundle_hides_correct_answer(client):
+    """
+    GIVEN the mock API
+    WHEN a page of quiz questions is requested
+    THEN the question count and the questions with their responses should be returned
+    AND the responses should not say which one is correct
+    """
+    resp = client.get("/quiz", params={"offset": 0, "limit": 2})
+    assert resp.status_code == 200
+    bundle = resp.json()
+    assert bundle["count"] == len(client.get("/question").json())
+    assert [q["id"] for q in bundle["questions"]] == [1, 2]
+    responses = bundle["questions"][0]["responses"]
+    assert responses
+    assert all(set(r) == {"id", "response_text"} for r in responses)
+
+
+def test_quiz_answer_checked(client):
+    """
+    GIVEN the mock API
+    WHEN each response to question 1 is checked
+    THEN only the correct response should be reported as correct
+    """
+    expected = {r["id"]: bool(r["is_correct"])
+                for r in client.get("/response/search", params={"question_id": 1}).json()}
+    for response_id, is_correct in expected.items():
+        resp = client.post("/quiz/answer", json={"question_id": 1, "response_id": response_id})
+        assert resp.json() == {"correct": is_correct}
+
+
+def test_map_clusters_cover_every_games(client):
+    """
+    GIVEN the mock API
+    WHEN the host location clusters are requested at a low and a high zoom level
+    THEN the cluster counts should add up to the number of host locations at each zoom level
+    AND the higher zoom level should have at least as many clusters
+    """
+    # A games with joint hosts is counted once for each host
+    n_hosts = len(client.get("/games_host").json())
+    low = client.get("/map/clusters", params={"zoom": 0}).json()
+    high = client.get("/map/clusters", params={"zoom": 8}).json()
+    assert sum(c["count"] for c in low) == n_hosts
+    assert sum(c["count"] for c in high) == n_hosts
+    assert len(high) >= len(low)
+    assert client.get("/map/clusters", params={"zoom": 99}).status_code in (400, 422)
+
+
+def test_chart_figure_revalidated_with_etag(client):
+    """
+    GIVEN the mock API
+    WHEN the trend chart figure is requested, and then requested again with its ETag
+    THEN the figure JSON should be returned with the data version as the ETag
+    AND the second request should get 304 Not Modified
+    """
+    first = client.get("/charts/trend", params={"feature": "sports"})
+    assert first.status_code == 200
+    assert first.json()["data"]
+    not_modified = client.get("/charts/trend", params={"feature": "sports"},
+                              headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+
+
+def test_chart_rejects_invalid_options(client):
+    """
+    GIVEN the mock API
+    WHEN chart figures are requested with a feature, event type or render mode that does not exist
+    THEN a 400 error should be returned
+    """
+    assert client.get("/charts/trend", params={"feature": "medals"}).status_code == 400
+    assert client.get("/charts/gender-ratio", params={"event_type": "spring"}).status_code == 400
+    assert client.get("/charts/hosts", params={"render_mode": "canvas"}).status_code == 400
@@ -0,0 +1,112 @@
+import json
+
+import pandas as pd
+import pytest
+
+from data.sources import (CHART_COLUMNS, ChartDataSource, ColumnarFileSource, EventFileSource,
+                          SQLiteSource)
+from paralympics import charts
+from paralympics.data_client import RESTSource, get_chart_source, set_chart_source
+from paralympics.figure_cache import figure_cache
+
+
+def test_sources_return_the_same_chart_columns(tmp_path):
+    """
+    GIVEN the SQLite, REST, .xlsx file and columnar file sources
+    WHEN each is asked for the same columns
+    THEN each should return those columns with the chart column names
+    AND the database sources should return the same rows
+    """
+    columns = ["event_type", "year", "place_name", "participants"]
+    sqlite_df = SQLiteSource().get_dataframe(columns)
+    rest_df = RESTSource(columns=columns).get_dataframe(columns)
+    file_df = EventFileSource().get_dataframe(columns)
+    columnar_df = ColumnarFileSource(SQLiteSource(), tmp_path / "chart.parquet").get_dataframe(
+        columns)
+    for df in (sqlite_df, rest_df, file_df, columnar_df):
+        assert list(df.columns) == columns
+    pd.testing.assert_frame_equal(rest_df, sqlite_df, check_dtype=False)
+    pd.testing.assert_frame_equal(columnar_df, sqlite_df, check_dtype=False)
+    assert set(file_df["event_type"].str.lower()) == set(sqlite_df["event_type"].str.lower())
+
+    with pytest.raises(ValueError):
+        SQLiteSource().get_dataframe(["type"])
+
+
+def test_columnar_file_written_once_per_version(tmp_path):
+    """
+    GIVEN a columnar file source for a source whose version changes
+    WHEN the data is read twice, then after the version changes
+    THEN the other source should be read once for each version
+    AND only the file for the current version should be kept
+    """
+    reads = []
+
+    class CountingSource(SQLiteSource):
+        current = "1"
+
+        def version(self):
+            return self.current
+
+        def _read(self, columns):
+            reads.append(columns)
+            return super()._read(columns)
+
+    inner = CountingSource()
+    source = ColumnarFileSource(inner, tmp_path / "chart.parquet")
+    assert list(source.get_dataframe(["year"]).columns) == ["year"]
+    source.get_dataframe(["year", "participants"])
+    inner.current = "2"
+    source.get_dataframe()
+    assert reads == [CHART_COLUMNS, CHART_COLUMNS]
+    assert [p.name for p in tmp_path.iterdir()] == [source.file_for("2").name]
+
+
+def test_columnar_file_read_again_when_removed(tmp_path, monkeypatch):
+    """
+    GIVEN two columnar file sources for the same path, as two processes would have
+    WHEN the second writes the file for a new version, removing the old file, while the first is
+        about to read the old file
+    THEN the first should read the file for the new version rather than fail
+    """
+    class VersionedSource(SQLiteSource):
+        current = "1"
+
+        def version(self):
+            return VersionedSource.current
+
+    first = ColumnarFileSource(VersionedSource(), tmp_path / "chart.parquet")
+    second = ColumnarFileSource(VersionedSource(), tmp_path / "chart.parquet")
+    first.get_dataframe(["year"])
+    read_parquet = pd.read_parquet
+    read_paths = []
+
+    def read_after_other_process_writes(path, **kwargs):
+        read_paths.append(path)
+        if len(read_paths) == 1:
+            VersionedSource.current = "2"
+            second.get_dataframe(["year"])
+        return read_parquet(path, **kwargs)
+
+    monkeypatch.setattr(pd, "read_parquet", read_after_other_process_writes)
+    assert not first.get_dataframe(["year"]).empty
+    assert read_paths == [first.file_for("1"), first.file_for("2"), first.file_for("2")]
+    with pytest.raises(TypeError):
+        ChartDataSource()
+
+
+def test_chart_source_can_be_swapped():
+    """
+    GIVEN the chart functions, which get their data from the REST API by default
+    WHEN the chart source is set to the SQLite database
+    THEN the line chart should be the same figure
+    """
+    default = get_chart_source()
+    rest_fig = charts.line_chart("events", use_cache=False)
+    try:
+        set_chart_source(SQLiteSource())
+        figure_cache.clear()
+        sqlite_fig = charts.line_chart("events")
+    finally:
+        set_chart_source(default)
+    assert json.loads(sqlite_fig.to_json()) == json.loads(rest_fig.to_json())
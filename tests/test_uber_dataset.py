@@ -0,0 +1,85 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.data.uber import DATE_FORMAT, SAMPLE_FILE, UberDataset
+from src.flask_app import flask_demo_app
+
+
+def test_offline_dataset_converted_once_from_sample(tmp_path):
+    """
+    GIVEN an offline UberDataset with an empty store
+    WHEN the data is loaded twice
+    THEN the bundled sample should be converted to a Parquet file once, with the timestamps parsed
+    AND the hourly counts should match a histogram of the sample's hours
+    """
+    dataset = UberDataset(store_dir=tmp_path, offline=True)
+    path = dataset.path()
+    assert path == dataset.sample_file
+    mtime = path.stat().st_mtime_ns
+    df = dataset.load(nrows=100, columns=["date/time", "lat"])
+    assert list(df.columns) == ["date/time", "lat"] and len(df) == 100
+    assert pd.api.types.is_datetime64_any_dtype(df["date/time"])
+    assert dataset.path().stat().st_mtime_ns == mtime
+
+    hours = pd.to_datetime(pd.read_csv(SAMPLE_FILE)["Date/Time"], format=DATE_FORMAT).dt.hour
+    expected = np.histogram(hours, bins=24, range=(0, 24))[0]
+    assert dataset.hourly_counts().tolist() == expected.tolist()
+
+
+def test_sample_used_until_download_finishes(tmp_path):
+    """
+    GIVEN an UberDataset whose download fails, and one whose download works
+    WHEN the data is requested, and again once the downloads have finished
+    THEN both should use the sample without waiting for the download
+    AND once the downloads have finished the first should use the sample and the second the
+        downloaded data
+    """
+    failing = UberDataset(url=str(tmp_path / "missing.csv.gz"), store_dir=tmp_path / "a")
+    assert failing.path() == failing.sample_file
+    assert not failing.wait_for_download(timeout=30)
+    assert failing.path() == failing.sample_file
+
+    remote = tmp_path / "uber-raw-data.csv.gz"
+    shutil.copy(SAMPLE_FILE, remote)
+    working = UberDataset(url=str(remote), store_dir=tmp_path / "b")
+    assert working.path() == working.sample_file
+    assert working.wait_for_download(timeout=30)
+    assert working.path() == working.remote_file
+    assert len(working.load()) == len(pd.read_csv(SAMPLE_FILE))
+
+
+def test_failed_conversion_not_retried_at_once(tmp_path):
+    """
+    GIVEN an UberDataset whose download is a CSV without the expected columns
+    WHEN the data is requested, and again once the download has failed
+    THEN the failure should be recorded and the sample used
+    AND the second request should not start another download
+    """
+    remote = tmp_path / "uber-raw-data.csv.gz"
+    pd.DataFrame({"when": ["9/1/2014 0:01:00"]}).to_csv(remote, index=False, compression="gzip")
+    dataset = UberDataset(url=str(remote), store_dir=tmp_path / "store")
+    assert dataset.path() == dataset.sample_file
+    assert not dataset.wait_for_download(timeout=30)
+    assert dataset._failed_at is not None
+    assert dataset.path() == dataset.sample_file
+    assert dataset._download is None
+
+
+def test_flask_index_serves_precomputed_chart(tmp_path, monkeypatch):
+    """
+    GIVEN the Flask demo app with an offline dataset
+    WHEN the index page is requested twice
+    THEN the chart should be built once and only have the 24 hourly counts
+    AND the title should say it is the sample data
+    """
+    dataset = UberDataset(store_dir=tmp_path, offline=True)
+    monkeypatch.setattr(flask_demo_app, "uber_dataset", lambda: dataset)
+    flask_demo_app.hourly_chart_html.cache_clear()
+    client = flask_demo_app.app.test_client()
+    pages = [client.get("/") for _ in range(2)]
+    assert all(page.status_code == 200 for page in pages)
+    assert flask_demo_app.hourly_chart_html.cache_info().hits == 1
+    assert len(pages[0].data) < 50_000
+    assert b"sample data" in pages[0].data